@@ -0,0 +1,127 @@
+"""
+Fil des annonces internes.
+
+Les annonces changent quelques fois par semaine mais le fil est lu par tous
+les employés, souvent aux mêmes heures. Tout ce qu'il affiche vient du
+cache Django, sous des clés versionnées :
+
+- l'état du fil (dates de publication triées, nombre de pages), relu en une
+  requête après chaque changement ;
+- chaque page rendue (fragment HTML et annonces de la page).
+
+Un enregistrement ou une suppression d'Annonce remplace la version (voir
+signals) : toutes les clés deviennent caduques d'un coup. La version est
+l'instant du changement en nanosecondes, ce qui en fait aussi la date de
+dernière modification du fil pour Last-Modified.
+
+Suivi de lecture : une seule ligne LectureAnnonces par utilisateur, la date
+de la dernière annonce vue, recopiée dans la session. Le nombre d'annonces
+non lues se déduit de l'état en cache par dichotomie, sans requête.
+"""
+import bisect
+import datetime
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .models import Annonce, LectureAnnonces
+
+CLE_VERSION = 'annonces:version'
+CLE_SESSION = 'annonces_lues'
+GABARIT_PAGE = 'gestion_rh/partials/annonce_list_partial.html'
+PAR_PAGE = 20
+DUREE_CACHE = 24 * 3600
+
+
+def version_du_fil():
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        # Clé perdue (cache vidé) : nouvelle version, donc nouvelle date de modification.
+        cache.add(CLE_VERSION, time.time_ns(), None)
+        version = cache.get(CLE_VERSION)
+    return version
+
+
+def invalider_fil():
+    cache.set(CLE_VERSION, time.time_ns(), None)
+
+
+def _calculer_etat(version):
+    dates = [date.timestamp() for date in Annonce.objects.order_by('date_publication').values_list(
+        'date_publication', flat=True,
+    )]
+    return {
+        'version': version,
+        'dates': dates,
+        'nombre_pages': max(1, -(-len(dates) // PAR_PAGE)),
+        # Dernière publication ou dernier changement (modification, suppression), le plus récent.
+        'modifie': max([version / 1e9, *dates[-1:]]),
+    }
+
+
+def etat_du_fil():
+    """État du fil : version, dates de publication (horodatages croissants), nombre de pages, date de modification."""
+    version = version_du_fil()
+    return cache.get_or_set(f'annonces:{version}:etat', lambda: _calculer_etat(version), DUREE_CACHE)
+
+
+def _calculer_page(version, numero):
+    annonces = list(
+        Annonce.objects.select_related('auteur').order_by('-date_publication', '-pk')
+        [(numero - 1) * PAR_PAGE:numero * PAR_PAGE]
+    )
+    return {'annonces': annonces, 'html': render_to_string(GABARIT_PAGE, {'annonces': annonces})}
+
+
+def page_du_fil(etat, numero):
+    """Annonces et fragment rendu d'une page du fil, gardés en cache jusqu'au prochain changement."""
+    version = etat['version']
+    return cache.get_or_set(
+        f'annonces:{version}:page:{numero}', lambda: _calculer_page(version, numero), DUREE_CACHE,
+    )
+
+
+def non_lues(etat, repere):
+    """Annonces publiées après le repère (horodatage, None si l'utilisateur n'a jamais lu le fil)."""
+    if repere is None:
+        return len(etat['dates'])
+    return len(etat['dates']) - bisect.bisect_right(etat['dates'], repere)
+
+
+def repere_de_lecture(request):
+    """Horodatage de la dernière annonce vue par l'utilisateur, lu dans la session ou à défaut en base."""
+    if CLE_SESSION not in request.session:
+        lecture = LectureAnnonces.objects.filter(utilisateur_id=request.user.pk).values_list(
+            'derniere_lecture', flat=True,
+        ).first()
+        request.session[CLE_SESSION] = lecture.timestamp() if lecture else None
+    return request.session[CLE_SESSION]
+
+
+def marquer_lu(request, etat):
+    """Avance le repère de l'utilisateur jusqu'à la dernière annonce publiée ; n'écrit que s'il avance."""
+    if not etat['dates'] or (repere_de_lecture(request) or 0) >= etat['dates'][-1]:
+        return
+    derniere = etat['dates'][-1]
+    LectureAnnonces.objects.update_or_create(
+        utilisateur_id=request.user.pk,
+        defaults={'derniere_lecture': datetime.datetime.fromtimestamp(derniere, tz=datetime.timezone.utc)},
+    )
+    request.session[CLE_SESSION] = derniere
+
+
+def validateurs(etat, numero, repere, utilisateur_id):
+    """(ETag, Last-Modified en horodatage) d'une page du fil pour un utilisateur."""
+    # La page affiche le nombre de non lues : le repère de l'utilisateur fait partie du validateur.
+    empreinte = hashlib.sha1(f"{etat['version']}:{numero}:{utilisateur_id}:{repere}".encode()).hexdigest()
+    return f'"{empreinte[:20]}"', int(etat['modifie'])
+
+
+aetat_du_fil = sync_to_async(etat_du_fil)
+apage_du_fil = sync_to_async(page_du_fil)
+arepere_de_lecture = sync_to_async(repere_de_lecture)
+amarquer_lu = sync_to_async(marquer_lu)
+
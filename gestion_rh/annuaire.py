@@ -0,0 +1,266 @@
+"""
+Recherche dans l'annuaire des employés (saisie semi-automatique).
+
+Chaque employé est découpé en mots normalisés (minuscules, sans accents)
+tirés de son nom, prénom, matricule, téléphone, département et poste, rangés
+dans MotAnnuaire. Une recherche par préfixe devient un parcours de plage sur
+l'index (mot, employe) : mot >= 'dup' AND mot < 'dup\\uffff', arrêté dès que
+la page de résultats est pleine. Avec plusieurs termes, chaque candidat doit
+aussi contenir un mot commençant par chacun des autres termes.
+
+Tolérance aux fautes : si les préfixes exacts ne suffisent pas à remplir la
+page, les termes d'au moins LONGUEUR_MIN_APPROCHEE lettres sont rapprochés
+des mots connus via leurs trigrammes (TrigrammeAnnuaire), puis filtrés par
+distance d'édition.
+
+L'index suit les enregistrements d'Employe par signaux (et l'intégration en
+masse l'alimente directement). Les résultats des requêtes fréquentes sont
+gardés dans un cache LRU du processus, vidé à chaque modification locale et
+borné dans le temps pour les modifications faites par d'autres processus.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .exports import paquets
+from .models import Employe, MotAnnuaire, TrigrammeAnnuaire
+
+CHAMPS_INDEXES = ('nom', 'prenom', 'matricule', 'telephone', 'departement__nom', 'poste__intitule')
+# Noms des champs dans les résultats renvoyés par rechercher().
+NOMS_RESULTAT = {'departement__nom': 'service', 'poste__intitule': 'poste'}
+LIMITE_PAR_DEFAUT = 10
+LONGUEUR_MIN_APPROCHEE = 4
+# Mots proches examinés par terme lors d'une recherche approchée.
+CANDIDATS_APPROCHES = 200
+# Plafond du comptage qui estime la sélectivité de chaque terme.
+PLAFOND_ESTIMATION = 500
+TAILLE_CACHE = 2048
+DUREE_CACHE = 30.0  # secondes
+TAILLE_LOT_INDEXATION = 2000
+
+_MOTS = re.compile(r'[a-z0-9]+')
+_TELEPHONE = re.compile(r'\+?[\d\s().-]*\d[\d\s().-]*')
+
+
+def normaliser(texte):
+    decompose = unicodedata.normalize('NFKD', str(texte or ''))
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).lower()
+
+
+def termes_requete(requete):
+    # Un numéro saisi avec séparateurs (« +243 81 ... ») est cherché comme une seule suite de chiffres.
+    if _TELEPHONE.fullmatch(requete.strip()):
+        return [re.sub(r'\D', '', requete)]
+    return _MOTS.findall(normaliser(requete))
+
+
+def mots_employe(valeurs):
+    """Mots indexés d'un employé ({champ: valeur}) ; le téléphone est indexé comme une suite de chiffres."""
+    mots = set()
+    for champ in CHAMPS_INDEXES:
+        valeur = normaliser(valeurs[champ])
+        if champ == 'telephone':
+            valeur = re.sub(r'\D', '', valeur)
+            if valeur:
+                mots.add(valeur)
+        else:
+            mots.update(_MOTS.findall(valeur))
+            if champ == 'matricule':
+                mots.add(''.join(_MOTS.findall(valeur)))
+    mots.discard('')
+    return {mot[:100] for mot in mots}
+
+
+def trigrammes(mot):
+    """Trigrammes d'un mot, complété à gauche : ceux d'un préfixe sont inclus dans ceux du mot."""
+    complete = '  ' + mot
+    return {complete[i:i + 3] for i in range(len(mot))}
+
+
+def _est_approchable(mot):
+    return mot.isalpha() and len(mot) >= 3
+
+
+# --- Maintenance de l'index ---
+
+def indexer_employes(employe_ids):
+    """
+    Met l'index à jour pour les employés donnés : seuls les mots ajoutés ou
+    disparus sont écrits. Renvoie le nombre de mots ajoutés.
+    """
+    ajoutes = 0
+    for lot in paquets(employe_ids, TAILLE_LOT_INDEXATION):
+        attendus = {
+            (valeurs['pk'], mot)
+            for valeurs in Employe.objects.filter(pk__in=lot).values('pk', *CHAMPS_INDEXES)
+            for mot in mots_employe(valeurs)
+        }
+        existants = set(MotAnnuaire.objects.filter(employe_id__in=lot).values_list('employe_id', 'mot'))
+        obsoletes = existants - attendus
+        nouveaux = attendus - existants
+        for paquet in paquets(obsoletes, 200):
+            condition = Q()
+            for employe_id, mot in paquet:
+                condition |= Q(employe_id=employe_id, mot=mot)
+            MotAnnuaire.objects.filter(condition).delete()
+        if nouveaux:
+            MotAnnuaire.objects.bulk_create(
+                [MotAnnuaire(employe_id=employe_id, mot=mot) for employe_id, mot in nouveaux],
+                ignore_conflicts=True,
+            )
+            TrigrammeAnnuaire.objects.bulk_create(
+                [
+                    TrigrammeAnnuaire(trigramme=trigramme, mot=mot)
+                    for mot in {mot for _, mot in nouveaux if _est_approchable(mot)}
+                    for trigramme in trigrammes(mot)
+                ],
+                ignore_conflicts=True,
+            )
+            ajoutes += len(nouveaux)
+    cache_recherche.vider()
+    return ajoutes
+
+
+def reconstruire_annuaire():
+    """Reconstruit entièrement l'index de l'annuaire ; renvoie le nombre de mots indexés."""
+    MotAnnuaire.objects.all().delete()
+    TrigrammeAnnuaire.objects.all().delete()
+    return indexer_employes(Employe.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000))
+
+
+# --- Cache des requêtes fréquentes ---
+
+class CacheLRU:
+    """Cache LRU borné en taille et en durée de vie, partagé par les threads du processus."""
+
+    def __init__(self, taille_max=TAILLE_CACHE, duree=DUREE_CACHE):
+        self.taille_max = taille_max
+        self.duree = duree
+        self.entrees = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def lire(self, cle):
+        with self.verrou:
+            entree = self.entrees.get(cle)
+            if entree is None:
+                return None
+            expiration, valeur = entree
+            if expiration < time.monotonic():
+                del self.entrees[cle]
+                return None
+            self.entrees.move_to_end(cle)
+            return valeur
+
+    def ecrire(self, cle, valeur):
+        with self.verrou:
+            self.entrees[cle] = (time.monotonic() + self.duree, valeur)
+            self.entrees.move_to_end(cle)
+            while len(self.entrees) > self.taille_max:
+                self.entrees.popitem(last=False)
+
+    def vider(self):
+        with self.verrou:
+            self.entrees.clear()
+
+
+cache_recherche = CacheLRU()
+
+
+# --- Recherche ---
+
+def distance_edition(a, b):
+    """Distance de Damerau-Levenshtein restreinte (une transposition compte pour une erreur)."""
+    precedente, courante = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        avant, precedente, courante = precedente, courante, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cout = a[i - 1] != b[j - 1]
+            courante[j] = min(precedente[j] + 1, courante[j - 1] + 1, precedente[j - 1] + cout)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                courante[j] = min(courante[j], avant[j - 2] + 1)
+    return courante[-1]
+
+
+def mots_approches(terme):
+    """Mots de l'index dont un préfixe est à une faute (deux pour les termes longs) de `terme`."""
+    if len(terme) < LONGUEUR_MIN_APPROCHEE or not terme.isalpha():
+        return []
+    tolerance = 1 if len(terme) < 8 else 2
+    cibles = trigrammes(terme)
+    # Une faute fait perdre jusqu'à 3 trigrammes, une inversion jusqu'à 4.
+    seuil = max(1, len(cibles) - 4 * tolerance)
+    candidats = TrigrammeAnnuaire.objects.filter(trigramme__in=cibles).values('mot').annotate(
+        communs=Count('id'),
+    ).filter(communs__gte=seuil).order_by('-communs').values_list('mot', flat=True)[:CANDIDATS_APPROCHES]
+    return [
+        mot for mot in candidats
+        if not mot.startswith(terme) and min(
+            distance_edition(terme, mot[:longueur])
+            for longueur in range(len(terme) - tolerance, len(terme) + tolerance + 1)
+        ) <= tolerance
+    ]
+
+
+def _condition(terme, approches=()):
+    condition = Q(mot__gte=terme, mot__lt=terme + '\uffff')
+    if approches:
+        condition |= Q(mot__in=approches)
+    return condition
+
+
+def _employes_correspondants(termes, approches, limite, exclus):
+    """Ids d'au plus `limite` employés ayant un mot pour chaque terme, dans l'ordre des mots."""
+    conditions = [_condition(terme, approches.get(terme)) for terme in termes]
+    if len(conditions) > 1:
+        # Le terme le plus sélectif (comptage plafonné) mène le parcours ; les autres sont vérifiés par candidat.
+        estimations = [MotAnnuaire.objects.filter(c)[:PLAFOND_ESTIMATION].count() for c in conditions]
+        if not all(estimations):
+            return []
+        conditions = [c for _, c in sorted(zip(estimations, conditions), key=lambda paire: paire[0])]
+    principale, *autres = conditions
+    requete = MotAnnuaire.objects.filter(principale)
+    for condition in autres:
+        requete = requete.filter(Exists(MotAnnuaire.objects.filter(condition, employe_id=OuterRef('employe_id'))))
+    if exclus:
+        requete = requete.exclude(employe_id__in=exclus)
+    # Un employé revient une fois par mot correspondant : la lecture suit
+    # l'index (mot, employe) par morceaux jusqu'à avoir `limite` employés.
+    ids = []
+    mots = requete.order_by('mot', 'employe_id').values_list('employe_id', flat=True)
+    for employe_id in mots.iterator(chunk_size=limite * 2):
+        if employe_id not in ids:
+            ids.append(employe_id)
+            if len(ids) == limite:
+                break
+    return ids
+
+
+def rechercher(requete, limite=LIMITE_PAR_DEFAUT):
+    """
+    Employés correspondant à `requete` (préfixes exacts d'abord, puis
+    correspondances approchées), sous forme de dictionnaires prêts pour JSON.
+    """
+    termes = termes_requete(requete)
+    if not termes:
+        return []
+    cle = (' '.join(termes), limite)
+    resultats = cache_recherche.lire(cle)
+    if resultats is not None:
+        return resultats
+
+    ids = _employes_correspondants(termes, {}, limite, ())
+    if len(ids) < limite:
+        approches = {terme: mots_approches(terme) for terme in termes}
+        if any(approches.values()):
+            ids += _employes_correspondants(termes, approches, limite - len(ids), ids)
+    fiches = {
+        fiche['pk']: {NOMS_RESULTAT.get(champ, champ): valeur for champ, valeur in fiche.items()}
+        for fiche in Employe.objects.filter(pk__in=ids).values('pk', *CHAMPS_INDEXES)
+    }
+    resultats = [fiches[employe_id] for employe_id in ids if employe_id in fiches]
+    cache_recherche.ecrire(cle, resultats)
+    return resultats
@@ -0,0 +1,320 @@
+"""
+Archives annuelles de la paie.
+
+Les fiches d'une année close (toutes EMISE, antérieure aux
+ARCHIVES_PAIE_ANNEES_CHAUDES dernières années) sont sorties des tables
+FicheDePaie, FichePaiePrime et FichePaieAvantage, avec leurs lignes, vers un
+fichier JSONL compressé par année : listes, exports et agrégats ne
+parcourent plus que les années récentes.
+
+Le fichier enchaîne un membre gzip par mois (c'est un fichier gzip valide,
+lisible d'un bloc) ; ArchivePaie garde la position de chaque membre, de sorte
+que relire un mois ne décompresse que ce mois. Chaque ligne porte la fiche,
+l'identité et le département de l'employé au moment de l'archivage, et ses
+lignes de primes et d'avantages.
+
+L'archivage écrit puis relit le fichier (nombre de fiches, masses brute et
+nette) avant de supprimer quoi que ce soit ; restaurer_annee fait le chemin
+inverse pour corriger une année close. Les suppressions et réinsertions
+contournent les signaux : les synthèses du tableau de bord restent valides,
+calculer_syntheses relisant les archives pour les années archivées.
+
+La lecture passe par FicheDePaie.objects.de_la_periode, de_l_employe et
+trouver, qui routent par année vers les tables ou vers ces fonctions.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .exports import COLONNES_FICHES, TAILLE_PAQUET, paquets
+from .models import (
+    ArchivePaie, FicheDePaie, FicheDePaieArchivee, FichePaieAvantage, FichePaiePrime,
+)
+
+ANNEES_CHAUDES = 2
+CHAMPS_MONTANTS = (
+    'salaire_brut', 'total_primes', 'total_avantages', 'cotisations_sociales', 'impot_sur_revenu', 'salaire_net',
+)
+
+
+class ErreurArchive(Exception):
+    """Archivage ou restauration impossible (année non close, déjà archivée, fichier incohérent)."""
+
+
+def dossier_archives():
+    dossier = Path(getattr(settings, 'ARCHIVES_PAIE_DIR', Path(settings.BASE_DIR) / 'archives' / 'paie'))
+    dossier.mkdir(parents=True, exist_ok=True)
+    return dossier
+
+
+def derniere_annee_archivable():
+    return timezone.localdate().year - getattr(settings, 'ARCHIVES_PAIE_ANNEES_CHAUDES', ANNEES_CHAUDES)
+
+
+def annee_archivee(annee):
+    return ArchivePaie.objects.filter(annee=annee).exists()
+
+
+def annees_archivables():
+    """Années encore en table, assez anciennes, dont toutes les fiches sont émises."""
+    return [
+        ligne['annee'] for ligne in FicheDePaie.objects.filter(annee__lte=derniere_annee_archivable())
+        .values('annee').annotate(non_emises=Count('pk', filter=~Q(statut='EMISE'))).order_by('annee')
+        if not ligne['non_emises']
+    ]
+
+
+# --- Écriture ---
+
+def _lignes_detail(modele, champ_nom, cle, fiche_ids):
+    """{fiche_id: [[id du type, nom, montant], ...]} pour un paquet de fiches, en une requête."""
+    details = defaultdict(list)
+    for fiche_id, type_id, nom, montant in modele.objects.filter(fiche_de_paie_id__in=fiche_ids).values_list(
+        'fiche_de_paie_id', cle, champ_nom, 'montant',
+    ).order_by('fiche_de_paie_id', 'pk'):
+        details[fiche_id].append([type_id, nom, str(montant)])
+    return details
+
+
+def lignes_archive(annee, mois):
+    """Lignes JSON (dict) des fiches d'un mois en table, lues par paquets."""
+    projection = FicheDePaie.objects.filter(annee=annee, mois=mois).order_by('pk').values(
+        'pk', 'employe_id', 'mois', 'annee', 'statut', 'date_creation', *CHAMPS_MONTANTS,
+        matricule=F('employe__matricule'), nom=F('employe__nom'),
+        prenom=F('employe__prenom'), departement_id=F('employe__departement_id'),
+    )
+    for paquet in paquets(projection.iterator(chunk_size=TAILLE_PAQUET)):
+        fiche_ids = [ligne['pk'] for ligne in paquet]
+        primes = _lignes_detail(FichePaiePrime, 'prime__nom_prime', 'prime_id', fiche_ids)
+        avantages = _lignes_detail(FichePaieAvantage, 'avantage__nom_avantage', 'avantage_id', fiche_ids)
+        for ligne in paquet:
+            pk = ligne.pop('pk')
+            yield {
+                'id': pk, **ligne,
+                'date_creation': ligne['date_creation'].isoformat(),
+                **{champ: str(ligne[champ]) for champ in CHAMPS_MONTANTS},
+                'primes': primes.get(pk, []), 'avantages': avantages.get(pk, []),
+            }
+
+
+def _verifier(chemin, attendu):
+    """Relit le fichier entier ; renvoie son empreinte si ses totaux sont ceux attendus."""
+    nombre, brute, nette = 0, Decimal(0), Decimal(0)
+    with gzip.open(chemin, 'rt', encoding='utf-8') as fichier:
+        for texte in fichier:
+            ligne = json.loads(texte)
+            nombre += 1
+            brute += Decimal(ligne['salaire_brut'])
+            nette += Decimal(ligne['salaire_net'])
+    if (nombre, brute, nette) != attendu:
+        raise ErreurArchive(
+            f"Archive incohérente : {nombre} fiches, {brute} brut, {nette} net relus "
+            f"pour {attendu[0]} fiches, {attendu[1]} brut, {attendu[2]} net en table."
+        )
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(1 << 20), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def archiver_annee(annee):
+    """
+    Sort les fiches de l'année et leurs lignes des tables vers leur archive ;
+    renvoie l'ArchivePaie créée.
+    """
+    if annee > derniere_annee_archivable():
+        raise ErreurArchive(f"L'année {annee} est trop récente pour être archivée.")
+    if annee_archivee(annee):
+        raise ErreurArchive(f"L'année {annee} est déjà archivée.")
+    fiches = FicheDePaie.objects.filter(annee=annee)
+    totaux = fiches.aggregate(
+        nombre=Count('pk'), non_emises=Count('pk', filter=~Q(statut='EMISE')),
+        brute=Sum('salaire_brut'), nette=Sum('salaire_net'), pk_min=Min('pk'), pk_max=Max('pk'),
+    )
+    if not totaux['nombre']:
+        raise ErreurArchive(f"Aucune fiche de paie en {annee}.")
+    if totaux['non_emises']:
+        raise ErreurArchive(f"{totaux['non_emises']} fiches de {annee} ne sont pas émises.")
+
+    chemin = dossier_archives() / f'paie_{annee}.jsonl.gz'
+    temporaire = chemin.with_name(chemin.name + '.tmp')
+    index_mois, nombre_lignes = {}, 0
+    try:
+        with open(temporaire, 'wb') as fichier:
+            for mois in fiches.values_list('mois', flat=True).distinct().order_by('mois'):
+                position = fichier.tell()
+                with gzip.GzipFile(fileobj=fichier, mode='wb', mtime=0) as membre:
+                    for ligne in lignes_archive(annee, mois):
+                        nombre_lignes += len(ligne['primes']) + len(ligne['avantages'])
+                        membre.write(json.dumps(ligne, ensure_ascii=False).encode('utf-8') + b'\n')
+                index_mois[str(mois)] = [position, fichier.tell() - position]
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        empreinte = _verifier(temporaire, (totaux['nombre'], totaux['brute'], totaux['nette']))
+        os.replace(temporaire, chemin)
+        with transaction.atomic():
+            archive = ArchivePaie.objects.create(
+                annee=annee, fichier=chemin.name, index_mois=index_mois,
+                nombre_fiches=totaux['nombre'], nombre_lignes=nombre_lignes,
+                masse_brute=totaux['brute'], masse_nette=totaux['nette'],
+                pk_min=totaux['pk_min'], pk_max=totaux['pk_max'], empreinte=empreinte,
+            )
+            supprimees = _supprimer_annee(annee)
+            if supprimees != totaux['nombre']:
+                raise ErreurArchive(f"{supprimees} fiches supprimées pour {totaux['nombre']} archivées.")
+    except BaseException:
+        temporaire.unlink(missing_ok=True)
+        if not annee_archivee(annee):
+            chemin.unlink(missing_ok=True)
+        raise
+    return archive
+
+
+def _supprimer_annee(annee):
+    """Supprime en SQL direct, sans signaux, les fiches de l'année et leurs lignes ; renvoie le nombre de fiches."""
+    qn = connection.ops.quote_name
+    table_fiches = qn(FicheDePaie._meta.db_table)
+    with connection.cursor() as curseur:
+        for modele in (FichePaiePrime, FichePaieAvantage):
+            curseur.execute(
+                f"DELETE FROM {qn(modele._meta.db_table)} WHERE {qn('fiche_de_paie_id')} IN "
+                f"(SELECT {qn('id')} FROM {table_fiches} WHERE {qn('annee')} = %s)",
+                [annee],
+            )
+        curseur.execute(f"DELETE FROM {table_fiches} WHERE {qn('annee')} = %s", [annee])
+        return curseur.rowcount
+
+
+# --- Lecture ---
+
+def _archive(annee):
+    archive = ArchivePaie.objects.filter(annee=annee).first()
+    if archive is None:
+        raise ErreurArchive(f"L'année {annee} n'est pas archivée.")
+    return archive
+
+
+def lire(archive, mois=None):
+    """Lignes (dict) d'une archive, ou d'un seul de ses mois."""
+    chemin = dossier_archives() / archive.fichier
+    if mois is None:
+        with gzip.open(chemin, 'rt', encoding='utf-8') as fichier:
+            for texte in fichier:
+                yield json.loads(texte)
+        return
+    if str(mois) not in archive.index_mois:
+        return
+    position, longueur = archive.index_mois[str(mois)]
+    with open(chemin, 'rb') as fichier:
+        fichier.seek(position)
+        contenu = gzip.decompress(fichier.read(longueur))
+    for texte in contenu.splitlines():
+        yield json.loads(texte)
+
+
+def _champs(ligne):
+    """Champs de FicheDePaie d'une ligne d'archive."""
+    return {
+        'id': ligne['id'], 'employe_id': ligne['employe_id'], 'mois': ligne['mois'], 'annee': ligne['annee'],
+        'statut': ligne['statut'], 'date_creation': datetime.datetime.fromisoformat(ligne['date_creation']),
+        **{champ: Decimal(ligne[champ]) for champ in CHAMPS_MONTANTS},
+    }
+
+
+def _fiche(ligne):
+    fiche = FicheDePaieArchivee(**_champs(ligne))
+    fiche.matricule, fiche.nom, fiche.prenom = ligne['matricule'], ligne['nom'], ligne['prenom']
+    fiche.departement_id = ligne['departement_id']
+    fiche.lignes_primes = [(nom, Decimal(montant)) for _, nom, montant in ligne['primes']]
+    fiche.lignes_avantages = [(nom, Decimal(montant)) for _, nom, montant in ligne['avantages']]
+    return fiche
+
+
+def lire_fiches(annee, mois=None):
+    """FicheDePaieArchivee d'une année archivée (ou d'un de ses mois), par mois puis par clé."""
+    return [_fiche(ligne) for ligne in lire(_archive(annee), mois)]
+
+
+def fiches_archivees_employe(employe_id):
+    """Fiches archivées d'un employé, toutes années confondues ; relit chaque archive entière."""
+    return [
+        _fiche(ligne)
+        for archive in ArchivePaie.objects.order_by('annee')
+        for ligne in lire(archive) if ligne['employe_id'] == employe_id
+    ]
+
+
+def fiche_archivee(pk):
+    """FicheDePaieArchivee de clé `pk`, ou None ; seules les archives dont les bornes couvrent pk sont relues."""
+    for archive in ArchivePaie.objects.filter(pk_min__lte=pk, pk_max__gte=pk).order_by('annee'):
+        for ligne in lire(archive):
+            if ligne['id'] == pk:
+                return _fiche(ligne)
+    return None
+
+
+def sommes_par_departement(annee, mois):
+    """Fiches et masses d'un mois archivé par département d'alors, au format de calculer_syntheses."""
+    sommes = defaultdict(lambda: {'nombre_fiches': 0, 'masse_brute': Decimal(0), 'masse_nette': Decimal(0)})
+    for ligne in lire(_archive(annee), mois):
+        somme = sommes[ligne['departement_id']]
+        somme['nombre_fiches'] += 1
+        somme['masse_brute'] += Decimal(ligne['salaire_brut'])
+        somme['masse_nette'] += Decimal(ligne['salaire_net'])
+    return dict(sommes)
+
+
+def lignes_export(annee, mois=None):
+    """En-tête puis une ligne par fiche archivée, au format de exports.lignes_fiches."""
+    yield COLONNES_FICHES
+    for ligne in lire(_archive(annee), mois):
+        yield (
+            ligne['matricule'], ligne['nom'], ligne['prenom'], ligne['mois'], ligne['annee'], ligne['statut'],
+            *(Decimal(ligne[champ]) for champ in CHAMPS_MONTANTS),
+            '; '.join(f"{nom} : {montant}" for _, nom, montant in ligne['primes']),
+            '; '.join(f"{nom} : {montant}" for _, nom, montant in ligne['avantages']),
+        )
+
+
+# --- Restauration ---
+
+def restaurer_annee(annee, taille_lot=TAILLE_PAQUET):
+    """Remet en table les fiches archivées de l'année avec leurs clés d'origine ; renvoie leur nombre."""
+    archive = _archive(annee)
+    chemin = dossier_archives() / archive.fichier
+    nombre = 0
+    try:
+        with transaction.atomic():
+            for paquet in paquets(lire(archive), taille_lot):
+                fiches = FicheDePaie.objects.bulk_create([FicheDePaie(**_champs(ligne)) for ligne in paquet])
+                # bulk_create date les fiches du jour (auto_now_add) : on remet les dates d'origine.
+                for fiche, ligne in zip(fiches, paquet):
+                    fiche.date_creation = datetime.datetime.fromisoformat(ligne['date_creation'])
+                FicheDePaie.objects.bulk_update(fiches, ['date_creation'], batch_size=500)
+                FichePaiePrime.objects.bulk_create([
+                    FichePaiePrime(fiche_de_paie_id=ligne['id'], prime_id=prime_id, montant=Decimal(montant))
+                    for ligne in paquet for prime_id, _, montant in ligne['primes']
+                ])
+                FichePaieAvantage.objects.bulk_create([
+                    FichePaieAvantage(fiche_de_paie_id=ligne['id'], avantage_id=avantage_id, montant=Decimal(montant))
+                    for ligne in paquet for avantage_id, _, montant in ligne['avantages']
+                ])
+                nombre += len(paquet)
+            archive.delete()
+    except IntegrityError as erreur:
+        raise ErreurArchive(
+            f"Restauration de {annee} impossible (employé, prime ou avantage supprimé depuis l'archivage ?) : {erreur}"
+        )
+    chemin.unlink(missing_ok=True)
+    return nombre
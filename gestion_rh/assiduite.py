@@ -0,0 +1,189 @@
+"""
+Agrégats de présence matérialisés : heures travaillées, jours de présence,
+retards et départs non pointés.
+
+Deux tables sont tenues à jour à chaque enregistrement d'une Presence :
+PresenceMensuelle (par employé et par mois) et PresenceServiceJour (par
+service et par jour). Les rapports, la paie et le tableau de bord lisent ces
+agrégats au lieu de parcourir les pointages. Les imports en masse, qui
+contournent les signaux, reconstruisent les périodes touchées avec une
+agrégation faite par la base.
+"""
+import calendar
+import datetime
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, DurationField, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .compteurs import ajuster_compteurs
+from .models import Employe, JourneeTravail, Presence, PresenceMensuelle, PresenceServiceJour
+from .tableau_de_bord import marquer_periodes
+
+# Une arrivée après cette heure compte comme un retard.
+HEURE_LIMITE_ARRIVEE = datetime.time(8, 0)
+
+# Les dates des journées ne changent pas : {journee_id: date} partagé par le processus.
+_dates_journees = {}
+
+
+def etat_presence(presence):
+    """État d'une présence utile aux agrégats : (employe_id, journee_id, arrivée, départ)."""
+    return presence.employe_id, presence.journee_id, presence.heure_arrivee, presence.heure_depart
+
+
+def secondes_entre(arrivee, depart):
+    if depart is None or depart <= arrivee:
+        return 0
+    jour = datetime.date.min
+    return int((datetime.datetime.combine(jour, depart) - datetime.datetime.combine(jour, arrivee)).total_seconds())
+
+
+def contribution(arrivee, depart):
+    """Compteurs apportés par un pointage à ses agrégats."""
+    return {
+        'jours_presents': 1,
+        'secondes_travaillees': secondes_entre(arrivee, depart),
+        'retards': int(arrivee > HEURE_LIMITE_ARRIVEE),
+        'departs_manquants': int(depart is None),
+    }
+
+
+def dates_journees(journee_ids):
+    manquantes = set(journee_ids) - _dates_journees.keys()
+    if manquantes:
+        _dates_journees.update(
+            JourneeTravail.objects.filter(pk__in=manquantes).values_list('pk', 'date_journee')
+        )
+    return _dates_journees
+
+
+def repercuter_presences(transitions):
+    """
+    Répercute des changements de présences sur les agrégats.
+
+    `transitions` est une liste de couples (état avant, état après) tels que
+    renvoyés par etat_presence(), None représentant une présence absente.
+    """
+    transitions = [(avant, apres) for avant, apres in transitions if avant != apres]
+    etats = [etat for transition in transitions for etat in transition if etat]
+    if not etats:
+        return
+    dates = dates_journees({etat[1] for etat in etats})
+    services = dict(Employe.objects.filter(pk__in={etat[0] for etat in etats}).values_list('pk', 'departement_id'))
+    mensuelles = defaultdict(lambda: defaultdict(int))
+    journalieres = defaultdict(lambda: defaultdict(int))
+    for avant, apres in transitions:
+        for etat, signe in ((avant, -1), (apres, 1)):
+            if not etat:
+                continue
+            employe_id, journee_id, arrivee, depart = etat
+            date = dates.get(journee_id)
+            if date is None:
+                continue
+            for champ, valeur in contribution(arrivee, depart).items():
+                mensuelles[(employe_id, date.year, date.month)][champ] += signe * valeur
+                if employe_id in services:
+                    journalieres[(services[employe_id], date)][champ] += signe * valeur
+    with transaction.atomic():
+        ajuster_compteurs(PresenceMensuelle, ('employe_id', 'annee', 'mois'), mensuelles)
+        ajuster_compteurs(PresenceServiceJour, ('departement_id', 'date'), journalieres)
+        marquer_periodes({(date.year, date.month) for _, date in journalieres})
+
+
+def _agreger(queryset):
+    """Annotations communes des deux reconstructions, calculées par la base."""
+    duree = ExpressionWrapper(F('heure_depart') - F('heure_arrivee'), output_field=DurationField())
+    return queryset.annotate(
+        jours_presents=Count('id'),
+        duree=Sum(duree, filter=Q(heure_depart__gt=F('heure_arrivee'))),
+        retards=Count('id', filter=Q(heure_arrivee__gt=HEURE_LIMITE_ARRIVEE)),
+        departs_manquants=Count('id', filter=Q(heure_depart__isnull=True)),
+    ).order_by()
+
+
+def _compteurs(ligne):
+    return {
+        'jours_presents': ligne['jours_presents'],
+        'secondes_travaillees': int(ligne['duree'].total_seconds()) if ligne['duree'] else 0,
+        'retards': ligne['retards'],
+        'departs_manquants': ligne['departs_manquants'],
+    }
+
+
+def changer_service_presences(employe_id, ancien, nouveau):
+    """
+    Déplace les pointages d'un employé qui change de service vers son nouveau
+    service : PresenceServiceJour suit le service actuel, comme la reconstruction.
+    """
+    variations = defaultdict(lambda: defaultdict(int))
+    with transaction.atomic():
+        lignes = _agreger(Presence.objects.filter(employe_id=employe_id).values(date=F('journee__date_journee')))
+        for ligne in lignes:
+            for champ, valeur in _compteurs(ligne).items():
+                variations[(ancien, ligne['date'])][champ] -= valeur
+                variations[(nouveau, ligne['date'])][champ] += valeur
+        ajuster_compteurs(PresenceServiceJour, ('departement_id', 'date'), variations)
+        marquer_periodes({(date.year, date.month) for _, date in variations})
+
+
+def reconstruire_agregats_presence(dates=None):
+    """
+    Recalcule les agrégats à partir des pointages par agrégation en base.
+
+    Sans argument, tout est recalculé. Avec un ensemble de `dates`, seuls les
+    mois concernés (PresenceMensuelle) et ces journées (PresenceServiceJour)
+    le sont. Renvoie le nombre de lignes mensuelles et journalières écrites.
+    """
+    presences = Presence.objects.all()
+    mensuelles_cibles = PresenceMensuelle.objects.all()
+    journalieres_cibles = PresenceServiceJour.objects.all()
+    presences_jour = presences
+    if dates is not None:
+        dates = set(dates)
+        if not dates:
+            return 0, 0
+        mois = {(d.year, d.month) for d in dates}
+        presences = presences.filter(reduce(or_, (
+            Q(journee__date_journee__range=(
+                datetime.date(a, m, 1), datetime.date(a, m, calendar.monthrange(a, m)[1]),
+            )) for a, m in mois
+        )))
+        mensuelles_cibles = mensuelles_cibles.filter(reduce(or_, (Q(annee=a, mois=m) for a, m in mois)))
+        presences_jour = Presence.objects.filter(journee__date_journee__in=dates)
+        journalieres_cibles = journalieres_cibles.filter(date__in=dates)
+
+    # Lecture et réécriture dans la même transaction : un pointage enregistré
+    # entre les deux serait sinon effacé par la suppression des agrégats.
+    with transaction.atomic():
+        mensuelles = [
+            PresenceMensuelle(
+                employe_id=ligne['employe_id'], annee=ligne['annee'], mois=ligne['mois'], **_compteurs(ligne),
+            )
+            for ligne in _agreger(presences.values(
+                'employe_id',
+                annee=ExtractYear('journee__date_journee'),
+                mois=ExtractMonth('journee__date_journee'),
+            ))
+        ]
+        journalieres = [
+            PresenceServiceJour(departement_id=ligne['employe__departement'], date=ligne['date'], **_compteurs(ligne))
+            for ligne in _agreger(presences_jour.values('employe__departement', date=F('journee__date_journee')))
+        ]
+        mensuelles_cibles.delete()
+        journalieres_cibles.delete()
+        PresenceMensuelle.objects.bulk_create(mensuelles, batch_size=1000)
+        PresenceServiceJour.objects.bulk_create(journalieres, batch_size=1000)
+        marquer_periodes({(m.annee, m.mois) for m in mensuelles} | {(d.year, d.month) for d in dates or ()})
+    return len(mensuelles), len(journalieres)
+
+
+def presences_du_mois(employe_ids, annee, mois):
+    """Renvoie {employe_id: PresenceMensuelle} en une requête (paie, rapports)."""
+    agregats = {
+        a.employe_id: a for a in PresenceMensuelle.objects.filter(employe_id__in=employe_ids, annee=annee, mois=mois)
+    }
+    return {e: agregats.get(e) or PresenceMensuelle(employe_id=e, annee=annee, mois=mois) for e in employe_ids}
@@ -0,0 +1,132 @@
+"""
+Saisie semi-automatique des clés étrangères dans les formulaires.
+
+Un forms.Select sur une ModelChoiceField rend une <option> par ligne de la
+table (et appelle __str__ sur chacune) : avec des milliers d'employés ou des
+années de journées de travail, chaque formulaire pèse plusieurs mégaoctets.
+Le widget Autocompletion ne rend que la valeur sélectionnée ; les choix
+arrivent à la demande, par pages de TAILLE_PAGE, depuis AutocompletionView
+(script gestion_rh/autocompletion.js, chargé par base.html).
+
+La validation ne change pas : ModelChoiceField ne cherche que la clé
+soumise (queryset.get(pk=...)). Le coût d'un formulaire ne dépend donc plus
+de la taille des tables.
+
+Chaque source (@source) reçoit le texte saisi et la tranche [debut, fin) à
+renvoyer, et répond une liste de (clé, libellé) lue par un index.
+"""
+import datetime
+import re
+from dataclasses import dataclass
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+
+from .annuaire import rechercher
+from .models import Employe, JourneeTravail, Utilisateur
+
+TAILLE_PAGE = 20
+PAGES_MAX = 10
+
+# {nom: Source}
+SOURCES = {}
+
+
+@dataclass
+class Source:
+    nom: str
+    fonction: object  # fonction(requete, debut, fin) -> [(clé, libellé)]
+    rh_seulement: bool = False
+
+
+def source(nom, rh_seulement=False):
+    """Décorateur qui enregistre une fonction(requete, debut, fin) comme source de choix."""
+    def enregistrer(fonction):
+        SOURCES[nom] = Source(nom, fonction, rh_seulement)
+        return fonction
+    return enregistrer
+
+
+class Autocompletion(forms.Select):
+    """Select d'une ModelChoiceField qui ne rend que l'option choisie ; les autres sont cherchées à la saisie."""
+
+    def __init__(self, nom_source, attrs=None):
+        attrs = {'class': 'form-select', **(attrs or {})}
+        attrs['data-autocompletion'] = reverse_lazy('autocompletion', args=[nom_source])
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        # Ne parcourt pas self.choices (toute la table) : seules les clés sélectionnées sont lues.
+        champ = self.choices.field
+        options = []
+        if champ.empty_label is not None:
+            options.append(self.create_option(name, '', champ.empty_label, not any(value), 0))
+        cles = [cle for cle in value if cle not in ('', None)]
+        try:
+            objets = list(self.choices.queryset.filter(pk__in=cles)) if cles else []
+        except (ValidationError, ValueError):
+            objets = []  # Valeur soumise mal formée : le formulaire signale déjà l'erreur.
+        for index, objet in enumerate(objets, start=len(options)):
+            options.append(self.create_option(name, str(objet.pk), champ.label_from_instance(objet), True, index))
+        return [(None, options, 0)]
+
+
+# --- Sources ---
+
+@source('employes')
+def employes(requete, debut, fin):
+    """Recherche de l'annuaire (préfixes, fautes de frappe) ; sans texte, ordre alphabétique."""
+    if requete:
+        fiches = rechercher(requete, fin)[debut:fin]
+    else:
+        fiches = Employe.objects.order_by('nom', 'pk').values('pk', 'prenom', 'nom', 'matricule')[debut:fin]
+    return [(fiche['pk'], f"{fiche['prenom']} {fiche['nom']} ({fiche['matricule']})") for fiche in fiches]
+
+
+def bornes_dates(requete):
+    """
+    Intervalle [début, fin) de dates désigné par le texte saisi : année
+    (2024), mois (2024-03, 03/2024) ou jour (2024-03-15, 15/03/2024).
+    None si le texte n'est pas une date.
+    """
+    nombres = [int(n) for n in re.findall(r'\d+', requete)]
+    if not nombres:
+        return None
+    if len(str(nombres[0])) != 4:
+        nombres.reverse()  # jj/mm/aaaa ou mm/aaaa
+    try:
+        if len(nombres) == 1:
+            return datetime.date(nombres[0], 1, 1), datetime.date(nombres[0] + 1, 1, 1)
+        if len(nombres) == 2:
+            annee, mois = nombres
+            debut = datetime.date(annee, mois, 1)
+            return debut, (debut + datetime.timedelta(days=31)).replace(day=1)
+        jour = datetime.date(*nombres[:3])
+        return jour, jour + datetime.timedelta(days=1)
+    except (ValueError, OverflowError):
+        return None
+
+
+@source('journees')
+def journees(requete, debut, fin):
+    """Journées de travail, les plus récentes d'abord, filtrées par année, mois ou jour."""
+    journees = JourneeTravail.objects.order_by('-date_journee')
+    if requete:
+        bornes = bornes_dates(requete)
+        if bornes is None:
+            return []
+        journees = journees.filter(date_journee__gte=bornes[0], date_journee__lt=bornes[1])
+    return [
+        (pk, date.strftime('%Y-%m-%d'))
+        for pk, date in journees.values_list('pk', 'date_journee')[debut:fin]
+    ]
+
+
+@source('utilisateurs', rh_seulement=True)
+def utilisateurs(requete, debut, fin):
+    """Comptes par préfixe du nom d'utilisateur (parcours de l'index unique)."""
+    comptes = Utilisateur.objects.order_by('username')
+    if requete:
+        comptes = comptes.filter(username__gte=requete, username__lt=requete + '\uffff')
+    return list(comptes.values_list('pk', 'username')[debut:fin])
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class RoleModelBackend(ModelBackend):
+    """
+    ModelBackend qui charge le rôle en même temps que l'utilisateur.
+
+    get_user() est appelé par AuthenticationMiddleware à chaque requête : avec
+    select_related('role'), les mixins de permissions n'ont plus besoin d'une
+    requête supplémentaire sur Role.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        queryset = UserModel._default_manager.all()
+        if any(f.name == 'role' for f in UserModel._meta.get_fields()):
+            queryset = queryset.select_related('role')
+        try:
+            user = queryset.get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        """get_user() par l'ORM asynchrone, pour request.auser() dans les vues ASGI."""
+        UserModel = get_user_model()
+        queryset = UserModel._default_manager.all()
+        if any(f.name == 'role' for f in UserModel._meta.get_fields()):
+            queryset = queryset.select_related('role')
+        try:
+            user = await queryset.aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
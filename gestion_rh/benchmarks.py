@@ -0,0 +1,316 @@
+"""
+Suite de mesures de performance des chemins critiques.
+
+Chaque scénario (@scenario) exécute une opération représentative : listes
+et détails par le client de test de Django (middlewares, permissions,
+pagination et rendu compris), exports en flux consommés jusqu'au bout,
+calcul de paie et vérification de congé appelés directement. Un scénario
+est d'abord exécuté à vide (échauffement : caches, connexion), puis chaque
+itération est chronométrée et ses requêtes SQL comptées.
+
+Les gabarits rh/*.html ne sont pas livrés avec l'application : un gabarit
+absent est remplacé par un gabarit neutre qui parcourt object_list et
+affiche object, de sorte que le rendu coûte au moins ce que coûterait la
+page (et révèle les N+1 d'un {{ objet }} sans select_related). Un gabarit
+présent est utilisé tel quel.
+
+Les résultats se comparent d'une exécution à l'autre (comparer) : un p95
+au-delà de la tolérance ou un nombre de requêtes en hausse est une
+régression. Les comparaisons n'ont de sens qu'à volumes égaux, d'où les
+volumes enregistrés avec les résultats (voir generation.generer_donnees).
+"""
+import datetime
+import random
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+from django.template import Origin
+from django.template.loaders.base import Loader
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .conges import verifier_conge
+from .instrumentation import Collecte
+from .mesures import resume_latences
+from .models import Conge, Departement, Employe, FicheDePaie, Presence, Role, Utilisateur
+from .paie import lancer_paie
+
+NOM_UTILISATEUR = 'bench_rh'
+GABARIT_NEUTRE = '{% for objet in object_list %}{{ objet }}\n{% endfor %}{{ object }}'
+# En dessous de cet écart, une hausse du p95 est du bruit de mesure.
+ECART_MIN_MS = 2.0
+
+# {nom: Scenario}
+SCENARIOS = {}
+
+
+class ErreurBenchmark(Exception):
+    """Un scénario n'a pas pu s'exécuter (réponse HTTP inattendue, données absentes)."""
+
+
+@dataclass
+class Scenario:
+    nom: str
+    fonction: object  # fonction(contexte), une itération
+    seuil_ms: float  # p95 maximal admis
+    description: str = ''
+
+
+def scenario(nom, seuil_ms):
+    """Décorateur qui enregistre une fonction(contexte) comme scénario de mesure."""
+    def enregistrer(fonction):
+        SCENARIOS[nom] = Scenario(nom, fonction, seuil_ms, (fonction.__doc__ or '').strip())
+        return fonction
+    return enregistrer
+
+
+class ChargeurGabaritNeutre(Loader):
+    """Dernier chargeur de la chaîne : fournit le gabarit neutre pour tout nom non trouvé ailleurs."""
+
+    def get_template_sources(self, template_name):
+        yield Origin(name=f'neutre:{template_name}', template_name=template_name, loader=self)
+
+    def get_contents(self, origin):
+        return GABARIT_NEUTRE
+
+
+def gabarits_de_mesure():
+    """TEMPLATES des mesures : les chargeurs habituels, puis le gabarit neutre."""
+    gabarits = []
+    for moteur in settings.TEMPLATES:
+        options = dict(moteur.get('OPTIONS', {}))
+        if moteur['BACKEND'] == 'django.template.backends.django.DjangoTemplates':
+            options['loaders'] = [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+                'gestion_rh.benchmarks.ChargeurGabaritNeutre',
+            ]
+        gabarits.append({**moteur, 'APP_DIRS': False, 'OPTIONS': options})
+    return gabarits
+
+
+@dataclass
+class Contexte:
+    """Client connecté avec le rôle RH et échantillons de clés tirés des données en base."""
+    client: Client
+    rng: random.Random
+    employes: list
+    noms: list
+    fiches: list
+    departements: list
+    periode: tuple  # (annee, mois) de la paie la plus récente
+
+    def get(self, nom_url, *args, **parametres):
+        """GET sur une vue nommée ; le contenu, en flux ou non, est lu en entier."""
+        reponse = self.client.get(reverse(nom_url, args=args), parametres)
+        if reponse.status_code != 200:
+            raise ErreurBenchmark(f"{nom_url} : réponse HTTP {reponse.status_code}")
+        if reponse.streaming:
+            for _ in reponse.streaming_content:
+                pass
+        else:
+            reponse.content
+        return reponse
+
+
+def preparer_contexte(graine=0, taille_echantillon=200):
+    """Contexte de mesure ; lève ErreurBenchmark si la base n'a pas de données à mesurer."""
+    echantillon = list(Employe.objects.order_by('?').values_list('pk', 'nom')[:taille_echantillon])
+    derniere = FicheDePaie.objects.order_by('-annee', '-mois').values_list('annee', 'mois').first()
+    if not echantillon or derniere is None:
+        raise ErreurBenchmark("Aucun employé ou aucune fiche de paie en base : lancez d'abord generer_donnees.")
+    role = Role.objects.get_or_create(nom_role=Role.RH)[0]
+    utilisateur, _ = Utilisateur.objects.get_or_create(username=NOM_UTILISATEUR, defaults={'role': role})
+    if utilisateur.role_id != role.pk:
+        utilisateur.role = role
+        utilisateur.save(update_fields=['role'])
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(utilisateur)
+    return Contexte(
+        client=client,
+        rng=random.Random(graine),
+        employes=[pk for pk, _ in echantillon],
+        noms=[nom for _, nom in echantillon],
+        fiches=list(FicheDePaie.objects.order_by('?').values_list('pk', flat=True)[:taille_echantillon]),
+        departements=list(Departement.objects.values_list('pk', flat=True)),
+        periode=derniere,
+    )
+
+
+def volumes():
+    """Volumes des tables mesurées, enregistrés avec les résultats."""
+    return {
+        'employes': Employe.objects.count(),
+        'presences': Presence.objects.count(),
+        'conges': Conge.objects.count(),
+        'fiches_de_paie': FicheDePaie.objects.count(),
+    }
+
+
+@dataclass
+class ResultatScenario:
+    nom: str
+    latences: dict
+    requetes: float  # moyenne par itération
+    seuil_ms: float
+
+    @property
+    def depasse_seuil(self):
+        return self.latences['p95_ms'] > self.seuil_ms
+
+    def en_dict(self):
+        return {**self.latences, 'requetes': self.requetes, 'seuil_ms': self.seuil_ms}
+
+
+def executer(scenario, contexte, iterations=20, echauffement=2):
+    """Exécute un scénario et renvoie son ResultatScenario."""
+    for _ in range(echauffement):
+        scenario.fonction(contexte)
+    durees, requetes = [], 0
+    for _ in range(iterations):
+        collecte = Collecte()
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(collecte))
+            debut = time.perf_counter()
+            scenario.fonction(contexte)
+            durees.append(time.perf_counter() - debut)
+        requetes += collecte.nombre
+    return ResultatScenario(scenario.nom, resume_latences(durees), requetes / max(1, iterations), scenario.seuil_ms)
+
+
+def executer_suite(noms=None, iterations=20, echauffement=2, graine=0, rappel=None):
+    """
+    Exécute les scénarios demandés (tous par défaut) ; `rappel`, s'il est
+    fourni, reçoit chaque ResultatScenario dès qu'il est connu.
+    """
+    inconnus = set(noms or ()) - set(SCENARIOS)
+    if inconnus:
+        raise ErreurBenchmark(f"Scénarios inconnus : {', '.join(sorted(inconnus))}")
+    # Les mesures portent sur l'application : l'instrumentation des vues est coupée.
+    with override_settings(TEMPLATES=gabarits_de_mesure(), INSTRUMENTATION_TAUX=0):
+        contexte = preparer_contexte(graine)
+        resultats = []
+        for nom in noms or SCENARIOS:
+            resultat = executer(SCENARIOS[nom], contexte, iterations, echauffement)
+            resultats.append(resultat)
+            if rappel:
+                rappel(resultat)
+    return resultats
+
+
+@dataclass
+class Regression:
+    nom: str
+    motifs: list = field(default_factory=list)
+
+
+def comparer(resultats, reference, tolerance=0.2):
+    """
+    Compare des résultats à une exécution de référence (dict lu du JSON) ;
+    renvoie les Regression des scénarios présents des deux côtés.
+    """
+    regressions = []
+    for resultat in resultats:
+        ancien = reference.get('scenarios', {}).get(resultat.nom)
+        if ancien is None:
+            continue
+        motifs = []
+        p95, ancien_p95 = resultat.latences['p95_ms'], ancien['p95_ms']
+        if p95 > ancien_p95 * (1 + tolerance) and p95 - ancien_p95 > ECART_MIN_MS:
+            motifs.append(f"p95 {ancien_p95:.1f}ms -> {p95:.1f}ms")
+        if round(resultat.requetes, 1) > round(ancien['requetes'], 1):
+            motifs.append(f"requêtes SQL {ancien['requetes']:.1f} -> {resultat.requetes:.1f}")
+        if motifs:
+            regressions.append(Regression(resultat.nom, motifs))
+    return regressions
+
+
+# --- Scénarios ---
+
+@scenario('employes_liste', seuil_ms=250)
+def employes_liste(contexte):
+    """Liste paginée des employés."""
+    contexte.get('employe_list')
+
+
+@scenario('employes_liste_departement', seuil_ms=250)
+def employes_liste_departement(contexte):
+    """Liste des employés filtrée par département."""
+    contexte.get('employe_list', departement=contexte.rng.choice(contexte.departements))
+
+
+@scenario('employe_detail', seuil_ms=150)
+def employe_detail(contexte):
+    """Fiche d'un employé."""
+    contexte.get('employe_detail', contexte.rng.choice(contexte.employes))
+
+
+@scenario('annuaire_recherche', seuil_ms=100)
+def annuaire_recherche(contexte):
+    """Recherche par préfixe de nom dans l'annuaire."""
+    contexte.get('annuaire_recherche', q=contexte.rng.choice(contexte.noms)[:3])
+
+
+@scenario('conges_liste', seuil_ms=250)
+def conges_liste(contexte):
+    """Liste des congés à traiter par le RH."""
+    contexte.get('conge_gestion_list', statut='DEMANDE')
+
+
+@scenario('presences_liste', seuil_ms=250)
+def presences_liste(contexte):
+    """Liste des pointages d'un département."""
+    contexte.get('presence_list', departement=contexte.rng.choice(contexte.departements))
+
+
+@scenario('fiches_paie_liste', seuil_ms=250)
+def fiches_paie_liste(contexte):
+    """Liste des fiches de paie du dernier mois."""
+    annee, mois = contexte.periode
+    contexte.get('fiche_paie_list', annee=annee, mois=mois)
+
+
+@scenario('fiche_paie_detail', seuil_ms=150)
+def fiche_paie_detail(contexte):
+    """Détail d'une fiche de paie."""
+    contexte.get('fiche_paie_detail', contexte.rng.choice(contexte.fiches))
+
+
+@scenario('tableau_de_bord', seuil_ms=300)
+def tableau_de_bord(contexte):
+    """Tableau de bord RH sur douze mois."""
+    contexte.get('tableau_de_bord')
+
+
+@scenario('export_fiches_paie', seuil_ms=3000)
+def export_fiches_paie(contexte):
+    """Export CSV des fiches de paie du dernier mois et de leurs lignes."""
+    annee, mois = contexte.periode
+    contexte.get('fiche_paie_export', format='csv', annee=annee, mois=mois)
+
+
+@scenario('export_presences', seuil_ms=3000)
+def export_presences(contexte):
+    """Export CSV des pointages d'un département."""
+    contexte.get('presence_export', format='csv', departement=contexte.rng.choice(contexte.departements))
+
+
+@scenario('verification_conge', seuil_ms=20)
+def verification_conge(contexte):
+    """Vérification de chevauchement et de capacité d'équipe d'une demande de congé."""
+    employe_id = contexte.rng.choice(contexte.employes)
+    annee, mois = contexte.periode
+    debut = datetime.date(annee, mois, 1) + datetime.timedelta(days=contexte.rng.randrange(28))
+    verifier_conge(employe_id, debut, debut + datetime.timedelta(days=contexte.rng.randrange(1, 10)))
+
+
+@scenario('calcul_paie_departement', seuil_ms=5000)
+def calcul_paie_departement(contexte):
+    """Recalcul de la paie du dernier mois pour un département."""
+    annee, mois = contexte.periode
+    lancer_paie(mois, annee, queryset=Employe.objects.filter(departement_id=contexte.rng.choice(contexte.departements)))
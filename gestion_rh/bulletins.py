@@ -0,0 +1,204 @@
+"""
+Production en masse des bulletins de paie PDF.
+
+Chaque bulletin est identifié par l'empreinte SHA-256 de son contenu (en-tête,
+lignes de primes et d'avantages, retenues, net, version de la mise en page).
+Les PDF sont rangés dans un cache sous cette empreinte : un bulletin dont le
+contenu n'a pas changé, en particulier une fiche EMISE, n'est jamais rendu
+deux fois. Les bulletins manquants sont rendus par un pool de processus qui
+ne reçoit que des données, par fenêtres de taille fixe, avec des workers
+recyclés régulièrement pour borner leur mémoire.
+
+Une fiche modifiée change d'empreinte et laisse son ancien PDF derrière
+elle : purger_cache() supprime les PDF qui ne correspondent plus à aucune
+fiche. Chaque bulletin servi depuis le cache y est daté de nouveau, si bien
+qu'un PDF utilisé depuis moins de AGE_MINIMAL_PURGE n'est jamais supprimé
+(export en cours, fiche archivée consultée).
+"""
+import datetime
+import hashlib
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+
+from .archives_paie import CHAMPS_MONTANTS
+from .exports import Tampon, paquets
+from .models import Departement, Employe, FicheDePaie, FichePaieAvantage, FichePaiePrime
+from .pdf import VERSION_GABARIT, rendre_dans_cache
+
+# Nombre de bulletins soumis au pool à la fois, et durée de vie d'un worker.
+TAILLE_FENETRE = 200
+TACHES_PAR_WORKER = 500
+# Un PDF du cache servi ou rendu depuis moins longtemps n'est jamais purgé.
+AGE_MINIMAL_PURGE = datetime.timedelta(days=1)
+
+
+@dataclass
+class ResultatRendu:
+    """Bilan d'une production de bulletins."""
+    bulletins: int = 0
+    rendus: int = 0
+    en_cache: int = 0
+    duree: float = 0.0
+
+    @property
+    def pages_par_seconde(self):
+        return self.rendus / self.duree if self.duree else 0.0
+
+
+def dossier_cache():
+    dossier = Path(getattr(settings, 'BULLETINS_CACHE_DIR', Path(settings.BASE_DIR) / 'cache' / 'bulletins'))
+    dossier.mkdir(parents=True, exist_ok=True)
+    return dossier
+
+
+def chemin_bulletin(bulletin):
+    return dossier_cache() / f"{bulletin['empreinte']}.pdf"
+
+
+def nom_fichier(bulletin):
+    return f"bulletin_{bulletin['matricule']}_{bulletin['annee']}-{bulletin['mois']:02d}.pdf"
+
+
+def _lignes_par_fiche(modele, champ_nom, fiche_ids):
+    lignes = {}
+    for fiche_id, nom, montant in modele.objects.filter(fiche_de_paie_id__in=fiche_ids).values_list(
+        'fiche_de_paie_id', champ_nom, 'montant',
+    ).order_by('fiche_de_paie_id', 'pk'):
+        lignes.setdefault(fiche_id, []).append((nom, str(montant)))
+    return lignes
+
+
+def donnees_bulletins(queryset):
+    """
+    Génère le contenu de chaque bulletin sous forme de dictionnaire, avec son empreinte.
+
+    Lecture par paquets : une requête pour les fiches et une par type de
+    ligne (primes, avantages) pour chaque paquet.
+    """
+    projection = queryset.order_by('pk').values(
+        'pk', 'mois', 'annee', 'statut', 'salaire_brut', 'total_primes', 'total_avantages',
+        'cotisations_sociales', 'impot_sur_revenu', 'salaire_net',
+        matricule=F('employe__matricule'), nom=F('employe__nom'), prenom=F('employe__prenom'),
+        service=F('employe__departement__nom'), poste=F('employe__poste__intitule'),
+    )
+    for paquet in paquets(projection.iterator(chunk_size=TAILLE_FENETRE), TAILLE_FENETRE):
+        fiche_ids = [fiche['pk'] for fiche in paquet]
+        primes = _lignes_par_fiche(FichePaiePrime, 'prime__nom_prime', fiche_ids)
+        avantages = _lignes_par_fiche(FichePaieAvantage, 'avantage__nom_avantage', fiche_ids)
+        for fiche in paquet:
+            bulletin = {cle: (str(v) if cle not in ('pk', 'mois', 'annee') else v) for cle, v in fiche.items()}
+            bulletin['primes'] = primes.get(fiche['pk'], [])
+            bulletin['avantages'] = avantages.get(fiche['pk'], [])
+            yield _avec_empreinte(bulletin)
+
+
+def _avec_empreinte(bulletin):
+    contenu = {cle: v for cle, v in bulletin.items() if cle != 'pk'}
+    contenu['version'] = VERSION_GABARIT
+    bulletin['empreinte'] = hashlib.sha256(json.dumps(contenu, sort_keys=True).encode()).hexdigest()
+    return bulletin
+
+
+def donnees_bulletin_archive(fiche):
+    """
+    Contenu du bulletin d'une FicheDePaieArchivee, au format de donnees_bulletins.
+
+    L'archive garde l'identité et le département de l'employé au moment de
+    l'archivage, pas son poste : c'est le poste actuel qui est imprimé.
+    """
+    bulletin = {
+        'pk': fiche.pk, 'mois': fiche.mois, 'annee': fiche.annee, 'statut': fiche.statut,
+        **{champ: str(getattr(fiche, champ)) for champ in CHAMPS_MONTANTS},
+        'matricule': fiche.matricule, 'nom': fiche.nom, 'prenom': fiche.prenom,
+        'service': Departement.objects.filter(pk=fiche.departement_id).values_list('nom', flat=True).first() or '',
+        'poste': Employe.objects.filter(pk=fiche.employe_id).values_list('poste__intitule', flat=True).first() or '',
+        'primes': [(nom, str(montant)) for nom, montant in fiche.lignes_primes],
+        'avantages': [(nom, str(montant)) for nom, montant in fiche.lignes_avantages],
+    }
+    return _avec_empreinte(bulletin)
+
+
+class ProductionBulletins:
+    """
+    Itère sur des bulletins en s'assurant que leur PDF est en cache.
+
+    Les bulletins sont traités par fenêtres de TAILLE_FENETRE : seuls ceux dont
+    l'empreinte n'est pas encore en cache partent au pool, et les workers sont
+    remplacés après TACHES_PAR_WORKER rendus. Le bilan se lit dans `resultat`
+    pendant ou après l'itération.
+    """
+
+    def __init__(self, bulletins, nb_workers=1):
+        self.bulletins = bulletins
+        self.nb_workers = nb_workers
+        self.resultat = ResultatRendu()
+
+    def __iter__(self):
+        dossier = dossier_cache()
+        rendre = partial(rendre_dans_cache, dossier=str(dossier))
+        debut = time.perf_counter()
+        pool = None
+        if self.nb_workers > 1:
+            pool = ProcessPoolExecutor(max_workers=self.nb_workers, max_tasks_per_child=TACHES_PAR_WORKER)
+        try:
+            for fenetre in paquets(self.bulletins, TAILLE_FENETRE):
+                a_rendre = []
+                for bulletin in fenetre:
+                    try:
+                        # Date d'utilisation : le PDF échappe à la purge pendant AGE_MINIMAL_PURGE.
+                        os.utime(dossier / f"{bulletin['empreinte']}.pdf")
+                    except FileNotFoundError:
+                        a_rendre.append(bulletin)
+                if pool is not None:
+                    pages = sum(pool.map(rendre, a_rendre))
+                else:
+                    pages = sum(rendre(b) for b in a_rendre)
+                self.resultat.bulletins += len(fenetre)
+                self.resultat.rendus += pages
+                self.resultat.en_cache += len(fenetre) - len(a_rendre)
+                self.resultat.duree = time.perf_counter() - debut
+                yield from fenetre
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+
+def purger_cache(age_minimal=AGE_MINIMAL_PURGE):
+    """
+    Supprime du cache les PDF qui ne correspondent plus à aucune fiche (et les
+    fichiers temporaires abandonnés) inutilisés depuis `age_minimal`.
+    Renvoie le nombre de fichiers supprimés.
+    """
+    dossier = dossier_cache()
+    limite = time.time() - age_minimal.total_seconds()
+    empreintes = {bulletin['empreinte'] for bulletin in donnees_bulletins(FicheDePaie.objects.all())}
+    supprimes = 0
+    for chemin in dossier.iterdir():
+        if chemin.suffix not in ('.pdf', '.tmp') or (chemin.suffix == '.pdf' and chemin.stem in empreintes):
+            continue
+        try:
+            if chemin.stat().st_mtime < limite:
+                chemin.unlink()
+                supprimes += 1
+        except FileNotFoundError:
+            pass  # Supprimé entre-temps par une autre purge.
+    return supprimes
+
+
+def flux_archive(bulletins):
+    """Génère une archive ZIP des PDF de `bulletins` (déjà présents en cache), en flux."""
+    tampon = Tampon()
+    with zipfile.ZipFile(tampon, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for bulletin in bulletins:
+            archive.write(chemin_bulletin(bulletin), nom_fichier(bulletin))
+            yield tampon.vider()
+    yield tampon.vider()
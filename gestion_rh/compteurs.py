@@ -0,0 +1,51 @@
+"""
+Mise à jour groupée de compteurs matérialisés (soldes, absences, présences...).
+
+Les variations sont cumulées en mémoire puis écrites en quelques requêtes :
+création en masse des lignes manquantes, puis un UPDATE ... SET x = x + n par
+combinaison de variations distincte.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+
+def ajuster_compteurs(modele, champs_cle, variations):
+    """
+    Applique des variations {clé: {champ: delta}} aux lignes de `modele`.
+
+    La clé est un tuple de valeurs pour `champs_cle`. Les lignes manquantes
+    sont créées à zéro (uniquement pour des variations contenant un delta
+    positif : une ligne à décrémenter a forcément déjà été comptée), puis
+    les lignes partageant les mêmes deltas sont mises à jour ensemble.
+    """
+    variations = {
+        cle: {champ: delta for champ, delta in deltas.items() if delta}
+        for cle, deltas in variations.items()
+    }
+    variations = {cle: deltas for cle, deltas in variations.items() if deltas}
+    if not variations:
+        return
+    filtre = {f'{champ}__in': {cle[i] for cle in variations} for i, champ in enumerate(champs_cle)}
+    with transaction.atomic():
+        existantes = {
+            tuple(cle): pk for pk, *cle in modele.objects.filter(**filtre).values_list('pk', *champs_cle)
+        }
+        manquantes = [
+            cle for cle, deltas in variations.items()
+            if cle not in existantes and any(delta > 0 for delta in deltas.values())
+        ]
+        if manquantes:
+            modele.objects.bulk_create(
+                [modele(**dict(zip(champs_cle, cle))) for cle in manquantes], ignore_conflicts=True,
+            )
+            existantes.update(
+                (tuple(cle), pk) for pk, *cle in modele.objects.filter(**filtre).values_list('pk', *champs_cle)
+            )
+        par_deltas = defaultdict(list)
+        for cle, deltas in variations.items():
+            if cle in existantes:
+                par_deltas[tuple(sorted(deltas.items()))].append(existantes[cle])
+        for deltas, pks in par_deltas.items():
+            modele.objects.filter(pk__in=pks).update(**{champ: F(champ) + delta for champ, delta in deltas})
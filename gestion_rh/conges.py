@@ -0,0 +1,282 @@
+"""
+Soldes de congés et absences par service tenus à jour de façon incrémentale.
+
+Chaque validation (ou dévalidation) d'un Conge ajuste le SoldeConge de
+l'employé pour l'année concernée et les compteurs AbsenceServiceJour de son
+service pour chaque jour du congé. Lire un solde ou la charge d'absence d'une
+équipe est donc une simple lecture par clé, sans parcourir l'historique.
+"""
+import datetime
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.db.models.functions import ExtractYear
+
+from .compteurs import ajuster_compteurs
+from .models import AbsenceServiceJour, Conge, Employe, SoldeConge
+from .tableau_de_bord import marquer_periodes, periodes_entre
+from .taches import planifier
+
+
+def etat_conge(conge):
+    """Renvoie (employe_id, date_debut, date_fin) si le congé est validé, sinon None."""
+    if conge.statut != 'VALIDE':
+        return None
+    return conge.employe_id, conge.date_debut, conge.date_fin
+
+
+def jours_du_conge(date_debut, date_fin):
+    jour = date_debut
+    while jour <= date_fin:
+        yield jour
+        jour += datetime.timedelta(days=1)
+
+
+def appliquer_transitions(transitions):
+    """
+    Répercute des changements d'état de congés sur les soldes et les absences.
+
+    `transitions` est une liste de couples (état avant, état après) tels que
+    renvoyés par etat_conge(). Toutes les variations sont cumulées puis
+    écrites en quelques requêtes, quel que soit le nombre de congés.
+    """
+    soldes = defaultdict(lambda: defaultdict(int))
+    absences = defaultdict(lambda: defaultdict(int))
+    transitions = [(avant, apres) for avant, apres in transitions if avant != apres]
+    employes = {etat[0] for transition in transitions for etat in transition if etat}
+    if not employes:
+        return
+    services = dict(Employe.objects.filter(pk__in=employes).values_list('pk', 'departement_id'))
+    for avant, apres in transitions:
+        for etat, signe in ((avant, -1), (apres, 1)):
+            if not etat:
+                continue
+            employe_id, date_debut, date_fin = etat
+            soldes[(employe_id, date_debut.year)]['jours_pris'] += signe * ((date_fin - date_debut).days + 1)
+            if employe_id in services:
+                for jour in jours_du_conge(date_debut, date_fin):
+                    absences[(services[employe_id], jour)]['nombre'] += signe
+    with transaction.atomic():
+        ajuster_compteurs(SoldeConge, ('employe_id', 'annee'), soldes)
+        ajuster_compteurs(AbsenceServiceJour, ('departement_id', 'date'), absences)
+        marquer_periodes(
+            periode for transition in transitions for etat in transition if etat
+            for periode in periodes_entre(etat[1], etat[2])
+        )
+
+
+def changer_service_absences(employe_id, ancien, nouveau):
+    """
+    Déplace les absences d'un employé qui change de service vers son nouveau
+    service : les compteurs suivent le service actuel, comme reconstruire_absences.
+    """
+    absences = defaultdict(lambda: defaultdict(int))
+    with transaction.atomic():
+        conges = Conge.objects.filter(employe_id=employe_id, statut='VALIDE').values_list('date_debut', 'date_fin')
+        for date_debut, date_fin in conges:
+            for jour in jours_du_conge(date_debut, date_fin):
+                absences[(ancien, jour)]['nombre'] -= 1
+                absences[(nouveau, jour)]['nombre'] += 1
+        ajuster_compteurs(AbsenceServiceJour, ('departement_id', 'date'), absences)
+        marquer_periodes({(jour.year, jour.month) for _, jour in absences})
+
+
+def solde(employe_id, annee):
+    """Solde d'un employé pour une année (non enregistré s'il n'existe pas encore)."""
+    try:
+        return SoldeConge.objects.get(employe_id=employe_id, annee=annee)
+    except SoldeConge.DoesNotExist:
+        return SoldeConge(employe_id=employe_id, annee=annee)
+
+
+async def asolde(employe_id, annee):
+    """solde() par l'ORM asynchrone."""
+    return (
+        await SoldeConge.objects.filter(employe_id=employe_id, annee=annee).afirst()
+        or SoldeConge(employe_id=employe_id, annee=annee)
+    )
+
+
+def soldes_par_employe(employe_ids, annee):
+    """Renvoie {employe_id: SoldeConge} en une seule requête."""
+    soldes = {s.employe_id: s for s in SoldeConge.objects.filter(employe_id__in=employe_ids, annee=annee)}
+    return {e: soldes.get(e) or SoldeConge(employe_id=e, annee=annee) for e in employe_ids}
+
+
+# --- Chevauchements et capacité d'équipe ---
+
+@dataclass
+class VerificationConge:
+    """Résultat de la vérification d'une période de congé."""
+    service: str  # Nom du département de l'employé
+    chevauchements: list = field(default_factory=list)  # Congés non refusés de l'employé sur la période
+    absences_par_jour: dict = field(default_factory=dict)  # {date: nombre de collègues en congé validé}
+
+    @property
+    def chevauche(self):
+        return bool(self.chevauchements)
+
+    @property
+    def absences_max(self):
+        return max(self.absences_par_jour.values(), default=0)
+
+
+def verifier_conge(employe_id, date_debut, date_fin, exclure_pk=None):
+    """
+    Vérifie une période de congé en trois lectures indexées.
+
+    - chevauchements : congés DEMANDE ou VALIDE du même employé qui recoupent
+      la période (index employe / date_debut / date_fin) ;
+    - absences_par_jour : collègues du même service déjà absents chaque jour,
+      lus dans AbsenceServiceJour (index departement / date). Si `exclure_pk`
+      désigne un congé déjà validé, il est retiré de ces comptes.
+    """
+    departement_id, service = Employe.objects.filter(pk=employe_id).values_list(
+        'departement_id', 'departement__nom',
+    ).first() or (None, None)
+    chevauchements = Conge.objects.filter(
+        employe_id=employe_id, date_debut__lte=date_fin, date_fin__gte=date_debut,
+    ).exclude(statut='REFUSE')
+    if exclure_pk is not None:
+        chevauchements = chevauchements.exclude(pk=exclure_pk)
+    absences = dict(
+        AbsenceServiceJour.objects.filter(
+            departement_id=departement_id, date__range=(date_debut, date_fin), nombre__gt=0,
+        ).values_list('date', 'nombre')
+    )
+    if exclure_pk is not None:
+        lui_meme = Conge.objects.filter(pk=exclure_pk, statut='VALIDE').values_list('date_debut', 'date_fin').first()
+        if lui_meme:
+            for jour in jours_du_conge(max(lui_meme[0], date_debut), min(lui_meme[1], date_fin)):
+                absences[jour] = absences.get(jour, 0) - 1
+            absences = {jour: nombre for jour, nombre in absences.items() if nombre > 0}
+    return VerificationConge(
+        service=service,
+        chevauchements=list(chevauchements.order_by('date_debut')),
+        absences_par_jour=absences,
+    )
+
+
+# --- Traitement en masse des demandes ---
+
+class ErreurTraitement(Exception):
+    """Des demandes ont changé de statut pendant le traitement ; rien n'a été écrit."""
+
+
+@dataclass
+class ResultatTraitement:
+    statut: str
+    traites: list = field(default_factory=list)  # Ids des congés passés au statut demandé
+    ignores: dict = field(default_factory=dict)  # {id: motif} des congés laissés tels quels
+    tache_id: int = None  # Tâche d'envoi des notifications
+
+
+def traiter_demandes(conge_ids, statut, demandeur=None):
+    """
+    Valide ou refuse en une fois des demandes de congé (statut DEMANDE).
+
+    Les demandes sont lues et vérifiées en une requête : congé introuvable ou
+    déjà traité, et pour une validation, chevauchement avec un congé validé
+    du même employé ou avec une autre demande du lot. Les demandes retenues
+    changent de statut par un seul UPDATE ; soldes, absences et tableau de
+    bord suivent par appliquer_transitions, et les employés sont prévenus
+    par une tâche de fond après la validation de la transaction.
+    """
+    conge_ids = set(conge_ids)
+    resultat = ResultatTraitement(statut)
+    valide = Conge.objects.filter(
+        employe_id=OuterRef('employe_id'), statut='VALIDE',
+        date_debut__lte=OuterRef('date_fin'), date_fin__gte=OuterRef('date_debut'),
+    )
+    with transaction.atomic():
+        lignes = Conge.objects.select_for_update().filter(pk__in=conge_ids).annotate(
+            chevauche=Exists(valide),
+        ).order_by('employe_id', 'date_debut').values_list(
+            'pk', 'employe_id', 'date_debut', 'date_fin', 'statut', 'chevauche',
+        )
+        libelles = dict(Conge.STATUT_CHOICES)
+        retenus, fin_precedente = [], {}
+        for pk, employe_id, date_debut, date_fin, statut_actuel, chevauche in lignes:
+            conge_ids.discard(pk)
+            if statut_actuel != 'DEMANDE':
+                resultat.ignores[pk] = f"déjà {libelles[statut_actuel].lower()}"
+            elif statut == 'VALIDE' and chevauche:
+                resultat.ignores[pk] = "chevauche un congé validé"
+            elif statut == 'VALIDE' and fin_precedente.get(employe_id, datetime.date.min) >= date_debut:
+                resultat.ignores[pk] = "chevauche une autre demande du lot"
+            else:
+                retenus.append((pk, employe_id, date_debut, date_fin))
+                fin_precedente[employe_id] = date_fin
+        resultat.ignores.update((pk, "introuvable") for pk in conge_ids)
+        resultat.traites = [pk for pk, *_ in retenus]
+        if not retenus:
+            return resultat
+        if Conge.objects.filter(pk__in=resultat.traites, statut='DEMANDE').update(statut=statut) != len(retenus):
+            raise ErreurTraitement("Des demandes ont été traitées entre-temps ; relancez le traitement.")
+        if statut == 'VALIDE':
+            appliquer_transitions([(None, (employe_id, debut, fin)) for _, employe_id, debut, fin in retenus])
+        resultat.tache_id = planifier('notifier_conges', {'conges': resultat.traites}, demandeur).pk
+    return resultat
+
+
+# --- Reconstruction complète ---
+
+def reconstruire_soldes():
+    """
+    Recalcule tous les soldes à partir des congés validés.
+
+    Une seule requête d'agrégation calcule les jours pris par employé et par
+    année ; les soldes sont ensuite remis à zéro puis réécrits en masse, sans
+    toucher aux droits acquis (jours_acquis). Renvoie le nombre de soldes écrits.
+    """
+    agregats = (
+        Conge.objects.filter(statut='VALIDE')
+        .annotate(annee=ExtractYear('date_debut'))
+        .values('employe_id', 'annee')
+        .annotate(ecart=Sum(F('date_fin') - F('date_debut')), nombre=Count('id'))
+        .order_by()
+    )
+    # L'agrégation se fait dans la transaction de réécriture : un congé validé
+    # entre les deux serait sinon effacé des soldes par la remise à zéro.
+    with transaction.atomic():
+        soldes = [
+            # date_fin - date_debut exclut le dernier jour : +1 par congé.
+            SoldeConge(employe_id=ligne['employe_id'], annee=ligne['annee'],
+                       jours_pris=ligne['ecart'].days + ligne['nombre'])
+            for ligne in agregats
+        ]
+        SoldeConge.objects.update(jours_pris=0)
+        SoldeConge.objects.bulk_create(
+            soldes,
+            update_conflicts=True,
+            unique_fields=['employe', 'annee'],
+            update_fields=['jours_pris'],
+            batch_size=1000,
+        )
+    return len(soldes)
+
+
+def reconstruire_absences():
+    """
+    Recalcule les compteurs d'absence par service et par jour.
+
+    Les congés validés sont parcourus en flux (projection sur trois colonnes)
+    et comptés en mémoire par (service, jour) avant une réécriture en masse.
+    Renvoie le nombre de compteurs écrits.
+    """
+    compteurs = Counter()
+    conges = Conge.objects.filter(statut='VALIDE').values_list('employe__departement_id', 'date_debut', 'date_fin')
+    # Parcours et réécriture dans la même transaction, comme reconstruire_soldes.
+    with transaction.atomic():
+        for departement_id, date_debut, date_fin in conges.iterator(chunk_size=5000):
+            for jour in jours_du_conge(date_debut, date_fin):
+                compteurs[(departement_id, jour)] += 1
+        AbsenceServiceJour.objects.all().delete()
+        AbsenceServiceJour.objects.bulk_create(
+            [AbsenceServiceJour(departement_id=s, date=d, nombre=n) for (s, d), n in compteurs.items()],
+            batch_size=1000,
+        )
+        marquer_periodes({(d.year, d.month) for _, d in compteurs})
+    return len(compteurs)
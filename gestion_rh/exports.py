@@ -0,0 +1,202 @@
+"""
+Exports en flux (CSV et XLSX) des fiches de paie et des présences.
+
+Les données sont lues par paquets avec queryset.iterator() sur des
+projections values_list (aucune instance de modèle), et chaque paquet est
+envoyé dès qu'il est formaté : la mémoire reste bornée quel que soit le
+volume exporté et les premiers octets partent immédiatement.
+"""
+import csv
+import datetime
+import re
+import zipfile
+from decimal import Decimal
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+from .models import FichePaieAvantage, FichePaiePrime
+
+TAILLE_PAQUET = 2000
+
+COLONNES_FICHES = (
+    'Matricule', 'Nom', 'Prénom', 'Mois', 'Année', 'Statut', 'Salaire brut', 'Total primes',
+    'Total avantages', 'Cotisations sociales', 'Impôt sur le revenu', 'Salaire net', 'Primes', 'Avantages',
+)
+COLONNES_PRESENCES = ('Matricule', 'Nom', 'Prénom', 'Service', 'Date', 'Heure arrivée', 'Heure départ')
+
+TYPES_CONTENU = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def paquets(iterable, taille=TAILLE_PAQUET):
+    iterateur = iter(iterable)
+    while paquet := list(islice(iterateur, taille)):
+        yield paquet
+
+
+# --- Lignes à exporter ---
+
+def _detail_lignes(modele, champ_nom, fiche_ids):
+    """{fiche_id: "Nom : montant; ..."} pour un paquet de fiches, en une requête."""
+    details = {}
+    lignes = modele.objects.filter(fiche_de_paie_id__in=fiche_ids).values_list(
+        'fiche_de_paie_id', champ_nom, 'montant',
+    ).order_by('fiche_de_paie_id', 'pk')
+    for fiche_id, nom, montant in lignes:
+        details.setdefault(fiche_id, []).append(f"{nom} : {montant}")
+    return {fiche_id: '; '.join(valeurs) for fiche_id, valeurs in details.items()}
+
+
+def lignes_fiches(queryset):
+    """En-tête puis une ligne par fiche, avec le détail de ses primes et avantages."""
+    yield COLONNES_FICHES
+    projection = queryset.order_by('annee', 'mois', 'pk').values_list(
+        'pk', 'employe__matricule', 'employe__nom', 'employe__prenom', 'mois', 'annee', 'statut',
+        'salaire_brut', 'total_primes', 'total_avantages', 'cotisations_sociales',
+        'impot_sur_revenu', 'salaire_net',
+    )
+    for paquet in paquets(projection.iterator(chunk_size=TAILLE_PAQUET)):
+        fiche_ids = [ligne[0] for ligne in paquet]
+        primes = _detail_lignes(FichePaiePrime, 'prime__nom_prime', fiche_ids)
+        avantages = _detail_lignes(FichePaieAvantage, 'avantage__nom_avantage', fiche_ids)
+        for pk, *valeurs in paquet:
+            yield (*valeurs, primes.get(pk, ''), avantages.get(pk, ''))
+
+
+def lignes_presences(queryset):
+    """En-tête puis une ligne par pointage, dans l'ordre chronologique."""
+    yield COLONNES_PRESENCES
+    yield from queryset.order_by('journee__date_journee', 'pk').values_list(
+        'employe__matricule', 'employe__nom', 'employe__prenom', 'employe__departement__nom',
+        'journee__date_journee', 'heure_arrivee', 'heure_depart',
+    ).iterator(chunk_size=TAILLE_PAQUET)
+
+
+# --- Formats ---
+
+class Tampon:
+    """Pseudo-fichier qui accumule ce qu'on y écrit jusqu'à ce qu'on le vide."""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(donnees)
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self.morceaux)
+        self.morceaux = []
+        return donnees
+
+
+def flux_csv(lignes):
+    """Génère le CSV (UTF-8 avec BOM, pour Excel) paquet par paquet."""
+    tampon = Tampon()
+    redacteur = csv.writer(tampon)
+    yield '\ufeff'.encode()
+    for paquet in paquets(lignes):
+        redacteur.writerows(paquet)
+        yield ''.join(tampon.morceaux).encode()
+        tampon.morceaux = []
+
+
+# Caractères interdits dans un document XML 1.0
+_CARACTERES_INTERDITS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_FICHIERS_FIXES = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def _cellule(valeur):
+    if valeur is None:
+        return '<c/>'
+    if isinstance(valeur, (int, float, Decimal)) and not isinstance(valeur, bool):
+        return f'<c><v>{valeur}</v></c>'
+    if isinstance(valeur, (datetime.date, datetime.time)):
+        valeur = valeur.isoformat()
+    texte = escape(_CARACTERES_INTERDITS.sub('', str(valeur)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texte}</t></is></c>'
+
+
+def flux_xlsx(lignes, nom_feuille='Export'):
+    """
+    Génère un classeur XLSX d'une feuille, paquet par paquet.
+
+    Le classeur est écrit directement dans une archive ZIP en flux (sans
+    retour en arrière dans le fichier) avec des chaînes en ligne : pas de
+    table de chaînes partagées à construire en mémoire, ni de dépendance
+    externe.
+    """
+    tampon = Tampon()
+    with zipfile.ZipFile(tampon, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in _XLSX_FICHIERS_FIXES.items():
+            archive.writestr(nom, contenu)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(nom_feuille[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield tampon.vider()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as feuille:
+            feuille.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for paquet in paquets(lignes):
+                feuille.write(''.join(
+                    '<row>' + ''.join(_cellule(v) for v in ligne) + '</row>' for ligne in paquet
+                ).encode())
+                yield tampon.vider()
+            feuille.write(b'</sheetData></worksheet>')
+    yield tampon.vider()
+
+
+def flux_export(lignes, format_export, nom_feuille='Export'):
+    if format_export == 'xlsx':
+        return flux_xlsx(lignes, nom_feuille)
+    if format_export == 'csv':
+        return flux_csv(lignes)
+    raise ValueError(f"Format d'export inconnu : {format_export}")
+
+
+def reponse_export(lignes, format_export, nom_fichier):
+    """StreamingHttpResponse qui envoie l'export au fil de sa génération."""
+    reponse = StreamingHttpResponse(
+        flux_export(lignes, format_export, nom_fichier), content_type=TYPES_CONTENU[format_export],
+    )
+    reponse['Content-Disposition'] = f'attachment; filename="{nom_fichier}.{format_export}"'
+    return reponse
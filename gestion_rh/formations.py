@@ -0,0 +1,196 @@
+"""
+Inscriptions aux formations : places limitées et liste d'attente.
+
+Formation.places_prises compte les participations qui occupent une place
+(INSCRIT, TERMINE). Une inscription réserve sa place par un UPDATE
+conditionnel (places_prises < capacite), sans lecture préalable : quand des
+centaines d'employés s'inscrivent en même temps, la base sérialise ces
+UPDATE sur la ligne de la formation et aucun ne peut dépasser la capacité.
+
+Une formation complète place l'employé en liste d'attente (statut ATTENTE,
+ordre d'arrivée = ordre des clés). Les places libérées (désinscription,
+capacité augmentée) sont pourvues depuis cette liste sous le verrou de la
+ligne de la formation ; toute écriture de participation se fait sous ce même
+verrou, si bien qu'une place libre et une liste d'attente non vide ne
+coexistent jamais.
+
+L'inscription d'un service entier réserve un bloc de places en une fois et
+crée les participations par bulk_create.
+"""
+from dataclasses import dataclass, field
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Employe, Formation, ParticipationFormation
+
+# Statuts qui occupent une place.
+STATUTS_PLACE = ('INSCRIT', 'TERMINE')
+
+
+class ErreurInscription(Exception):
+    """Inscription ou désinscription impossible (formation introuvable, déjà inscrit...)."""
+
+
+@dataclass
+class ResultatInscription:
+    """Bilan de l'inscription d'un service."""
+    inscrits: list = field(default_factory=list)  # Ids des employés ayant obtenu une place
+    en_attente: list = field(default_factory=list)  # Ids des employés placés en liste d'attente
+    deja_inscrits: int = 0  # Employés du service déjà inscrits ou en attente
+
+
+def _verrouiller(formation_id):
+    """(capacite, places_prises) de la formation, dont la ligne reste verrouillée jusqu'à la fin de la transaction."""
+    ligne = Formation.objects.select_for_update().filter(pk=formation_id).values_list(
+        'capacite', 'places_prises',
+    ).first()
+    if ligne is None:
+        raise ErreurInscription("Formation introuvable.")
+    return ligne
+
+
+def _reserver(formation_id, nombre):
+    """Réserve jusqu'à `nombre` places sous verrou ; renvoie le nombre de places obtenues."""
+    capacite, places_prises = _verrouiller(formation_id)
+    obtenues = min(nombre, max(0, capacite - places_prises))
+    if obtenues:
+        Formation.objects.filter(pk=formation_id).update(places_prises=F('places_prises') + obtenues)
+    return obtenues
+
+
+def inscrire(formation_id, employe_id):
+    """
+    Inscrit un employé ; renvoie le statut obtenu, INSCRIT ou ATTENTE.
+    Lève IntegrityError si `employe_id` ne correspond à aucun employé.
+
+    Cas courant : une requête pour la place (UPDATE conditionnel), une pour
+    la participation. Si la formation paraît complète, la décision est
+    reprise sous verrou pour ne pas manquer une place libérée entre-temps.
+    """
+    try:
+        with transaction.atomic():
+            existante = ParticipationFormation.objects.filter(
+                formation_id=formation_id, employe_id=employe_id,
+            ).values_list('pk', 'statut').first()
+            if existante and existante[1] != 'ANNULE':
+                raise ErreurInscription("Vous êtes déjà inscrit à cette formation.")
+            place = Formation.objects.filter(
+                pk=formation_id, places_prises__lt=F('capacite'),
+            ).update(places_prises=F('places_prises') + 1) or _reserver(formation_id, 1)
+            statut = 'INSCRIT' if place else 'ATTENTE'
+            if existante:
+                # Réinscription après annulation : nouvelle ligne, donc fin de la liste d'attente.
+                ParticipationFormation.objects.filter(pk=existante[0], statut='ANNULE').delete()
+            ParticipationFormation.objects.create(formation_id=formation_id, employe_id=employe_id, statut=statut)
+    except IntegrityError as exc:
+        # Double soumission simultanée : la seconde transaction est annulée, place comprise.
+        # Sans participation existante, c'est `employe_id` qui ne désigne aucun employé.
+        if not ParticipationFormation.objects.filter(formation_id=formation_id, employe_id=employe_id).exists():
+            raise
+        raise ErreurInscription("Vous êtes déjà inscrit à cette formation.") from exc
+    return statut
+
+
+def pourvoir_places(formation_id):
+    """Attribue les places libres aux premiers de la liste d'attente ; renvoie les ids des employés promus."""
+    with transaction.atomic():
+        capacite, places_prises = _verrouiller(formation_id)
+        libres = capacite - places_prises
+        if libres <= 0:
+            return []
+        promus = list(ParticipationFormation.objects.filter(
+            formation_id=formation_id, statut='ATTENTE',
+        ).order_by('pk').values_list('pk', 'employe_id')[:libres])
+        if promus:
+            ParticipationFormation.objects.filter(pk__in=[pk for pk, _ in promus]).update(statut='INSCRIT')
+            Formation.objects.filter(pk=formation_id).update(places_prises=F('places_prises') + len(promus))
+    return [employe_id for _, employe_id in promus]
+
+
+def desinscrire(formation_id, employe_id):
+    """Annule une inscription ou une attente ; la place libérée revient au premier de la liste d'attente."""
+    with transaction.atomic():
+        _verrouiller(formation_id)
+        statut = ParticipationFormation.objects.filter(
+            formation_id=formation_id, employe_id=employe_id,
+        ).values_list('statut', flat=True).first()
+        if statut not in ('INSCRIT', 'ATTENTE'):
+            raise ErreurInscription("Aucune inscription en cours à cette formation.")
+        ParticipationFormation.objects.filter(
+            formation_id=formation_id, employe_id=employe_id,
+        ).update(statut='ANNULE')
+        if statut == 'INSCRIT':
+            _liberer_place(formation_id)
+
+
+def _liberer_place(formation_id):
+    Formation.objects.filter(pk=formation_id).update(places_prises=F('places_prises') - 1)
+    pourvoir_places(formation_id)
+
+
+def retirer_employe(employe_id):
+    """Rend aux listes d'attente les places d'un employé supprimé, avant que ses participations partent en cascade."""
+    formations = ParticipationFormation.objects.filter(
+        employe_id=employe_id, statut__in=STATUTS_PLACE,
+    ).values_list('formation_id', flat=True)
+    for formation_id in list(formations):
+        with transaction.atomic():
+            _verrouiller(formation_id)
+            if ParticipationFormation.objects.filter(
+                formation_id=formation_id, employe_id=employe_id, statut__in=STATUTS_PLACE,
+            ).update(statut='ANNULE'):
+                _liberer_place(formation_id)
+
+
+def changer_capacite(formation_id, capacite):
+    """
+    Fixe la capacité si elle couvre les places déjà prises (UPDATE
+    conditionnel) puis pourvoit les nouvelles places. Renvoie False si la
+    capacité demandée est inférieure au nombre d'inscrits.
+    """
+    with transaction.atomic():
+        if not Formation.objects.filter(pk=formation_id, places_prises__lte=capacite).update(capacite=capacite):
+            return False
+        pourvoir_places(formation_id)
+    return True
+
+
+def inscrire_service(formation_id, departement_id):
+    """
+    Inscrit tous les employés d'un service pas encore inscrits ni en attente.
+
+    Sous le verrou de la formation : un bloc de places est réservé par un
+    seul UPDATE, les employés (par ordre de clé) le remplissent et les
+    suivants vont en liste d'attente ; toutes les participations sont créées
+    par bulk_create.
+    """
+    resultat = ResultatInscription()
+    with transaction.atomic():
+        capacite, places_prises = _verrouiller(formation_id)
+        participations = ParticipationFormation.objects.filter(
+            formation_id=formation_id, employe__departement_id=departement_id,
+        )
+        annulees = participations.filter(statut='ANNULE')
+        resultat.deja_inscrits = participations.exclude(statut='ANNULE').count()
+        employes = list(Employe.objects.filter(departement_id=departement_id).exclude(
+            pk__in=participations.exclude(statut='ANNULE').values('employe_id'),
+        ).order_by('pk').values_list('pk', flat=True))
+        if not employes:
+            return resultat
+        libres = min(len(employes), max(0, capacite - places_prises))
+        resultat.inscrits, resultat.en_attente = employes[:libres], employes[libres:]
+        # Les annulations sont remplacées : la contrainte (employe, formation) n'admet qu'une ligne.
+        annulees.delete()
+        ParticipationFormation.objects.bulk_create(
+            [
+                ParticipationFormation(formation_id=formation_id, employe_id=employe_id, statut=statut)
+                for employes_statut, statut in ((resultat.inscrits, 'INSCRIT'), (resultat.en_attente, 'ATTENTE'))
+                for employe_id in employes_statut
+            ],
+            batch_size=1000,
+        )
+        if libres:
+            Formation.objects.filter(pk=formation_id).update(places_prises=F('places_prises') + libres)
+    return resultat
+
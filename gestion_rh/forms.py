@@ -1,8 +1,10 @@
 from django import forms
 from .models import (
     Employe, Conge, Presence, Annonce, FicheDePaie, Avantage, Prime, 
-    JourneeTravail, Role, Utilisateur
+    JourneeTravail, Role, Utilisateur, Departement, Poste, Formation
 )
+from .archives_paie import annee_archivee
+from .autocompletion import Autocompletion
 
 # ==============================================
 # Formulaires de base (création/édition simple)
@@ -21,8 +23,8 @@ class EmployeForm(forms.ModelForm):
             'prenom': forms.TextInput(attrs={'class': 'form-control'}),
             'matricule': forms.TextInput(attrs={'class': 'form-control'}),
             'telephone': forms.TextInput(attrs={'class': 'form-control'}),
-            'service': forms.TextInput(attrs={'class': 'form-control'}),
-            'poste': forms.TextInput(attrs={'class': 'form-control'}),
+            'departement': forms.Select(attrs={'class': 'form-select'}),
+            'poste': forms.Select(attrs={'class': 'form-select'}),
             'salaire_base': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
@@ -34,10 +36,17 @@ class CongeForm(forms.ModelForm):
             'date_debut': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'date_fin': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'motif': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
-            'employe': forms.Select(attrs={'class': 'form-select'}),
+            'employe': Autocompletion('employes'),
             'statut': forms.Select(attrs={'class': 'form-select'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        date_debut, date_fin = cleaned_data.get('date_debut'), cleaned_data.get('date_fin')
+        if date_debut and date_fin and date_fin < date_debut:
+            raise forms.ValidationError("La date de fin doit être postérieure à la date de début.")
+        return cleaned_data
+
 class PresenceForm(forms.ModelForm):
     class Meta:
         model = Presence
@@ -45,8 +54,8 @@ class PresenceForm(forms.ModelForm):
         widgets = {
             'heure_arrivee': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'heure_depart': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
-            'employe': forms.Select(attrs={'class': 'form-select'}),
-            'journee': forms.Select(attrs={'class': 'form-select'}),
+            'employe': Autocompletion('employes'),
+            'journee': Autocompletion('journees'),
         }
 
 class AnnonceForm(forms.ModelForm):
@@ -56,7 +65,34 @@ class AnnonceForm(forms.ModelForm):
         widgets = {
             'titre': forms.TextInput(attrs={'class': 'form-control'}),
             'contenu': forms.Textarea(attrs={'rows': 5, 'class': 'form-control'}),
-            'auteur': forms.Select(attrs={'class': 'form-select'}),
+            'auteur': Autocompletion('utilisateurs'),
+        }
+
+class FormationForm(forms.ModelForm):
+    class Meta:
+        model = Formation
+        fields = ['titre', 'description', 'duree_heures', 'capacite']
+        widgets = {
+            'titre': forms.TextInput(attrs={'class': 'form-control'}),
+            'description': forms.Textarea(attrs={'rows': 5, 'class': 'form-control'}),
+            'duree_heures': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'capacite': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+        }
+
+class DepartementForm(forms.ModelForm):
+    class Meta:
+        model = Departement
+        fields = ['nom']
+        widgets = {
+            'nom': forms.TextInput(attrs={'class': 'form-control'}),
+        }
+
+class PosteForm(forms.ModelForm):
+    class Meta:
+        model = Poste
+        fields = ['intitule']
+        widgets = {
+            'intitule': forms.TextInput(attrs={'class': 'form-control'}),
         }
 
 class AvantageForm(forms.ModelForm):
@@ -97,7 +133,7 @@ class FicheDePaieForm(forms.ModelForm):
         # sont gérés dans la vue, pas directement dans le formulaire de base.
         fields = ['employe', 'mois', 'annee', 'statut', 'salaire_brut', 'cotisations_sociales', 'impot_sur_revenu']
         widgets = {
-            'employe': forms.Select(attrs={'class': 'form-select'}),
+            'employe': Autocompletion('employes'),
             'mois': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 12}),
             'annee': forms.NumberInput(attrs={'class': 'form-control', 'min': 2020}),
             'statut': forms.Select(attrs={'class': 'form-select'}),
@@ -106,6 +142,57 @@ class FicheDePaieForm(forms.ModelForm):
             'impot_sur_revenu': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+    def clean_annee(self):
+        annee = self.cleaned_data['annee']
+        if annee_archivee(annee):
+            raise forms.ValidationError("Cette année de paie est archivée.")
+        return annee
+
+class LancementPaieForm(forms.Form):
+    """Choix du mois à calculer pour le lancement de la paie en masse."""
+    mois = forms.IntegerField(min_value=1, max_value=12, widget=forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 12}))
+    annee = forms.IntegerField(min_value=2020, widget=forms.NumberInput(attrs={'class': 'form-control', 'min': 2020}))
+
+    def clean_annee(self):
+        annee = self.cleaned_data['annee']
+        if annee_archivee(annee):
+            raise forms.ValidationError("Cette année de paie est archivée.")
+        return annee
+
+class TraitementCongesForm(forms.Form):
+    """Demandes de congé à valider ou refuser en une fois (cases à cocher ou liste JSON d'ids)."""
+    MAX_CONGES = 5000
+    conges = forms.Field(widget=forms.MultipleHiddenInput, error_messages={'required': "Aucune demande sélectionnée."})
+    statut = forms.ChoiceField(
+        choices=[('VALIDE', 'Valider'), ('REFUSE', 'Refuser')], widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+    def clean_conges(self):
+        valeurs = self.cleaned_data['conges']
+        if not isinstance(valeurs, (list, tuple)):
+            valeurs = [valeurs]
+        try:
+            conges = {int(valeur) for valeur in valeurs}
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Identifiants de congés invalides.")
+        if len(conges) > self.MAX_CONGES:
+            raise forms.ValidationError(f"Au plus {self.MAX_CONGES} demandes par traitement.")
+        return conges
+
+class InscriptionServiceForm(forms.Form):
+    """Service dont tous les employés sont inscrits à une formation."""
+    departement = forms.ModelChoiceField(
+        queryset=Departement.objects.order_by('nom'), widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+class ImportPresenceForm(forms.Form):
+    """Téléversement d'un export de badgeuse (CSV ou JSONL)."""
+    fichier = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.json'}))
+
+class ImportEmployesForm(forms.Form):
+    """Téléversement d'un fichier d'intégration d'employés (CSV ou JSONL)."""
+    fichier = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.json'}))
+
 class UtilisateurCreationForm(forms.ModelForm):
     """Formulaire pour créer un nouvel utilisateur avec mot de passe."""
     password = forms.CharField(widget=forms.PasswordInput(attrs={'class': 'form-control'}))
@@ -0,0 +1,267 @@
+"""
+Données synthétiques réalistes pour les mesures de performance.
+
+Remplit une base de test avec des volumes configurables : départements et
+postes, employés (avec leur compte), journées de travail et pointages sur
+plusieurs années, historique de congés, fiches de paie mensuelles avec leurs
+lignes de primes et d'avantages ; à part, un corpus d'annonces pour la
+recherche plein texte. Tout passe par des insertions groupées ;
+les compteurs matérialisés que ces insertions contournent (soldes, absences,
+agrégats de présence, synthèses du tableau de bord) sont reconstruits à la
+fin, comme après un import.
+
+Réservé aux bases de test : rien n'est supprimé, les données générées
+s'ajoutent à celles qui existent. La même graine donne les mêmes données.
+"""
+import datetime
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+from .annonces import invalider_fil
+from .assiduite import reconstruire_agregats_presence
+from .conges import reconstruire_absences, reconstruire_soldes
+from .exports import paquets
+from .integration import LigneValide, ResultatIntegration, ecrire, hacher_mots_de_passe
+from .models import (
+    Annonce, Avantage, Conge, Employe, FicheDePaie, FichePaieAvantage, FichePaiePrime, JourneeTravail, Presence,
+    Prime, Role,
+)
+from .paie import lancer_paie
+from .recherche_annonces import indexer_annonces
+from .tableau_de_bord import rafraichir_syntheses, toutes_les_periodes
+
+NOMS = (
+    'Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau',
+    'Simon', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'David', 'Bertrand', 'Roux', 'Vincent', 'Fournier',
+    'Morel', 'Girard', 'André', 'Lefèvre', 'Mercier', 'Dupont', 'Lambert', 'Bonnet', 'François', 'Martinez',
+    'Mukamba', 'Kabila', 'Tshisekedi', 'Mbuyi', 'Ilunga', 'Kasongo', 'Kalala', 'Mutombo', 'Ngoy', 'Lukusa',
+)
+PRENOMS = (
+    'Jean', 'Marie', 'Pierre', 'Sophie', 'Luc', 'Claire', 'Paul', 'Julie', 'Michel', 'Anne',
+    'Félicien', 'Grâce', 'Patrick', 'Esther', 'Joseph', 'Sarah', 'Emmanuel', 'Ruth', 'Christian', 'Aline',
+)
+SERVICES = ('Informatique', 'Comptabilité', 'Ressources humaines', 'Logistique', 'Commercial', 'Juridique')
+POSTES = ('Développeur', 'Comptable', 'Assistant', 'Chef de projet', 'Technicien', 'Analyste', 'Directeur')
+PRIMES = ('Prime de rendement', 'Prime de transport', 'Heures supplémentaires')
+AVANTAGES = (('Assurance maladie', Decimal('45.00')), ('Tickets restaurant', Decimal('60.00')))
+VOCABULAIRE_ANNONCES = (
+    'réunion', 'formation', 'service', 'équipe', 'projet', 'congés', 'paie', 'bulletin', 'direction', 'sécurité',
+    'bureau', 'planning', 'rappel', 'nouveau', 'nouvelle', 'semaine', 'mois', 'janvier', 'février', 'mars',
+    'avril', 'mai', 'juin', 'juillet', 'septembre', 'octobre', 'novembre', 'décembre', 'salle', 'inscription',
+    'date', 'limite', 'procédure', 'dossier', 'mutuelle', 'assurance', 'maladie', 'transport', 'cantine',
+    'restaurant', 'horaires', 'fermeture', 'ouverture', 'maintenance', 'informatique', 'messagerie', 'réseau',
+    'mot', 'passe', 'badge', 'accès', 'parking', 'travaux', 'déménagement', 'étage', 'accueil', 'bienvenue',
+    'départ', 'retraite', 'pot', 'anniversaire', 'résultats', 'objectifs', 'entretien', 'annuel', 'évaluation',
+    'prime', 'augmentation', 'grille', 'salaire', 'télétravail', 'charte', 'règlement', 'intérieur', 'comité',
+    'élections', 'représentants', 'personnel', 'vote', 'candidature', 'poste', 'recrutement', 'stage', 'stagiaire',
+    'audit', 'comptabilité', 'clôture', 'inventaire', 'fournisseurs', 'clients', 'commercial', 'logistique',
+    'juridique', 'contrat', 'avenant', 'signature', 'document', 'merci', 'participation', 'obligatoire',
+)
+
+TAUX_PRESENCE = 0.95
+TAUX_COTISATIONS = Decimal('0.05')
+TAUX_IMPOT = Decimal('0.10')
+TAILLE_LOT = 5000
+
+
+@dataclass
+class ResultatGeneration:
+    employes: int = 0
+    journees: int = 0
+    presences: int = 0
+    conges: int = 0
+    fiches: int = 0
+    lignes_paie: int = 0
+    duree: float = 0.0
+
+
+def lignes_employes(nombre, rng, prefixe='gen'):
+    """LigneValide d'employés synthétiques, prêtes pour integration.ecrire (comptes sans mot de passe)."""
+    role_id = Role.objects.get_or_create(nom_role=Role.EMPLOYE)[0].pk
+    depart = Employe.objects.count()
+    aujourd_hui = datetime.date.today()
+    lignes = []
+    for i in range(depart, depart + nombre):
+        nom, prenom = rng.choice(NOMS), rng.choice(PRENOMS)
+        lignes.append(LigneValide(
+            numero=i,
+            utilisateur={'username': f'{prefixe}{i}', 'email': '', 'role_id': role_id,
+                         'first_name': prenom, 'last_name': nom},
+            employe={
+                'matricule': f'{prefixe[0].upper()}{i:06d}', 'nom': nom, 'prenom': prenom,
+                'telephone': f'+243 8{rng.randrange(10 ** 8):08d}',
+                'service': rng.choice(SERVICES), 'poste': rng.choice(POSTES),
+                'salaire_base': Decimal(rng.randrange(800, 5000)),
+                'date_naissance': datetime.date(1965 + rng.randrange(40), 1 + rng.randrange(12), 1),
+                'date_embauche': aujourd_hui - datetime.timedelta(days=rng.randrange(15 * 365)),
+            },
+            mot_de_passe=None,
+        ))
+    return lignes
+
+
+def generer_employes(nombre, rng, prefixe='gen'):
+    """Crée `nombre` employés synthétiques par le chemin de l'intégration en masse ; renvoie leurs clés."""
+    lignes = lignes_employes(nombre, rng, prefixe)
+    ecrire(lignes, hacher_mots_de_passe([None] * nombre, 1), ResultatIntegration(), taille_lot=TAILLE_LOT)
+    return [
+        pk for paquet in paquets([ligne.employe['matricule'] for ligne in lignes], 500)
+        for pk in Employe.objects.filter(matricule__in=paquet).values_list('pk', flat=True)
+    ]
+
+
+def generer_annonces(nombre, rng, auteur=None):
+    """
+    Corpus d'annonces synthétiques : mots du vocabulaire courant tirés selon
+    une loi de Zipf, plus quelques mots rares (codes de projet) par annonce,
+    comme dans un vrai fil. Les annonces sont indexées pour la recherche ;
+    renvoie le nombre créé.
+    """
+    cumuls = list(itertools.accumulate(1 / rang for rang in range(1, len(VOCABULAIRE_ANNONCES) + 1)))
+    cree = 0
+    for taille in paquets(range(nombre), TAILLE_LOT):
+        lot = []
+        for _ in taille:
+            mots = rng.choices(VOCABULAIRE_ANNONCES, cum_weights=cumuls, k=rng.randrange(20, 120))
+            for _ in range(rng.randrange(3)):
+                mots.insert(rng.randrange(len(mots)), f'projet-{rng.randrange(10 ** 5):05d}')
+            titre = ' '.join(rng.choices(VOCABULAIRE_ANNONCES, cum_weights=cumuls, k=rng.randrange(2, 7))).capitalize()
+            lot.append(Annonce(titre=titre, contenu=' '.join(mots).capitalize() + '.', auteur=auteur))
+        # bulk_create n'envoie pas post_save : l'index et le fil sont mis à jour ici.
+        indexer_annonces([annonce.pk for annonce in Annonce.objects.bulk_create(lot)])
+        cree += len(lot)
+    invalider_fil()
+    return cree
+
+
+def jours_ouvres_depuis(debut, fin):
+    jour = debut
+    while jour <= fin:
+        if jour.weekday() < 5:
+            yield jour
+        jour += datetime.timedelta(days=1)
+
+
+def generer_presences(employe_ids, debut, fin, rng):
+    """Journées ouvrées de la période et pointages de chaque employé ; renvoie (journées, pointages)."""
+    dates = list(jours_ouvres_depuis(debut, fin))
+    JourneeTravail.objects.bulk_create(
+        [JourneeTravail(date_journee=date) for date in dates], ignore_conflicts=True, batch_size=TAILLE_LOT,
+    )
+    journees = JourneeTravail.objects.filter(date_journee__range=(debut, fin)).values_list('pk', flat=True)
+    nombre, lot = 0, []
+    for journee_id in journees:
+        for employe_id in employe_ids:
+            if rng.random() >= TAUX_PRESENCE:
+                continue
+            arrivee = datetime.time(7 if rng.random() < 0.8 else 8, rng.randrange(60))
+            # Quelques départs non pointés, comme sur une vraie badgeuse.
+            depart = None if rng.random() < 0.02 else datetime.time(16 + rng.randrange(3), rng.randrange(60))
+            lot.append(Presence(employe_id=employe_id, journee_id=journee_id, heure_arrivee=arrivee, heure_depart=depart))
+            if len(lot) >= TAILLE_LOT:
+                nombre += len(Presence.objects.bulk_create(lot, ignore_conflicts=True))
+                lot = []
+    if lot:
+        nombre += len(Presence.objects.bulk_create(lot, ignore_conflicts=True))
+    reconstruire_agregats_presence(dates)
+    return len(dates), nombre
+
+
+def generer_conges(employe_ids, debut, fin, par_an, rng):
+    """Historique de congés sans chevauchement par employé, surtout validés ; renvoie le nombre créé."""
+    jours = (fin - debut).days
+    par_employe = max(1, round(par_an * jours / 365))
+    conges = []
+    for employe_id in employe_ids:
+        pas = jours // par_employe
+        for n in range(par_employe):
+            date_debut = debut + datetime.timedelta(days=n * pas + rng.randrange(max(1, pas - 15)))
+            tirage = rng.random()
+            conges.append(Conge(
+                employe_id=employe_id, date_debut=date_debut,
+                date_fin=date_debut + datetime.timedelta(days=rng.randrange(1, 10)),
+                motif='Congé annuel',
+                statut='VALIDE' if tirage < 0.8 else 'REFUSE' if tirage < 0.9 else 'DEMANDE',
+            ))
+    Conge.objects.bulk_create(conges, batch_size=TAILLE_LOT)
+    reconstruire_soldes()
+    reconstruire_absences()
+    return len(conges)
+
+
+def generer_paie(periodes, rng):
+    """
+    Paie de tous les employés pour les mois donnés, calculée par le moteur de
+    paie, avec des lignes de primes et d'avantages ; seul le dernier mois
+    reste en brouillon. Renvoie (fiches, lignes de primes et d'avantages).
+    """
+    primes = [Prime.objects.get_or_create(nom_prime=nom)[0].pk for nom in PRIMES]
+    avantages = [
+        (Avantage.objects.get_or_create(nom_avantage=nom, defaults={'montant_avantage': montant})[0].pk, montant)
+        for nom, montant in AVANTAGES
+    ]
+    fiches = lignes = 0
+    for annee, mois in periodes:
+        lancer_paie(mois, annee)
+        a_completer = FicheDePaie.objects.filter(annee=annee, mois=mois, statut='BROUILLON')
+        fiche_ids = list(a_completer.values_list('pk', flat=True))
+        lignes_primes = [
+            FichePaiePrime(fiche_de_paie_id=fiche_id, prime_id=prime_id, montant=Decimal(rng.randrange(20, 400)))
+            for fiche_id in fiche_ids for prime_id in primes if rng.random() < 0.3
+        ]
+        lignes_avantages = [
+            FichePaieAvantage(fiche_de_paie_id=fiche_id, avantage_id=avantage_id, montant=montant)
+            for fiche_id in fiche_ids for avantage_id, montant in avantages if rng.random() < 0.6
+        ]
+        with transaction.atomic():
+            FichePaiePrime.objects.bulk_create(lignes_primes, batch_size=TAILLE_LOT, ignore_conflicts=True)
+            FichePaieAvantage.objects.bulk_create(lignes_avantages, batch_size=TAILLE_LOT, ignore_conflicts=True)
+            a_completer.update(
+                cotisations_sociales=ExpressionWrapper(F('salaire_brut') * TAUX_COTISATIONS, output_field=DecimalField()),
+                impot_sur_revenu=ExpressionWrapper(F('salaire_brut') * TAUX_IMPOT, output_field=DecimalField()),
+            )
+        # Second passage : les totaux intègrent les lignes, cotisations et impôt saisis.
+        lancer_paie(mois, annee)
+        fiches += len(fiche_ids)
+        lignes += len(lignes_primes) + len(lignes_avantages)
+    for annee, mois in periodes[:-1]:
+        FicheDePaie.objects.filter(annee=annee, mois=mois).update(statut='EMISE')
+    return fiches, lignes
+
+
+def generer_donnees(employes=1000, annees=1, conges_par_an=4, mois_paie=12, graine=0, rappel=None):
+    """
+    Génère un jeu complet et renvoie un ResultatGeneration. `rappel`, s'il est
+    fourni, reçoit un message à chaque étape.
+    """
+    rng = random.Random(graine)
+    resultat = ResultatGeneration()
+    debut = time.perf_counter()
+    signaler = rappel or (lambda message: None)
+    aujourd_hui = datetime.date.today()
+    origine = aujourd_hui - datetime.timedelta(days=round(365 * annees))
+
+    signaler(f"{employes} employés")
+    employe_ids = generer_employes(employes, rng)
+    resultat.employes = len(employe_ids)
+    signaler("Pointages")
+    resultat.journees, resultat.presences = generer_presences(employe_ids, origine, aujourd_hui, rng)
+    signaler("Congés")
+    resultat.conges = generer_conges(employe_ids, origine, aujourd_hui, conges_par_an, rng)
+    signaler("Paie")
+    dernier = datetime.date(aujourd_hui.year, aujourd_hui.month, 1)
+    periodes = []
+    for _ in range(mois_paie):
+        periodes.append((dernier.year, dernier.month))
+        dernier = (dernier - datetime.timedelta(days=1)).replace(day=1)
+    resultat.fiches, resultat.lignes_paie = generer_paie(periodes[::-1], rng)
+    signaler("Synthèses du tableau de bord")
+    rafraichir_syntheses(toutes_les_periodes())
+    resultat.duree = time.perf_counter() - debut
+    return resultat
@@ -0,0 +1,258 @@
+"""
+Instrumentation des vues : latence, nombre de requêtes SQL et motifs N+1.
+
+InstrumentationMiddleware mesure une fraction des requêtes HTTP
+(INSTRUMENTATION_TAUX : 1 pour toutes, 0 pour désactiver). Les requêtes
+SQL sont comptées et chronométrées par un execute_wrapper posé sur les
+connexions le temps de la requête : aucun besoin de DEBUG, et une requête
+non échantillonnée ne coûte qu'un tirage aléatoire.
+
+Chaque requête SQL est ramenée à sa forme (paramètres, littéraux et listes
+IN remplacés par des jokers). Une même forme exécutée au moins
+INSTRUMENTATION_SEUIL_N_PLUS_UN fois pendant une requête HTTP est signalée
+comme motif N+1 : c'est la signature d'un {{ fiche.employe }} dans une
+boucle de gabarit sans select_related.
+
+Les mesures sont gardées en mémoire et écrites par paquets (MesureRequete),
+jamais une écriture par requête mesurée. rapport() les agrège par nom d'URL
+pour la commande rapport_instrumentation et la page d'administration.
+
+Le middleware est aussi asynchrone : sous ASGI, il ne force pas les vues
+asynchrones à passer par un thread, et l'écriture d'un paquet de mesures est
+seule déléguée à sync_to_async.
+"""
+import atexit
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+
+from .mesures import resume_latences
+from .models import MesureRequete
+
+logger = logging.getLogger(__name__)
+
+SEUIL_N_PLUS_UN = 5
+TAILLE_TAMPON = 200
+INTERVALLE_ECRITURE = 10.0  # secondes
+# Formes SQL gardées par mesure, les plus répétées d'abord.
+MOTIFS_PAR_MESURE = 5
+
+_LITTERAUX = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTES = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACES = re.compile(r'\s+')
+
+
+def forme_sql(sql):
+    """Forme d'une requête SQL : deux exécutions ne différant que par leurs valeurs ont la même forme."""
+    forme = _LITTERAUX.sub('?', sql).replace('%s', '?')
+    forme = _LISTES.sub('(?, ...)', forme)
+    return _ESPACES.sub(' ', forme).strip()
+
+
+class Collecte:
+    """execute_wrapper qui compte et chronomètre les requêtes SQL d'une requête HTTP."""
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+        self.executions = Counter()  # {(sql, paramètres): nombre}
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.nombre += 1
+            self.executions[(sql, repr(params))] += 1
+
+    def formes(self):
+        formes = Counter()
+        for (sql, _), nombre in self.executions.items():
+            formes[sql] += nombre
+        # Normalisation une fois par texte SQL distinct, pas à chaque exécution.
+        par_forme = Counter()
+        for sql, nombre in formes.items():
+            par_forme[forme_sql(sql)] += nombre
+        return par_forme
+
+    @property
+    def dupliquees(self):
+        return sum(nombre - 1 for nombre in self.executions.values())
+
+
+class TamponMesures:
+    """Accumule les mesures et les écrit en une insertion groupée par paquet ou par intervalle."""
+
+    def __init__(self, taille=TAILLE_TAMPON, intervalle=INTERVALLE_ECRITURE):
+        self.taille = taille
+        self.intervalle = intervalle
+        self.mesures = []
+        self.verrou = threading.Lock()
+        self.derniere_ecriture = time.monotonic()
+
+    def empiler(self, mesure):
+        """Ajoute une mesure sans écrire ; renvoie True s'il est temps de vider le tampon."""
+        with self.verrou:
+            self.mesures.append(mesure)
+            return len(self.mesures) >= self.taille or time.monotonic() - self.derniere_ecriture >= self.intervalle
+
+    def ajouter(self, mesure):
+        if self.empiler(mesure):
+            self.vider()
+
+    def vider(self):
+        with self.verrou:
+            mesures, self.mesures = self.mesures, []
+            self.derniere_ecriture = time.monotonic()
+        if not mesures:
+            return
+        try:
+            MesureRequete.objects.bulk_create(mesures, batch_size=500)
+        except DatabaseError:
+            # L'instrumentation ne doit jamais faire échouer l'application.
+            logger.exception("Écriture de %d mesures de requêtes impossible", len(mesures))
+
+
+tampon = TamponMesures()
+atexit.register(tampon.vider)
+
+
+class InstrumentationMiddleware:
+    """Mesure latence et requêtes SQL d'une fraction des requêtes, par nom d'URL."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.taux = getattr(settings, 'INSTRUMENTATION_TAUX', 1.0)
+        self.seuil = getattr(settings, 'INSTRUMENTATION_SEUIL_N_PLUS_UN', SEUIL_N_PLUS_UN)
+        if not self.taux:
+            raise MiddlewareNotUsed
+        self.asynchrone = iscoroutinefunction(get_response)
+        if self.asynchrone:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asynchrone:
+            return self.__acall__(request)
+        if random.random() >= self.taux:
+            return self.get_response(request)
+        collecte = Collecte()
+        debut = time.perf_counter()
+        with self.observer(collecte):
+            response = self.get_response(request)
+        tampon.ajouter(self.mesure(request, response, collecte, time.perf_counter() - debut))
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.taux:
+            return await self.get_response(request)
+        collecte = Collecte()
+        debut = time.perf_counter()
+        # Les connexions sont propres à chaque fil : l'ORM asynchrone exécute ses
+        # requêtes dans le fil de sync_to_async de la requête, c'est là qu'on les observe.
+        pile = await sync_to_async(self.observer)(collecte)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pile.close)()
+        if tampon.empiler(self.mesure(request, response, collecte, time.perf_counter() - debut)):
+            await sync_to_async(tampon.vider)()
+        return response
+
+    @staticmethod
+    def observer(collecte):
+        pile = ExitStack()
+        for connexion in connections.all():
+            pile.enter_context(connexion.execute_wrapper(collecte))
+        return pile
+
+    def mesure(self, request, response, collecte, duree):
+        correspondance = getattr(request, 'resolver_match', None)
+        motifs = [
+            {'sql': forme, 'nombre': nombre}
+            for forme, nombre in collecte.formes().most_common(MOTIFS_PAR_MESURE) if nombre >= self.seuil
+        ]
+        return MesureRequete(
+            vue=(correspondance.view_name if correspondance else '(non résolue)')[:200],
+            methode=request.method[:10],
+            statut=response.status_code,
+            duree_ms=duree * 1000,
+            nombre_requetes=collecte.nombre,
+            duree_sql_ms=collecte.duree * 1000,
+            requetes_dupliquees=collecte.dupliquees,
+            motifs_repetes=motifs,
+        )
+
+
+# --- Rapport ---
+
+@dataclass
+class StatistiquesVue:
+    """Agrégat des mesures d'une vue ; `motifs` est trié par nombre de requêtes HTTP concernées."""
+    vue: str
+    nombre: int = 0
+    latences: dict = field(default_factory=dict)
+    requetes_moyenne: float = 0.0
+    requetes_max: int = 0
+    sql_moyenne_ms: float = 0.0
+    dupliquees_moyenne: float = 0.0
+    motifs: list = field(default_factory=list)  # [(forme, requêtes HTTP concernées, répétitions max), ...]
+
+    @property
+    def n_plus_un(self):
+        return bool(self.motifs)
+
+
+def rapport(depuis=None, vue=None):
+    """Statistiques par vue des mesures depuis `depuis`, les vues à motif N+1 puis les plus lentes d'abord."""
+    mesures = MesureRequete.objects.order_by()
+    if depuis is not None:
+        mesures = mesures.filter(date__gte=depuis)
+    if vue:
+        mesures = mesures.filter(vue=vue)
+    durees = defaultdict(list)
+    cumuls = defaultdict(lambda: {'requetes': 0, 'max': 0, 'sql': 0.0, 'dupliquees': 0})
+    motifs = defaultdict(dict)
+    for nom, duree_ms, requetes, sql_ms, dupliquees, repetes in mesures.values_list(
+        'vue', 'duree_ms', 'nombre_requetes', 'duree_sql_ms', 'requetes_dupliquees', 'motifs_repetes',
+    ).iterator(chunk_size=5000):
+        durees[nom].append(duree_ms / 1000)
+        cumul = cumuls[nom]
+        cumul['requetes'] += requetes
+        cumul['max'] = max(cumul['max'], requetes)
+        cumul['sql'] += sql_ms
+        cumul['dupliquees'] += dupliquees
+        for motif in repetes:
+            concernees, maximum = motifs[nom].get(motif['sql'], (0, 0))
+            motifs[nom][motif['sql']] = (concernees + 1, max(maximum, motif['nombre']))
+    statistiques = []
+    for nom, liste in durees.items():
+        nombre, cumul = len(liste), cumuls[nom]
+        statistiques.append(StatistiquesVue(
+            vue=nom, nombre=nombre, latences=resume_latences(liste),
+            requetes_moyenne=cumul['requetes'] / nombre, requetes_max=cumul['max'],
+            sql_moyenne_ms=cumul['sql'] / nombre, dupliquees_moyenne=cumul['dupliquees'] / nombre,
+            motifs=sorted(
+                ((forme, concernees, maximum) for forme, (concernees, maximum) in motifs[nom].items()),
+                key=lambda motif: (-motif[1], -motif[2]),
+            ),
+        ))
+    statistiques.sort(key=lambda s: (not s.n_plus_un, -s.latences['p95_ms']))
+    return statistiques
+
+
+def purger_mesures(avant):
+    """Supprime les mesures antérieures à `avant` ; renvoie le nombre supprimé."""
+    return MesureRequete.objects.filter(date__lt=avant).delete()[0]
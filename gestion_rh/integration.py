@@ -0,0 +1,264 @@
+"""
+Intégration en masse de nouveaux employés (compte Utilisateur + fiche Employe).
+
+Le fichier (CSV ou JSONL, mêmes colonnes que lire_lignes) est d'abord validé
+en entier : champs obligatoires, formats, doublons dans le fichier et en
+base. Seules les lignes valides poursuivent. Les mots de passe sont hachés
+dans un pool de processus (le hachage est volontairement lent : c'est lui
+qui domine le temps d'une intégration), puis comptes et fiches sont créés
+par bulk_create, un lot par transaction. Une ligne rejetée n'interrompt
+jamais l'import : elle figure dans le rapport d'erreurs.
+
+Colonnes : username, matricule, nom, prenom, date_naissance, telephone,
+service, poste, salaire_base, date_embauche ; facultatives : email,
+mot_de_passe (sans mot de passe, le compte est créé inutilisable jusqu'à sa
+réinitialisation) et role (Employe par défaut). Les libellés service et
+poste sont rattachés aux référentiels Departement et Poste, créés au besoin.
+"""
+import csv
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connections, transaction
+
+from .annuaire import indexer_employes
+from .exports import paquets
+from .models import Departement, Employe, Poste, Role, Utilisateur
+from .pointage import lire_lignes
+from .referentiels import resoudre
+from .tableau_de_bord import marquer_depuis
+
+CHAMPS_OBLIGATOIRES = (
+    'username', 'matricule', 'nom', 'prenom', 'date_naissance', 'telephone',
+    'service', 'poste', 'salaire_base', 'date_embauche',
+)
+CHAMPS_EMPLOYE = ('matricule', 'nom', 'prenom', 'telephone')
+# Colonnes texte rattachées aux référentiels : {colonne: (modèle, champ libellé, clé étrangère)}
+REFERENTIELS = {'service': (Departement, 'nom', 'departement_id'), 'poste': (Poste, 'intitule', 'poste_id')}
+# Taille des lots de recherche des doublons en base (limite de paramètres SQLite).
+TAILLE_RECHERCHE = 500
+
+
+@dataclass
+class ResultatIntegration:
+    """Bilan d'une intégration ; `erreurs` contient toutes les lignes rejetées."""
+    lues: int = 0
+    creees: int = 0
+    rejetees: int = 0
+    duree: float = 0.0
+    erreurs: list = field(default_factory=list)  # [(numéro de ligne, identifiant, raison), ...]
+
+    @property
+    def lignes_par_seconde(self):
+        return self.lues / self.duree if self.duree else 0.0
+
+    def rejeter(self, numero, identifiant, raison):
+        self.rejetees += 1
+        self.erreurs.append((numero, identifiant, raison))
+
+
+@dataclass
+class LigneValide:
+    numero: int
+    utilisateur: dict
+    employe: dict
+    mot_de_passe: str | None
+
+
+def _longueur_max(modele, champ):
+    return modele._meta.get_field(champ).max_length
+
+
+def _analyser(ligne, roles):
+    """Convertit une ligne brute en LigneValide (sans numéro) ou lève ValueError avec toutes ses erreurs."""
+    if not isinstance(ligne, dict):
+        raise ValueError(ligne)
+    valeurs = {cle: str(valeur).strip() for cle, valeur in ligne.items() if cle and valeur is not None}
+    erreurs = [f"{champ} manquant" for champ in CHAMPS_OBLIGATOIRES if not valeurs.get(champ)]
+
+    username = valeurs.get('username', '')
+    if username:
+        try:
+            Utilisateur.username_validator(username)
+        except ValidationError:
+            erreurs.append(f"username invalide : {username!r}")
+    limites = [(champ, _longueur_max(Employe, champ)) for champ in CHAMPS_EMPLOYE]
+    limites += [('username', _longueur_max(Utilisateur, 'username'))]
+    limites += [(colonne, _longueur_max(modele, champ)) for colonne, (modele, champ, _) in REFERENTIELS.items()]
+    for champ, longueur in limites:
+        if len(valeurs.get(champ, '')) > longueur:
+            erreurs.append(f"{champ} trop long")
+    email = valeurs.get('email', '')
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            erreurs.append(f"email invalide : {email!r}")
+    role_id = roles.get(valeurs.get('role') or Role.EMPLOYE)
+    if role_id is None:
+        erreurs.append(f"rôle inconnu : {valeurs.get('role') or Role.EMPLOYE!r}")
+
+    dates = {}
+    for champ in ('date_naissance', 'date_embauche'):
+        if valeurs.get(champ):
+            try:
+                dates[champ] = datetime.date.fromisoformat(valeurs[champ])
+            except ValueError:
+                erreurs.append(f"{champ} invalide : {valeurs[champ]!r}")
+    salaire = None
+    if valeurs.get('salaire_base'):
+        try:
+            salaire = Decimal(valeurs['salaire_base']).quantize(Decimal('0.01'))
+            if not Decimal('0') <= salaire < Decimal('1e8'):
+                raise InvalidOperation
+        except InvalidOperation:
+            erreurs.append(f"salaire_base invalide : {valeurs['salaire_base']!r}")
+
+    if erreurs:
+        raise ValueError('; '.join(erreurs))
+    return LigneValide(
+        numero=0,
+        utilisateur={
+            'username': username, 'email': email, 'role_id': role_id,
+            'first_name': valeurs['prenom'][:150], 'last_name': valeurs['nom'][:150],
+        },
+        employe={
+            **{champ: valeurs[champ] for champ in (*CHAMPS_EMPLOYE, *REFERENTIELS)},
+            **dates, 'salaire_base': salaire,
+        },
+        mot_de_passe=valeurs.get('mot_de_passe') or None,
+    )
+
+
+def _existants(modele, champ, valeurs):
+    """Sous-ensemble de `valeurs` déjà présent en base pour `champ`."""
+    existants = set()
+    for paquet in paquets(valeurs, TAILLE_RECHERCHE):
+        existants.update(modele.objects.filter(**{f'{champ}__in': paquet}).values_list(champ, flat=True))
+    return existants
+
+
+def valider(lignes, resultat):
+    """Valide toutes les lignes avant toute écriture ; renvoie la liste des LigneValide."""
+    roles = dict(Role.objects.values_list('nom_role', 'pk'))
+    valides, usernames, matricules = [], {}, {}
+    for numero, ligne in enumerate(lignes, start=1):
+        resultat.lues += 1
+        identifiant = ligne.get('username', '') if isinstance(ligne, dict) else ''
+        try:
+            valide = _analyser(ligne, roles)
+        except ValueError as exc:
+            resultat.rejeter(numero, identifiant, str(exc))
+            continue
+        valide.numero = numero
+        username, matricule = valide.utilisateur['username'], valide.employe['matricule']
+        if username in usernames:
+            resultat.rejeter(numero, username, f"username en double (ligne {usernames[username]})")
+        elif matricule in matricules:
+            resultat.rejeter(numero, username, f"matricule en double (ligne {matricules[matricule]})")
+        else:
+            usernames[username] = matricules[matricule] = numero
+            valides.append(valide)
+
+    pris_usernames = _existants(Utilisateur, 'username', list(usernames))
+    pris_matricules = _existants(Employe, 'matricule', list(matricules))
+    retenues = []
+    for valide in valides:
+        if valide.utilisateur['username'] in pris_usernames:
+            resultat.rejeter(valide.numero, valide.utilisateur['username'], "username déjà utilisé")
+        elif valide.employe['matricule'] in pris_matricules:
+            resultat.rejeter(valide.numero, valide.utilisateur['username'], "matricule déjà utilisé")
+        else:
+            retenues.append(valide)
+    return retenues
+
+
+def hacher_mots_de_passe(mots_de_passe, nb_workers):
+    """Hache les mots de passe (None donne un mot de passe inutilisable), en parallèle si nb_workers > 1."""
+    if nb_workers <= 1 or len(mots_de_passe) < 2:
+        return [make_password(m) for m in mots_de_passe]
+    # Les workers héritent du processus courant : on ferme les connexions avant de les créer.
+    connections.close_all()
+    taille_paquet = max(1, len(mots_de_passe) // (nb_workers * 4))
+    with ProcessPoolExecutor(max_workers=nb_workers, initializer=django.setup) as pool:
+        return list(pool.map(make_password, mots_de_passe, chunksize=taille_paquet))
+
+
+def _creer(lot, hachages):
+    """Crée les comptes puis les fiches d'un lot, dans la transaction courante."""
+    utilisateurs = Utilisateur.objects.bulk_create([
+        Utilisateur(password=hachage, **ligne.utilisateur) for ligne, hachage in zip(lot, hachages)
+    ])
+    if any(u.pk is None for u in utilisateurs):
+        # Base sans RETURNING sur les insertions groupées : on relit les clés.
+        ids = dict(Utilisateur.objects.filter(
+            username__in=[u.username for u in utilisateurs],
+        ).values_list('username', 'pk'))
+        for utilisateur in utilisateurs:
+            utilisateur.pk = ids[utilisateur.username]
+    employes = Employe.objects.bulk_create([
+        Employe(utilisateur_id=utilisateur.pk, **ligne.employe) for ligne, utilisateur in zip(lot, utilisateurs)
+    ])
+    # bulk_create n'envoie pas post_save : l'annuaire et les effectifs du tableau de bord sont mis à jour ici.
+    indexer_employes([employe.pk for employe in employes])
+    marquer_depuis(min(employe.date_embauche for employe in employes))
+
+
+def _rattacher_referentiels(valides):
+    """Remplace les libellés service / poste par les clés des référentiels, créés au besoin en une fois."""
+    for colonne, (modele, champ, cle_etrangere) in REFERENTIELS.items():
+        ids = resoudre(modele, champ, {ligne.employe[colonne] for ligne in valides})
+        for ligne in valides:
+            ligne.employe[cle_etrangere] = ids[ligne.employe.pop(colonne)]
+
+
+def ecrire(valides, hachages, resultat, taille_lot=1000, rappel=None):
+    """
+    Écrit les lignes validées par lots. Si un lot est refusé par la base (une
+    insertion concurrente entre la validation et l'écriture), ses lignes sont
+    reprises une à une pour isoler les fautives.
+    """
+    _rattacher_referentiels(valides)
+    for debut in range(0, len(valides), taille_lot):
+        lot, lot_hachages = valides[debut:debut + taille_lot], hachages[debut:debut + taille_lot]
+        try:
+            with transaction.atomic():
+                _creer(lot, lot_hachages)
+            resultat.creees += len(lot)
+        except IntegrityError:
+            for ligne, hachage in zip(lot, lot_hachages):
+                try:
+                    with transaction.atomic():
+                        _creer([ligne], [hachage])
+                    resultat.creees += 1
+                except IntegrityError as exc:
+                    resultat.rejeter(ligne.numero, ligne.utilisateur['username'], str(exc))
+        if rappel is not None:
+            rappel(resultat)
+
+
+def integrer_employes(flux, format_fichier='csv', taille_lot=1000, nb_workers=None, rappel=None):
+    """Intègre les employés d'un flux texte et renvoie un ResultatIntegration."""
+    resultat = ResultatIntegration()
+    debut = time.perf_counter()
+    valides = valider(lire_lignes(flux, format_fichier), resultat)
+    hachages = hacher_mots_de_passe([v.mot_de_passe for v in valides], nb_workers or os.cpu_count() or 1)
+    ecrire(valides, hachages, resultat, taille_lot, rappel)
+    resultat.erreurs.sort()
+    resultat.duree = time.perf_counter() - debut
+    return resultat
+
+
+def ecrire_rapport(resultat, flux):
+    """Écrit le rapport des lignes rejetées au format CSV."""
+    redacteur = csv.writer(flux)
+    redacteur.writerow(('ligne', 'username', 'erreur'))
+    redacteur.writerows(resultat.erreurs)
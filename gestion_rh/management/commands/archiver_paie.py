@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_rh.archives_paie import ErreurArchive, annees_archivables, archiver_annee, restaurer_annee
+from gestion_rh.models import ArchivePaie
+
+
+class Command(BaseCommand):
+    help = (
+        "Sort les années de paie closes (fiches toutes émises, hors des années récentes) des tables "
+        "vers des archives JSONL compressées, ou remet une année archivée en table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=int, action='append',
+                            help="Année à archiver (répétable) ; par défaut toutes les années archivables.")
+        parser.add_argument('--restaurer', type=int, metavar='ANNEE', help="Remet en table une année archivée.")
+        parser.add_argument('--lister', action='store_true', help="Affiche les archives existantes.")
+
+    def handle(self, *args, **options):
+        if options['lister']:
+            for archive in ArchivePaie.objects.order_by('annee'):
+                self.stdout.write(
+                    f"{archive.annee} : {archive.nombre_fiches} fiches, {archive.nombre_lignes} lignes, "
+                    f"masse nette {archive.masse_nette}, {archive.fichier} ({archive.date_archivage:%d/%m/%Y})"
+                )
+            return
+        try:
+            if options['restaurer'] is not None:
+                nombre = restaurer_annee(options['restaurer'])
+                self.stdout.write(self.style.SUCCESS(f"{nombre} fiches de {options['restaurer']} remises en table."))
+                return
+            annees = options['annee'] or annees_archivables()
+            if not annees:
+                self.stdout.write("Aucune année à archiver.")
+            for annee in annees:
+                archive = archiver_annee(annee)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{annee} archivée : {archive.nombre_fiches} fiches et {archive.nombre_lignes} lignes "
+                    f"dans {archive.fichier}."
+                ))
+        except ErreurArchive as exc:
+            raise CommandError(str(exc))
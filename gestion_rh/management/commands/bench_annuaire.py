@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_rh.annuaire import cache_recherche, rechercher
+from gestion_rh.generation import generer_employes
+from gestion_rh.mesures import resume_latences
+from gestion_rh.models import Employe
+
+
+def faute(mot, rng):
+    """Introduit une faute de frappe (substitution, suppression ou inversion)."""
+    i = rng.randrange(1, len(mot) - 1)
+    genre = rng.randrange(3)
+    if genre == 0:
+        return mot[:i] + rng.choice('aeioursnt') + mot[i + 1:]
+    if genre == 1:
+        return mot[:i] + mot[i + 1:]
+    return mot[:i] + mot[i + 1] + mot[i] + mot[i + 2:]
+
+
+class Command(BaseCommand):
+    help = "Mesure la latence de la recherche dans l'annuaire (préfixes, plusieurs termes, fautes de frappe)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=1000)
+        parser.add_argument('--generer', type=int, default=0,
+                            help="Crée d'abord N employés synthétiques (base de test uniquement).")
+        parser.add_argument('--seuil-ms', type=float, default=20.0,
+                            help="Échoue si le p99 sans cache dépasse cette valeur.")
+        parser.add_argument('--graine', type=int, default=0)
+
+    def requete(self, echantillon, rng):
+        nom, prenom, matricule = rng.choice(echantillon)
+        genre = rng.randrange(4)
+        if genre == 0:
+            return nom[:rng.randrange(2, len(nom) + 1)]
+        if genre == 1:
+            return f"{prenom} {nom[:rng.randrange(1, len(nom) + 1)]}"
+        if genre == 2 and len(nom) >= 5:
+            return faute(nom, rng)
+        return matricule[:rng.randrange(3, len(matricule) + 1)]
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['graine'])
+        if options['generer']:
+            debut = time.perf_counter()
+            generer_employes(options['generer'], rng, prefixe='bench')
+            self.stdout.write(f"{options['generer']} employés créés et indexés en {time.perf_counter() - debut:.2f}s")
+        echantillon = list(Employe.objects.order_by('?').values_list('nom', 'prenom', 'matricule')[:1000])
+        if not echantillon:
+            raise CommandError("Aucun employé en base : générez d'abord des données.")
+        requetes = [self.requete(echantillon, rng) for _ in range(options['requetes'])]
+
+        total = Employe.objects.count()
+        resumes = {}
+        for mode in ('sans cache', 'avec cache'):
+            durees = []
+            if mode == 'avec cache':
+                # Requêtes « chaudes » : déjà servies une fois par ce processus.
+                for texte in requetes:
+                    rechercher(texte)
+            for texte in requetes:
+                if mode == 'sans cache':
+                    cache_recherche.vider()
+                depart = time.perf_counter()
+                rechercher(texte)
+                durees.append(time.perf_counter() - depart)
+            resumes[mode] = resume = resume_latences(durees)
+            self.stdout.write(
+                f"{resume['nombre']} recherches {mode} sur {total} employés : "
+                f"moyenne {resume['moyenne_ms']:.2f}ms, p50 {resume['p50_ms']:.2f}ms, "
+                f"p95 {resume['p95_ms']:.2f}ms, p99 {resume['p99_ms']:.2f}ms"
+            )
+        if resumes['sans cache']['p99_ms'] > options['seuil_ms']:
+            raise CommandError(f"p99 au-delà du seuil de {options['seuil_ms']}ms.")
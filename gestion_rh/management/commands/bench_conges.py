@@ -0,0 +1,60 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_rh.conges import reconstruire_absences, reconstruire_soldes, verifier_conge
+from gestion_rh.mesures import resume_latences
+from gestion_rh.models import Conge, Employe
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence de la vérification de chevauchement et de capacité d'équipe "
+        "d'un congé sur les données en base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verifications', type=int, default=1000)
+        parser.add_argument('--generer', type=int, default=0,
+                            help="Crée d'abord N congés validés synthétiques (base de test uniquement).")
+        parser.add_argument('--seuil-ms', type=float, default=10.0,
+                            help="Échoue si le p99 dépasse cette valeur.")
+        parser.add_argument('--graine', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['graine'])
+        employes = list(Employe.objects.values_list('pk', flat=True))
+        if not employes:
+            raise CommandError("Aucun employé en base : générez d'abord des données.")
+        origine = datetime.date.today() - datetime.timedelta(days=5 * 365)
+
+        def periode():
+            debut = origine + datetime.timedelta(days=rng.randrange(5 * 365))
+            return debut, debut + datetime.timedelta(days=rng.randrange(1, 15))
+
+        if options['generer']:
+            conges = []
+            for _ in range(options['generer']):
+                debut, fin = periode()
+                conges.append(Conge(employe_id=rng.choice(employes), date_debut=debut, date_fin=fin,
+                                    motif='Synthétique', statut='VALIDE'))
+            Conge.objects.bulk_create(conges, batch_size=5000)
+            reconstruire_soldes()
+            reconstruire_absences()
+
+        durees = []
+        for _ in range(options['verifications']):
+            debut, fin = periode()
+            depart = time.perf_counter()
+            verifier_conge(rng.choice(employes), debut, fin)
+            durees.append(time.perf_counter() - depart)
+        resume = resume_latences(durees)
+        self.stdout.write(
+            f"{resume['nombre']} vérifications sur {Conge.objects.count()} congés : "
+            f"moyenne {resume['moyenne_ms']:.2f}ms, p50 {resume['p50_ms']:.2f}ms, "
+            f"p95 {resume['p95_ms']:.2f}ms, p99 {resume['p99_ms']:.2f}ms"
+        )
+        if resume['p99_ms'] > options['seuil_ms']:
+            raise CommandError(f"p99 au-delà du seuil de {options['seuil_ms']}ms.")
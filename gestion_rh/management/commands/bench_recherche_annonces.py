@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from gestion_rh.generation import VOCABULAIRE_ANNONCES, generer_annonces
+from gestion_rh.mesures import resume_latences
+from gestion_rh.models import Annonce, MotAnnonce
+from gestion_rh.recherche_annonces import cache_frequences, rechercher_annonces
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence de la recherche plein texte dans les annonces (mot courant, code rare, "
+        "plusieurs termes, préfixe) et vérifie qu'aucune requête ne parcourt les textes (LIKE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=500)
+        parser.add_argument('--generer', type=int, default=0,
+                            help="Crée d'abord N annonces synthétiques indexées (base de test uniquement).")
+        parser.add_argument('--seuil-ms', type=float, default=50.0,
+                            help="Échoue si le p99 dépasse cette valeur.")
+        parser.add_argument('--graine', type=int, default=0)
+
+    def requete(self, rng):
+        genre = rng.randrange(4)
+        if genre == 0:
+            return rng.choice(VOCABULAIRE_ANNONCES)
+        if genre == 1:
+            return f'projet {rng.randrange(10 ** 5):05d}'
+        if genre == 2:
+            return ' '.join(rng.sample(VOCABULAIRE_ANNONCES, rng.randrange(2, 4)))
+        mot = rng.choice(VOCABULAIRE_ANNONCES)
+        return f"{rng.choice(VOCABULAIRE_ANNONCES)} {mot[:rng.randrange(3, len(mot) + 1)]}*"
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['graine'])
+        if options['generer']:
+            debut = time.perf_counter()
+            generer_annonces(options['generer'], rng)
+            self.stdout.write(f"{options['generer']} annonces créées et indexées en {time.perf_counter() - debut:.2f}s")
+        total = Annonce.objects.count()
+        if not total:
+            raise CommandError("Aucune annonce en base : utilisez --generer.")
+        requetes = [self.requete(rng) for _ in range(options['requetes'])]
+
+        balayages = []
+
+        def surveiller(execute, sql, params, many, context):
+            if ' LIKE ' in sql.upper():
+                balayages.append(sql)
+            return execute(sql, params, many, context)
+
+        durees, trouvees = [], 0
+        with connection.execute_wrapper(surveiller):
+            for texte in requetes:
+                cache_frequences.vider()
+                depart = time.perf_counter()
+                trouvees += bool(rechercher_annonces(texte))
+                durees.append(time.perf_counter() - depart)
+        resume = resume_latences(durees)
+        self.stdout.write(
+            f"{resume['nombre']} recherches sur {total} annonces ({MotAnnonce.objects.count()} entrées d'index), "
+            f"{trouvees} avec résultats : moyenne {resume['moyenne_ms']:.2f}ms, p50 {resume['p50_ms']:.2f}ms, "
+            f"p95 {resume['p95_ms']:.2f}ms, p99 {resume['p99_ms']:.2f}ms"
+        )
+        if balayages:
+            raise CommandError(f"{len(balayages)} requêtes LIKE : la recherche doit passer par l'index.")
+        if resume['p99_ms'] > options['seuil_ms']:
+            raise CommandError(f"p99 au-delà du seuil de {options['seuil_ms']}ms.")
@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion_rh.benchmarks import SCENARIOS, ErreurBenchmark, comparer, executer_suite, volumes
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les chemins critiques (listes, détails, exports, paie, vérification de congé) sur les "
+        "données en base. Échoue si un p95 dépasse le seuil du scénario ou régresse par rapport à une référence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help="Scénarios à exécuter (tous par défaut).")
+        parser.add_argument('--lister', action='store_true', help="Affiche les scénarios disponibles.")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--echauffement', type=int, default=2)
+        parser.add_argument('--sortie', help="Écrit les résultats dans ce fichier JSON.")
+        parser.add_argument('--reference', help="Compare à un fichier JSON produit par --sortie.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Hausse relative du p95 admise par rapport à la référence (0.2 = 20 %%).")
+        parser.add_argument('--sans-seuils', action='store_true', help="N'échoue pas sur les seuils absolus.")
+        parser.add_argument('--graine', type=int, default=0)
+
+    def afficher(self, resultat):
+        latences = resultat.latences
+        ligne = (
+            f"{resultat.nom} : p50 {latences['p50_ms']:.1f}ms, p95 {latences['p95_ms']:.1f}ms, "
+            f"p99 {latences['p99_ms']:.1f}ms, {resultat.requetes:.1f} requêtes SQL"
+        )
+        self.stdout.write(self.style.WARNING(ligne) if resultat.depasse_seuil else ligne)
+
+    def handle(self, *args, **options):
+        if options['lister']:
+            for scenario in SCENARIOS.values():
+                self.stdout.write(f"{scenario.nom} (seuil {scenario.seuil_ms:g}ms) : {scenario.description}")
+            return
+        reference = None
+        if options['reference']:
+            try:
+                reference = json.loads(Path(options['reference']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as erreur:
+                raise CommandError(f"Référence illisible : {erreur}")
+
+        mesures = volumes()
+        try:
+            resultats = executer_suite(
+                options['scenarios'] or None, options['iterations'], options['echauffement'],
+                options['graine'], rappel=self.afficher,
+            )
+        except ErreurBenchmark as erreur:
+            raise CommandError(str(erreur))
+
+        if options['sortie']:
+            Path(options['sortie']).write_text(json.dumps({
+                'date': timezone.now().isoformat(),
+                'volumes': mesures,
+                'iterations': options['iterations'],
+                'scenarios': {resultat.nom: resultat.en_dict() for resultat in resultats},
+            }, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(f"Résultats écrits dans {options['sortie']}.")
+
+        echecs = []
+        if not options['sans_seuils']:
+            echecs += [
+                f"{resultat.nom} : p95 {resultat.latences['p95_ms']:.1f}ms au-delà du seuil de {resultat.seuil_ms:g}ms"
+                for resultat in resultats if resultat.depasse_seuil
+            ]
+        if reference is not None:
+            if reference.get('volumes') != mesures:
+                self.stdout.write(self.style.WARNING(
+                    f"Volumes différents de la référence ({reference.get('volumes')} contre {mesures}) : "
+                    "comparaison indicative."
+                ))
+            for regression in comparer(resultats, reference, options['tolerance']):
+                echecs.append(f"{regression.nom} : régression, {', '.join(regression.motifs)}")
+        if echecs:
+            for echec in echecs:
+                self.stderr.write(echec)
+            raise CommandError(f"{len(echecs)} échec(s) de performance.")
+        self.stdout.write(self.style.SUCCESS(f"{len(resultats)} scénarios dans les seuils."))
@@ -0,0 +1,151 @@
+import logging
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion_rh.formations import STATUTS_PLACE, inscrire_service
+from gestion_rh.mesures import resume_latences
+from gestion_rh.models import Employe, Formation, ParticipationFormation
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge des inscriptions aux formations : des centaines d'employés s'inscrivent "
+        "en même temps à une formation de petite capacité, puis une partie des inscrits se désiste "
+        "pendant l'inscription en masse d'un service. Vérifie ensuite qu'aucune place n'a été "
+        "surréservée et que le compteur de places et la liste d'attente sont cohérents. "
+        "Crée puis supprime une formation de test : à lancer sur une base de test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employes', type=int, default=500, help="Nombre d'employés qui s'inscrivent.")
+        parser.add_argument('--capacite', type=int, default=50, help="Capacité de la formation de test.")
+        parser.add_argument('--concurrence', type=int, default=32, help="Nombre de fils simultanés.")
+        parser.add_argument('--desistements', type=float, default=0.3,
+                            help="Part des inscrits qui se désistent pendant la seconde vague.")
+        parser.add_argument('--graine', type=int, default=0)
+        parser.add_argument('--garder', action='store_true', help="Conserve la formation de test.")
+
+    def handle(self, *args, **options):
+        employes = list(Employe.objects.select_related('utilisateur').order_by('pk')[:options['employes']])
+        if not employes:
+            raise CommandError("Aucun employé en base : générez d'abord des données.")
+        rng = random.Random(options['graine'])
+        # Les doubles inscriptions répondent 409 par centaines : pas d'avertissement pour chacune.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        clients = {}
+        for employe in employes:
+            client = Client(HTTP_HOST='localhost', HTTP_ACCEPT='application/json', raise_request_exception=False)
+            client.force_login(employe.utilisateur)
+            clients[employe.pk] = client
+        formation = Formation.objects.create(
+            titre=f"Test de charge {timezone.now():%Y-%m-%d %H:%M:%S}", description="", duree_heures=1,
+            capacite=options['capacite'],
+        )
+        try:
+            # Première vague : tout le monde s'inscrit en même temps, chaque employé deux fois
+            # (double clic) pour éprouver aussi la contrainte d'unicité.
+            url = reverse('formation_inscription', args=[formation.pk])
+            vague = [(pk, url) for pk in clients] * 2
+            rng.shuffle(vague)
+            reponses = self.lancer(clients, vague, options['concurrence'], "Inscriptions")
+            obtenues = Counter(reponses)
+            attendu = min(len(clients), formation.capacite)
+            if obtenues['INSCRIT'] != attendu:
+                raise CommandError(f"{obtenues['INSCRIT']} places attribuées pour {attendu} attendues.")
+
+            # Seconde vague : désistements pendant l'inscription du plus gros service.
+            inscrits = list(ParticipationFormation.objects.filter(
+                formation=formation, statut='INSCRIT',
+            ).values_list('employe_id', flat=True))
+            url = reverse('formation_desinscription', args=[formation.pk])
+            vague = [(pk, url) for pk in rng.sample(inscrits, int(len(inscrits) * options['desistements']))]
+            service = Employe.objects.values('departement_id').annotate(
+                effectif=Count('pk'),
+            ).order_by('-effectif').values_list('departement_id', flat=True).first()
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                masse = pool.submit(self.inscrire_service, formation.pk, service)
+                self.lancer(clients, vague, options['concurrence'], "Désistements")
+                resultat = masse.result()
+            self.stdout.write(
+                f"Service n°{service} : {len(resultat.inscrits)} inscrit(s), "
+                f"{len(resultat.en_attente)} en attente, {resultat.deja_inscrits} déjà inscrit(s)."
+            )
+            self.verifier(formation)
+        finally:
+            if not options['garder']:
+                formation.delete()
+
+    def inscrire_service(self, formation_id, departement_id):
+        try:
+            return inscrire_service(formation_id, departement_id)
+        finally:
+            connections.close_all()
+
+    def lancer(self, clients, vague, concurrence, libelle):
+        """Envoie les requêtes (employé, url) depuis `concurrence` fils ; renvoie les statuts obtenus."""
+        groupes = [vague[i::concurrence] for i in range(concurrence)]
+
+        def envoyer(groupe):
+            durees, statuts = [], []
+            try:
+                for employe_id, url in groupe:
+                    debut = time.perf_counter()
+                    reponse = clients[employe_id].post(url)
+                    durees.append(time.perf_counter() - debut)
+                    statuts.append(reponse.json().get('statut') if reponse.status_code == 200 else reponse.status_code)
+            finally:
+                connections.close_all()
+            return durees, statuts
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrence) as pool:
+            resultats = list(pool.map(envoyer, groupes))
+        duree = time.perf_counter() - debut
+        statuts = [s for _, groupe in resultats for s in groupe]
+        resume = resume_latences([d for groupe, _ in resultats for d in groupe])
+        self.stdout.write(
+            f"{libelle} : {resume['nombre']} requêtes en {duree:.2f}s ({resume['nombre'] / duree:.0f} req/s) "
+            f"- p50 {resume['p50_ms']:.1f}ms, p95 {resume['p95_ms']:.1f}ms, p99 {resume['p99_ms']:.1f}ms "
+            f"- {dict(Counter(statuts))}"
+        )
+        return statuts
+
+    def verifier(self, formation):
+        formation.refresh_from_db()
+        statuts = Counter(dict(
+            ParticipationFormation.objects.filter(formation=formation).values('statut').annotate(
+                nombre=Count('pk'),
+            ).values_list('statut', 'nombre')
+        ))
+        occupees = sum(statuts[statut] for statut in STATUTS_PLACE)
+        premier_en_attente = ParticipationFormation.objects.filter(
+            formation=formation, statut='ATTENTE',
+        ).order_by('pk').values_list('pk', flat=True).first()
+        anomalies = []
+        if occupees > formation.capacite:
+            anomalies.append(f"surréservation : {occupees} places occupées pour {formation.capacite}")
+        if occupees != formation.places_prises:
+            anomalies.append(f"compteur faux : places_prises = {formation.places_prises}, {occupees} occupées")
+        if statuts['ATTENTE'] and occupees < formation.capacite:
+            anomalies.append(f"{formation.capacite - occupees} place(s) libre(s) avec une liste d'attente")
+        if premier_en_attente and ParticipationFormation.objects.filter(
+            formation=formation, statut='INSCRIT', pk__gt=premier_en_attente,
+        ).exists():
+            # Une inscription directe postérieure au premier en attente aurait doublé la file.
+            anomalies.append("liste d'attente doublée par une inscription plus récente")
+        self.stdout.write(
+            f"Formation : capacité {formation.capacite}, places prises {formation.places_prises}, "
+            f"{dict(statuts)}"
+        )
+        if anomalies:
+            raise CommandError("Incohérences : " + " ; ".join(anomalies))
+        self.stdout.write(self.style.SUCCESS("Aucune surréservation ; compteur et liste d'attente cohérents."))
@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from gestion_rh.benchmarks import gabarits_de_mesure
+from gestion_rh.mesures import resume_latences
+from gestion_rh.models import Employe
+
+PAGES = ('conge_demande_list', 'annonce_list', 'fiche_paie_employe_list', 'presence_employe_list')
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge comparatif des pages du libre-service employé (congés, annonces, bulletins, "
+        "présences) : même suite de requêtes servie par le gestionnaire WSGI (un fil par requête en cours) "
+        "puis par le gestionnaire ASGI (une seule boucle d'événements). En lecture seule."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employes', type=int, default=200, help="Nombre d'employés connectés.")
+        parser.add_argument('--requetes', type=int, default=2000, help="Requêtes par mode.")
+        parser.add_argument('--concurrence', type=int, default=32,
+                            help="Requêtes simultanées : fils WSGI ou tâches ASGI.")
+        parser.add_argument('--mode', choices=('wsgi', 'asgi', 'les-deux'), default='les-deux')
+        parser.add_argument('--graine', type=int, default=0)
+
+    def handle(self, *args, **options):
+        employes = list(Employe.objects.select_related('utilisateur').order_by('pk')[:options['employes']])
+        if not employes:
+            raise CommandError("Aucun employé en base : générez d'abord des données.")
+        rng = random.Random(options['graine'])
+        urls = [reverse(page) for page in PAGES]
+        # Même suite de (employé, page) pour les deux modes, répartie entre les requêtes simultanées.
+        suite = [(rng.randrange(len(employes)), rng.choice(urls)) for _ in range(options['requetes'])]
+        groupes = [suite[i::options['concurrence']] for i in range(options['concurrence'])]
+        modes = ('wsgi', 'asgi') if options['mode'] == 'les-deux' else (options['mode'],)
+
+        resultats = {}
+        # Les gabarits des pages ne sont pas livrés : gabarit neutre, comme pour bench_rh.
+        with override_settings(TEMPLATES=gabarits_de_mesure(), INSTRUMENTATION_TAUX=0):
+            for mode in modes:
+                executer = self.wsgi if mode == 'wsgi' else self.asgi
+                debut = time.perf_counter()
+                durees, erreurs = executer(employes, groupes)
+                duree = time.perf_counter() - debut
+                resultats[mode] = resume = resume_latences(durees)
+                resume['debit'] = resume['nombre'] / duree
+                self.stdout.write(
+                    f"{mode.upper()} : {resume['nombre']} requêtes en {duree:.2f}s ({resume['debit']:.0f} req/s), "
+                    f"{erreurs} erreurs - p50 {resume['p50_ms']:.1f}ms, p95 {resume['p95_ms']:.1f}ms, "
+                    f"p99 {resume['p99_ms']:.1f}ms"
+                )
+        if len(resultats) == 2:
+            self.stdout.write(self.style.SUCCESS(
+                f"Débit ASGI / WSGI : {resultats['asgi']['debit'] / resultats['wsgi']['debit']:.2f} "
+                f"à {options['concurrence']} requêtes simultanées."
+            ))
+
+    def wsgi(self, employes, groupes):
+        clients = []
+        for employe in employes:
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            client.force_login(employe.utilisateur)
+            clients.append(client)
+
+        def parcourir(groupe):
+            durees, erreurs = [], 0
+            try:
+                for indice, url in groupe:
+                    debut = time.perf_counter()
+                    reponse = clients[indice].get(url)
+                    durees.append(time.perf_counter() - debut)
+                    erreurs += reponse.status_code != 200
+            finally:
+                connections.close_all()
+            return durees, erreurs
+
+        with ThreadPoolExecutor(max_workers=len(groupes)) as pool:
+            resultats = list(pool.map(parcourir, groupes))
+        return [d for durees, _ in resultats for d in durees], sum(e for _, e in resultats)
+
+    def asgi(self, employes, groupes):
+        async def principal():
+            clients = []
+            for employe in employes:
+                client = AsyncClient(HTTP_HOST='localhost', raise_request_exception=False)
+                await client.aforce_login(employe.utilisateur)
+                clients.append(client)
+
+            async def parcourir(groupe):
+                durees, erreurs = [], 0
+                for indice, url in groupe:
+                    debut = time.perf_counter()
+                    reponse = await clients[indice].get(url)
+                    durees.append(time.perf_counter() - debut)
+                    erreurs += reponse.status_code != 200
+                return durees, erreurs
+
+            return await asyncio.gather(*(parcourir(groupe) for groupe in groupes))
+
+        resultats = asyncio.run(principal())
+        return [d for durees, _ in resultats for d in durees], sum(e for _, e in resultats)
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from gestion_rh.mesures import resume_latences
+from gestion_rh.models import Employe
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge du pointage en libre-service : simule la pointe de 8h avec "
+        "plusieurs fils qui pointent l'arrivée puis le départ d'employés existants. "
+        "Écrit réellement les présences du jour : à lancer sur une base de test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employes', type=int, default=500, help="Nombre d'employés qui pointent.")
+        parser.add_argument('--concurrence', type=int, default=8, help="Nombre de fils simultanés.")
+        parser.add_argument('--p99-max', type=float, help="Échoue si le p99 dépasse cette valeur (ms).")
+
+    def handle(self, *args, **options):
+        employes = list(Employe.objects.select_related('utilisateur').order_by('pk')[:options['employes']])
+        if not employes:
+            raise CommandError("Aucun employé en base : générez d'abord des données.")
+        # Une session par employé, ouverte avant la mesure.
+        clients = []
+        for employe in employes:
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(employe.utilisateur)
+            clients.append(client)
+        urls = [reverse('pointage_arrivee'), reverse('pointage_depart')]
+        groupes = [clients[i::options['concurrence']] for i in range(options['concurrence'])]
+
+        def pointer(groupe):
+            durees, erreurs = [], 0
+            try:
+                for url in urls:
+                    for client in groupe:
+                        debut = time.perf_counter()
+                        reponse = client.post(url)
+                        durees.append(time.perf_counter() - debut)
+                        erreurs += reponse.status_code != 200
+            finally:
+                connections.close_all()
+            return durees, erreurs
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrence']) as pool:
+            resultats = list(pool.map(pointer, groupes))
+        duree = time.perf_counter() - debut
+
+        durees = [d for groupe, _ in resultats for d in groupe]
+        erreurs = sum(e for _, e in resultats)
+        resume = resume_latences(durees)
+        self.stdout.write(
+            f"{resume['nombre']} pointages en {duree:.2f}s ({resume['nombre'] / duree:.0f} req/s), "
+            f"{erreurs} erreurs - p50 {resume['p50_ms']:.1f}ms, p95 {resume['p95_ms']:.1f}ms, "
+            f"p99 {resume['p99_ms']:.1f}ms"
+        )
+        if options['p99_max'] is not None and resume['p99_ms'] > options['p99_max']:
+            raise CommandError(f"p99 de {resume['p99_ms']:.1f}ms au-delà de l'objectif de {options['p99_max']}ms.")
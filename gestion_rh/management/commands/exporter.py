@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.exports import flux_export, lignes_fiches, lignes_presences
+from gestion_rh.models import FicheDePaie, Presence
+
+
+class Command(BaseCommand):
+    help = "Exporte en flux les fiches de paie ou les présences au format CSV ou XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('donnees', choices=['fiches', 'presences'])
+        parser.add_argument('sortie', help="Chemin du fichier à écrire.")
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--mois', type=int)
+        parser.add_argument('--annee', type=int)
+        parser.add_argument('--du', help="Date de début (AAAA-MM-JJ), présences uniquement.")
+        parser.add_argument('--au', help="Date de fin (AAAA-MM-JJ), présences uniquement.")
+        parser.add_argument('--service')
+
+    def handle(self, *args, **options):
+        if options['donnees'] == 'fiches':
+            queryset = FicheDePaie.objects.all()
+            filtres = {'mois': options['mois'], 'annee': options['annee'], 'employe__departement__nom': options['service']}
+            lignes = lignes_fiches(queryset.filter(**{k: v for k, v in filtres.items() if v}))
+        else:
+            queryset = Presence.objects.all()
+            filtres = {
+                'journee__date_journee__gte': options['du'],
+                'journee__date_journee__lte': options['au'],
+                'employe__departement__nom': options['service'],
+            }
+            lignes = lignes_presences(queryset.filter(**{k: v for k, v in filtres.items() if v}))
+
+        debut = time.perf_counter()
+        taille = 0
+        with open(options['sortie'], 'wb') as sortie:
+            for morceau in flux_export(lignes, options['format'], options['donnees']):
+                sortie.write(morceau)
+                taille += len(morceau)
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['sortie']} : {taille / 1024:.0f} Ko écrits en {time.perf_counter() - debut:.2f}s"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.bulletins import ProductionBulletins, donnees_bulletins, flux_archive, purger_cache
+from gestion_rh.models import FicheDePaie
+
+
+class Command(BaseCommand):
+    help = "Produit les bulletins PDF d'un mois (rendus en parallèle, cache par contenu), en option dans une archive ZIP."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois', type=int, required=True)
+        parser.add_argument('--annee', type=int, required=True)
+        parser.add_argument('--workers', type=int, default=4, help="Nombre de processus de rendu.")
+        parser.add_argument('--archive', help="Chemin de l'archive ZIP à écrire.")
+        parser.add_argument('--sans-purge', action='store_true',
+                            help="Ne pas supprimer du cache les PDF des fiches modifiées depuis leur rendu.")
+
+    def handle(self, *args, **options):
+        fiches = FicheDePaie.objects.filter(mois=options['mois'], annee=options['annee'])
+        production = ProductionBulletins(donnees_bulletins(fiches), nb_workers=options['workers'])
+        debut = time.perf_counter()
+        if options['archive']:
+            with open(options['archive'], 'wb') as archive:
+                for morceau in flux_archive(production):
+                    archive.write(morceau)
+        else:
+            for _ in production:
+                pass
+        resultat = production.resultat
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultat.bulletins} bulletins ({resultat.rendus} rendus, {resultat.en_cache} en cache) "
+            f"en {time.perf_counter() - debut:.2f}s - {resultat.pages_par_seconde:.0f} pages/s"
+        ))
+        if not options['sans_purge']:
+            self.stdout.write(f"{purger_cache()} PDF périmé(s) supprimé(s) du cache.")
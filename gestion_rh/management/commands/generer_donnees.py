@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from gestion_rh.generation import generer_donnees
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit la base avec des données synthétiques réalistes (employés, pointages, congés, paie) "
+        "pour les mesures de performance. Base de test uniquement : les données s'ajoutent à l'existant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employes', type=int, default=1000)
+        parser.add_argument('--annees', type=float, default=1.0, help="Profondeur d'historique des pointages et congés.")
+        parser.add_argument('--conges-par-an', type=int, default=4)
+        parser.add_argument('--mois-paie', type=int, default=12, help="Mois de paie calculés, jusqu'au mois courant.")
+        parser.add_argument('--graine', type=int, default=0)
+
+    def handle(self, *args, **options):
+        resultat = generer_donnees(
+            employes=options['employes'],
+            annees=options['annees'],
+            conges_par_an=options['conges_par_an'],
+            mois_paie=options['mois_paie'],
+            graine=options['graine'],
+            rappel=lambda message: self.stdout.write(f"{message}..."),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultat.employes} employés, {resultat.journees} journées, {resultat.presences} pointages, "
+            f"{resultat.conges} congés, {resultat.fiches} fiches de paie ({resultat.lignes_paie} lignes) "
+            f"générés en {resultat.duree:.1f}s."
+        ))
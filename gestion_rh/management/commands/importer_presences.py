@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_rh.pointage import format_depuis_nom, importer_presences
+
+
+class Command(BaseCommand):
+    help = "Importe en flux un export de badgeuse (CSV ou JSONL) dans les présences."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Format du fichier (déduit de l'extension par défaut).")
+        parser.add_argument('--taille-lot', type=int, default=5000,
+                            help="Nombre de pointages écrits par transaction.")
+
+    def handle(self, *args, **options):
+        format_fichier = options['format'] or format_depuis_nom(options['fichier'])
+        try:
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as flux:
+                resultat = importer_presences(flux, format_fichier, taille_lot=options['taille_lot'])
+        except OSError as exc:
+            raise CommandError(exc)
+        for numero, raison in resultat.erreurs:
+            self.stderr.write(f"Ligne {numero} rejetée : {raison}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultat.lues} lignes lues, {resultat.importees} présences écrites, {resultat.rejetees} rejetées, "
+            f"{resultat.journees_creees} journées créées en {resultat.duree:.2f}s "
+            f"- {resultat.lignes_par_seconde:.0f} lignes/s"
+        ))
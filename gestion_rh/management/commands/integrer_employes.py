@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_rh.integration import ecrire_rapport, integrer_employes
+from gestion_rh.pointage import format_depuis_nom
+
+
+class Command(BaseCommand):
+    help = "Crée en masse les comptes et fiches employés d'un fichier CSV ou JSONL, avec rapport des lignes rejetées."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Format du fichier (déduit de l'extension par défaut).")
+        parser.add_argument('--taille-lot', type=int, default=1000,
+                            help="Nombre d'employés créés par transaction.")
+        parser.add_argument('--workers', type=int,
+                            help="Processus de hachage des mots de passe (par défaut : nombre de CPU).")
+        parser.add_argument('--rapport', help="Chemin du rapport CSV des lignes rejetées.")
+
+    def handle(self, *args, **options):
+        format_fichier = options['format'] or format_depuis_nom(options['fichier'])
+        try:
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as flux:
+                resultat = integrer_employes(
+                    flux, format_fichier, taille_lot=options['taille_lot'], nb_workers=options['workers'],
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+        if options['rapport']:
+            with open(options['rapport'], 'w', encoding='utf-8', newline='') as rapport:
+                ecrire_rapport(resultat, rapport)
+        else:
+            for numero, username, raison in resultat.erreurs:
+                self.stderr.write(f"Ligne {numero} ({username}) rejetée : {raison}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultat.lues} lignes lues, {resultat.creees} employés créés, {resultat.rejetees} rejetés "
+            f"en {resultat.duree:.2f}s - {resultat.lignes_par_seconde:.0f} lignes/s"
+        ))
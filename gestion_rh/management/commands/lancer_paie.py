@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_rh.paie import ErreurRapprochement, lancer_paie, lancer_paie_parallele
+
+
+class Command(BaseCommand):
+    help = "Calcule en masse les fiches de paie de tous les employés pour un mois donné."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois', type=int, required=True)
+        parser.add_argument('--annee', type=int, required=True)
+        parser.add_argument('--taille-lot', type=int, default=1000,
+                            help="Nombre d'employés traités par transaction.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Nombre de processus de calcul (tranches de clés primaires).")
+
+    def handle(self, *args, **options):
+        try:
+            if options['workers'] > 1:
+                resultat = lancer_paie_parallele(
+                    options['mois'], options['annee'], options['workers'], taille_lot=options['taille_lot'],
+                )
+            else:
+                resultat = lancer_paie(options['mois'], options['annee'], taille_lot=options['taille_lot'])
+        except (ValueError, ErreurRapprochement) as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(
+            f"Paie {resultat.mois:02d}/{resultat.annee} : {resultat.lignes} fiches "
+            f"({resultat.crees} créées, {resultat.mis_a_jour} mises à jour, "
+            f"{resultat.ignores} ignorées) en {resultat.duree:.2f}s sur {resultat.nb_workers} worker(s) "
+            f"- {resultat.lignes_par_seconde:.0f} lignes/s"
+        ))
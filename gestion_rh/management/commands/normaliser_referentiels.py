@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.assiduite import reconstruire_agregats_presence
+from gestion_rh.conges import reconstruire_absences
+from gestion_rh.models import Departement
+from gestion_rh.referentiels import REFERENTIELS, effectifs_par_departement, fusionner_doublons
+
+
+class Command(BaseCommand):
+    help = (
+        "Fusionne les doublons des référentiels Departement et Poste (casse, accents, espaces, "
+        "et avec --approche fautes de frappe). La reprise des anciens libellés texte est faite "
+        "par la migration 0003_reprise_libelles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--approche', action='store_true',
+                            help="Fusionne aussi les libellés à une faute de frappe d'un libellé plus fréquent.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        departements_fusionnes = 0
+        for modele, champ, cle_etrangere in REFERENTIELS:
+            fusionnes = fusionner_doublons(modele, champ, cle_etrangere, options['approche'])
+            self.stdout.write(f"{modele._meta.verbose_name} : {fusionnes} doublon(s) fusionné(s).")
+            if modele is Departement:
+                departements_fusionnes = fusionnes
+        if departements_fusionnes:
+            # Les compteurs des départements supprimés sont partis en cascade : on les recalcule.
+            reconstruire_absences()
+            reconstruire_agregats_presence()
+        for departement in effectifs_par_departement():
+            self.stdout.write(
+                f"  {departement.nom} : {departement.effectif} employé(s), "
+                f"masse salariale {departement.masse_salariale or 0}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Référentiels normalisés en {time.perf_counter() - debut:.2f}s"))
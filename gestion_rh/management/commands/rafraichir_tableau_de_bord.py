@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.tableau_de_bord import ouvrir_mois_courant, rafraichir_syntheses, toutes_les_periodes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les synthèses mensuelles du tableau de bord RH : par défaut les seuls mois "
+        "marqués depuis le dernier passage (à planifier chaque nuit), tout l'historique avec --tout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tout', action='store_true', help="Recalcule tous les mois depuis la plus ancienne donnée.")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        ouvrir_mois_courant()
+        periodes = rafraichir_syntheses(toutes_les_periodes() if options['tout'] else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(periodes)} mois recalculés en {time.perf_counter() - debut:.2f}s"
+        ))
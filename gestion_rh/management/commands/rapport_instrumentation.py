@@ -0,0 +1,47 @@
+import datetime
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gestion_rh.instrumentation import purger_mesures, rapport, tampon
+
+
+class Command(BaseCommand):
+    help = (
+        "Rapport par vue des mesures de l'instrumentation : latences p50/p95/p99, requêtes SQL "
+        "par requête HTTP, requêtes dupliquées et motifs N+1 signalés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--heures', type=float, default=24, help="Fenêtre du rapport (24 h par défaut).")
+        parser.add_argument('--vue', help="Limite le rapport à un nom d'URL.")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON (intégration continue, comparaison).")
+        parser.add_argument('--purger-jours', type=int, help="Supprime d'abord les mesures de plus de N jours.")
+
+    def handle(self, *args, **options):
+        tampon.vider()
+        if options['purger_jours'] is not None:
+            supprimees = purger_mesures(timezone.now() - datetime.timedelta(days=options['purger_jours']))
+            self.stderr.write(f"{supprimees} mesures purgées.")
+        statistiques = rapport(timezone.now() - datetime.timedelta(hours=options['heures']), options['vue'])
+        if options['json']:
+            self.stdout.write(json.dumps(
+                [{**asdict(s), 'n_plus_un': s.n_plus_un} for s in statistiques], indent=2, ensure_ascii=False,
+            ))
+            return
+        if not statistiques:
+            self.stdout.write("Aucune mesure sur la période.")
+            return
+        for s in statistiques:
+            self.stdout.write(
+                f"{s.vue} : {s.nombre} requêtes, p50 {s.latences['p50_ms']:.1f}ms, "
+                f"p95 {s.latences['p95_ms']:.1f}ms, p99 {s.latences['p99_ms']:.1f}ms, "
+                f"{s.requetes_moyenne:.1f} requêtes SQL en moyenne (max {s.requetes_max}, "
+                f"{s.sql_moyenne_ms:.1f}ms), {s.dupliquees_moyenne:.1f} dupliquées"
+            )
+            for forme, concernees, maximum in s.motifs:
+                self.stdout.write(self.style.WARNING(
+                    f"  N+1 : {maximum} fois dans une même requête ({concernees} requêtes concernées) : {forme[:200]}"
+                ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.assiduite import reconstruire_agregats_presence
+
+
+class Command(BaseCommand):
+    help = "Recalcule en base les agrégats de présence mensuels (par employé) et journaliers (par service)."
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        mensuelles, journalieres = reconstruire_agregats_presence()
+        self.stdout.write(self.style.SUCCESS(
+            f"{mensuelles} agrégats mensuels et {journalieres} agrégats journaliers recalculés "
+            f"en {time.perf_counter() - debut:.2f}s"
+        ))
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.annuaire import reconstruire_annuaire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche de l'annuaire des employés (mots et trigrammes)."
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        mots = reconstruire_annuaire()
+        self.stdout.write(self.style.SUCCESS(f"{mots} mots indexés en {time.perf_counter() - debut:.2f}s"))
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.recherche_annonces import reconstruire_index_annonces
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des annonces."
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        mots = reconstruire_index_annonces()
+        self.stdout.write(self.style.SUCCESS(f"{mots} mots indexés en {time.perf_counter() - debut:.2f}s"))
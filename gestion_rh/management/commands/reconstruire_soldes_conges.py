@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_rh.conges import reconstruire_absences, reconstruire_soldes
+
+
+class Command(BaseCommand):
+    help = "Recalcule les soldes de congés et les absences par service à partir des congés validés."
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        soldes = reconstruire_soldes()
+        absences = reconstruire_absences()
+        self.stdout.write(self.style.SUCCESS(
+            f"{soldes} soldes et {absences} compteurs d'absence recalculés en {time.perf_counter() - debut:.2f}s"
+        ))
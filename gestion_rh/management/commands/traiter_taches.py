@@ -0,0 +1,80 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from gestion_rh.taches import (
+    executer, liberer_taches_orphelines, nom_worker, planifier_actualisation_tableau_de_bord, reserver,
+)
+
+# Intervalle entre deux recherches de tâches orphelines, en secondes.
+INTERVALLE_ORPHELINES = 60
+# Intervalle entre deux vérifications des mois du tableau de bord à recalculer, en secondes.
+INTERVALLE_TABLEAU_DE_BORD = 300
+
+
+def boucle_worker(attente, une_fois, sortie=print):
+    """Réserve et exécute les tâches jusqu'à épuisement (--une-fois) ou jusqu'à SIGTERM / Ctrl+C."""
+    arret = False
+
+    def demander_arret(*_):
+        nonlocal arret
+        arret = True
+
+    signal.signal(signal.SIGTERM, demander_arret)
+    signal.signal(signal.SIGINT, demander_arret)
+    worker = nom_worker()
+    derniere_verification = derniere_actualisation = 0.0
+    traitees = 0
+    while not arret:
+        close_old_connections()
+        if time.monotonic() - derniere_verification > INTERVALLE_ORPHELINES:
+            liberer_taches_orphelines()
+            derniere_verification = time.monotonic()
+        if time.monotonic() - derniere_actualisation > INTERVALLE_TABLEAU_DE_BORD:
+            planifier_actualisation_tableau_de_bord()
+            derniere_actualisation = time.monotonic()
+        tache = reserver(worker)
+        if tache is None:
+            if une_fois:
+                break
+            time.sleep(attente)
+            continue
+        debut = time.perf_counter()
+        reussie = executer(tache, worker)
+        traitees += 1
+        sortie(f"[{worker}] {tache.type_tache} #{tache.pk} "
+               f"{'terminée' if reussie else 'en échec'} en {time.perf_counter() - debut:.2f}s")
+    return traitees
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches de fond en file (paie, imports, bulletins). Plusieurs workers peuvent tourner en parallèle."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=1, help="Nombre de processus worker à lancer.")
+        parser.add_argument('--attente', type=float, default=2.0,
+                            help="Pause en secondes quand la file est vide.")
+        parser.add_argument('--une-fois', action='store_true', help="S'arrêter dès que la file est vide.")
+
+    def handle(self, *args, **options):
+        if options['processus'] <= 1:
+            boucle_worker(options['attente'], options['une_fois'], self.stdout.write)
+            return
+        # Les processus enfants ouvrent leurs propres connexions.
+        connections.close_all()
+        processus = [
+            multiprocessing.Process(target=boucle_worker, args=(options['attente'], options['une_fois']))
+            for _ in range(options['processus'])
+        ]
+        for p in processus:
+            p.start()
+        try:
+            for p in processus:
+                p.join()
+        except KeyboardInterrupt:
+            for p in processus:
+                p.terminate()
+                p.join()
@@ -0,0 +1,21 @@
+"""Petits outils de mesure partagés par les commandes de charge et de benchmark."""
+
+
+def centile(valeurs_triees, rang):
+    """Centile `rang` (0-100) d'une liste déjà triée, par la méthode du rang le plus proche."""
+    if not valeurs_triees:
+        return 0.0
+    index = max(0, min(len(valeurs_triees) - 1, round(rang / 100 * len(valeurs_triees)) - 1))
+    return valeurs_triees[index]
+
+
+def resume_latences(durees):
+    """Renvoie nombre, moyenne et centiles p50/p95/p99 (en millisecondes) d'une liste de durées en secondes."""
+    triees = sorted(d * 1000 for d in durees)
+    return {
+        'nombre': len(triees),
+        'moyenne_ms': sum(triees) / len(triees) if triees else 0.0,
+        'p50_ms': centile(triees, 50),
+        'p95_ms': centile(triees, 95),
+        'p99_ms': centile(triees, 99),
+    }
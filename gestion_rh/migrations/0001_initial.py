@@ -0,0 +1,374 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:17
+
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Utilisateur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Avantage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_avantage', models.CharField(max_length=150)),
+                ('montant_avantage', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Conge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_debut', models.DateField()),
+                ('date_fin', models.DateField()),
+                ('motif', models.TextField()),
+                ('statut', models.CharField(choices=[('DEMANDE', 'Demandé'), ('VALIDE', 'Validé'), ('REFUSE', 'Refusé')], default='DEMANDE', max_length=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FicheDePaie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.IntegerField(help_text='Le mois de la paie (1-12)')),
+                ('annee', models.IntegerField(help_text="L'année de la paie")),
+                ('statut', models.CharField(choices=[('BROUILLON', 'Brouillon'), ('VALIDE', 'Validée'), ('EMISE', 'Émise')], default='BROUILLON', max_length=10)),
+                ('salaire_brut', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_primes', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_avantages', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cotisations_sociales', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('impot_sur_revenu', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('salaire_net', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Formation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titre', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('duree_heures', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JourneeTravail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_journee', models.DateField(help_text='Date de la journée de travail', unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Prime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_prime', models.CharField(max_length=150)),
+                ('description', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_role', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Employe',
+            fields=[
+                ('utilisateur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('matricule', models.CharField(max_length=50, unique=True)),
+                ('nom', models.CharField(max_length=100)),
+                ('prenom', models.CharField(max_length=100)),
+                ('date_naissance', models.DateField()),
+                ('telephone', models.CharField(max_length=20)),
+                ('service', models.CharField(max_length=100)),
+                ('poste', models.CharField(max_length=100)),
+                ('salaire_base', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date_embauche', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AbsenceServiceJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('nombre', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('service', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Annonce',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titre', models.CharField(max_length=255)),
+                ('contenu', models.TextField()),
+                ('date_publication', models.DateTimeField(auto_now_add=True)),
+                ('auteur', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='annonces', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FichePaieAvantage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('montant', models.DecimalField(decimal_places=2, help_text="Montant de l'avantage pour ce mois spécifique", max_digits=10)),
+                ('avantage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_rh.avantage')),
+                ('fiche_de_paie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_rh.fichedepaie')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fichedepaie',
+            name='avantages',
+            field=models.ManyToManyField(through='gestion_rh.FichePaieAvantage', to='gestion_rh.avantage'),
+        ),
+        migrations.CreateModel(
+            name='PresenceServiceJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jours_presents', models.IntegerField(default=0)),
+                ('secondes_travaillees', models.IntegerField(default=0)),
+                ('retards', models.IntegerField(default=0)),
+                ('departs_manquants', models.IntegerField(default=0)),
+                ('service', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='presence_service_jour_date_idx')],
+                'unique_together': {('service', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FichePaiePrime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('montant', models.DecimalField(decimal_places=2, help_text='Montant de la prime pour ce mois spécifique', max_digits=10)),
+                ('fiche_de_paie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_rh.fichedepaie')),
+                ('prime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_rh.prime')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fichedepaie',
+            name='primes',
+            field=models.ManyToManyField(through='gestion_rh.FichePaiePrime', to='gestion_rh.prime'),
+        ),
+        migrations.AddField(
+            model_name='utilisateur',
+            name='role',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gestion_rh.role'),
+        ),
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_tache', models.CharField(max_length=50)),
+                ('parametres', models.JSONField(blank=True, default=dict)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINEE', 'Terminée'), ('ECHOUEE', 'Échouée')], default='EN_ATTENTE', max_length=10)),
+                ('progression', models.PositiveSmallIntegerField(default=0, help_text='Avancement en pourcentage')),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('resultat', models.JSONField(blank=True, null=True)),
+                ('erreur', models.TextField(blank=True)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentatives', models.PositiveSmallIntegerField(default=3)),
+                ('executer_apres', models.DateTimeField(default=django.utils.timezone.now)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('battement', models.DateTimeField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('demandeur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrigrammeAnnuaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigramme', models.CharField(max_length=3)),
+                ('mot', models.CharField(max_length=100)),
+            ],
+            options={
+                'unique_together': {('trigramme', 'mot')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SoldeConge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.IntegerField()),
+                ('jours_acquis', models.IntegerField(default=25)),
+                ('jours_pris', models.IntegerField(default=0)),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soldes_conges', to='gestion_rh.employe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PresenceMensuelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jours_presents', models.IntegerField(default=0)),
+                ('secondes_travaillees', models.IntegerField(default=0)),
+                ('retards', models.IntegerField(default=0)),
+                ('departs_manquants', models.IntegerField(default=0)),
+                ('annee', models.IntegerField()),
+                ('mois', models.IntegerField()),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presences_mensuelles', to='gestion_rh.employe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Presence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('heure_arrivee', models.TimeField()),
+                ('heure_depart', models.TimeField(blank=True, null=True)),
+                ('journee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presences_jour', to='gestion_rh.journeetravail')),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presences', to='gestion_rh.employe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ParticipationFormation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_inscription', models.DateField(auto_now_add=True)),
+                ('statut', models.CharField(choices=[('INSCRIT', 'Inscrit'), ('TERMINE', 'Terminé'), ('ANNULE', 'Annulé')], default='INSCRIT', max_length=10)),
+                ('resultat', models.CharField(blank=True, max_length=255, null=True)),
+                ('formation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_rh.formation')),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_rh.employe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MotAnnuaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mot', models.CharField(max_length=100)),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_rh.employe')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='participants',
+            field=models.ManyToManyField(through='gestion_rh.ParticipationFormation', to='gestion_rh.employe'),
+        ),
+        migrations.AddField(
+            model_name='fichedepaie',
+            name='employe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fiches_de_paie', to='gestion_rh.employe'),
+        ),
+        migrations.AddIndex(
+            model_name='employe',
+            index=models.Index(fields=['nom', 'utilisateur'], name='employe_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employe',
+            index=models.Index(fields=['service', 'nom'], name='employe_service_nom_idx'),
+        ),
+        migrations.AddField(
+            model_name='conge',
+            name='employe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conges', to='gestion_rh.employe'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='fichepaieavantage',
+            unique_together={('fiche_de_paie', 'avantage')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='fichepaieprime',
+            unique_together={('fiche_de_paie', 'prime')},
+        ),
+        migrations.AddIndex(
+            model_name='tache',
+            index=models.Index(fields=['statut', 'executer_apres', 'id'], name='tache_file_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='soldeconge',
+            unique_together={('employe', 'annee')},
+        ),
+        migrations.AddIndex(
+            model_name='presencemensuelle',
+            index=models.Index(fields=['annee', 'mois'], name='presence_mensuelle_periode_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='presencemensuelle',
+            unique_together={('employe', 'annee', 'mois')},
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['journee', '-id'], name='presence_journee_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='presence',
+            unique_together={('employe', 'journee')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='participationformation',
+            unique_together={('employe', 'formation')},
+        ),
+        migrations.AddIndex(
+            model_name='motannuaire',
+            index=models.Index(fields=['employe'], name='mot_annuaire_employe_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='motannuaire',
+            unique_together={('mot', 'employe')},
+        ),
+        migrations.AddIndex(
+            model_name='fichedepaie',
+            index=models.Index(fields=['-annee', '-mois', '-id'], name='fiche_paie_periode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichedepaie',
+            index=models.Index(fields=['statut', '-annee', '-mois'], name='fiche_paie_statut_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='fichedepaie',
+            unique_together={('employe', 'mois', 'annee')},
+        ),
+        migrations.AddIndex(
+            model_name='conge',
+            index=models.Index(fields=['-date_debut', '-id'], name='conge_date_debut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conge',
+            index=models.Index(fields=['statut', '-date_debut'], name='conge_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conge',
+            index=models.Index(fields=['employe', 'date_debut', 'date_fin'], name='conge_employe_periode_idx'),
+        ),
+    ]
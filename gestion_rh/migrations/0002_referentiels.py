@@ -0,0 +1,98 @@
+"""
+Référentiels des départements et des postes, première étape.
+
+Les libellés texte Employe.service / Employe.poste et les compteurs par
+service sont renommés (ancien_*) pour laisser la place aux clés étrangères,
+ajoutées ici sans contrainte NOT NULL : 0003 les remplit, 0004 les rend
+obligatoires et supprime les anciennes colonnes.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_rh', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Departement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Poste',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('intitule', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='employe',
+            name='employe_service_nom_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='absenceservicejour',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='presenceservicejour',
+            unique_together=set(),
+        ),
+        migrations.RenameField(
+            model_name='employe',
+            old_name='service',
+            new_name='ancien_service',
+        ),
+        migrations.RenameField(
+            model_name='employe',
+            old_name='poste',
+            new_name='ancien_poste',
+        ),
+        migrations.RenameField(
+            model_name='absenceservicejour',
+            old_name='service',
+            new_name='ancien_service',
+        ),
+        migrations.RenameField(
+            model_name='presenceservicejour',
+            old_name='service',
+            new_name='ancien_service',
+        ),
+        migrations.AddField(
+            model_name='employe',
+            name='departement',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.PROTECT, related_name='employes',
+                to='gestion_rh.departement',
+            ),
+        ),
+        migrations.AddField(
+            model_name='employe',
+            name='poste',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.PROTECT, related_name='employes',
+                to='gestion_rh.poste',
+            ),
+        ),
+        migrations.AddField(
+            model_name='absenceservicejour',
+            name='departement',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                to='gestion_rh.departement',
+            ),
+        ),
+        migrations.AddField(
+            model_name='presenceservicejour',
+            name='departement',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                to='gestion_rh.departement',
+            ),
+        ),
+    ]
@@ -0,0 +1,102 @@
+"""
+Reprise des libellés texte dans les référentiels Departement et Poste.
+
+Les variantes d'un même libellé (casse, accents, espaces) sont regroupées
+sous la plus fréquente et ne donnent qu'une ligne ; les employés sont
+rattachés par un UPDATE par libellé canonique. Un libellé vide est rattaché
+à « Non renseigné ». Les compteurs d'absence et de présence par service
+sont réindexés par département, en cumulant ceux des variantes fusionnées.
+
+Seuls les modèles historiques (apps.get_model) sont utilisés ; regrouper()
+et resoudre() ne dépendent que du modèle qu'on leur passe. Les variantes à
+une faute de frappe se fusionnent ensuite par la commande
+normaliser_referentiels --approche.
+"""
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count
+
+from gestion_rh.referentiels import regrouper, resoudre
+
+NON_RENSEIGNE = "Non renseigné"
+TAILLE_PAQUET = 500
+# (modèle, champ libellé, clé étrangère sur Employe, ancienne colonne texte)
+REFERENTIELS = (
+    ('Departement', 'nom', 'departement', 'ancien_service'),
+    ('Poste', 'intitule', 'poste', 'ancien_poste'),
+)
+COMPTEURS = {
+    'AbsenceServiceJour': ('nombre',),
+    'PresenceServiceJour': ('jours_presents', 'secondes_travaillees', 'retards', 'departs_manquants'),
+}
+
+
+def reprendre_libelles(apps, schema_editor):
+    Employe = apps.get_model('gestion_rh', 'Employe')
+    for nom_modele, champ, cle_etrangere, ancienne in REFERENTIELS:
+        modele = apps.get_model('gestion_rh', nom_modele)
+        comptes = dict(Employe.objects.values(ancienne).annotate(nombre=Count('pk')).values_list(ancienne, 'nombre'))
+        if nom_modele == 'Departement':
+            for nom_compteur in COMPTEURS:
+                for libelle in apps.get_model('gestion_rh', nom_compteur).objects.values_list(
+                    'ancien_service', flat=True,
+                ).distinct():
+                    comptes.setdefault(libelle, 0)
+        canoniques = regrouper(comptes)
+        ids = resoudre(modele, champ, set(canoniques.values()))
+        par_id = defaultdict(list)
+        for libelle, canonique in canoniques.items():
+            par_id[ids[canonique]].append(libelle)
+        for pk, libelles in par_id.items():
+            for debut in range(0, len(libelles), TAILLE_PAQUET):
+                Employe.objects.filter(**{f'{ancienne}__in': libelles[debut:debut + TAILLE_PAQUET]}).update(
+                    **{cle_etrangere: pk},
+                )
+        sans_libelle = Employe.objects.filter(**{f'{cle_etrangere}__isnull': True})
+        if sans_libelle.exists():
+            sans_libelle.update(**{cle_etrangere: resoudre(modele, champ, [NON_RENSEIGNE])[NON_RENSEIGNE]})
+        if nom_modele == 'Departement':
+            for nom_compteur, champs in COMPTEURS.items():
+                reindexer_compteurs(apps.get_model('gestion_rh', nom_compteur), champs, canoniques, ids)
+
+
+def reindexer_compteurs(modele, champs, canoniques, ids):
+    """Réécrit les compteurs par (département, date), en cumulant les variantes d'un même service."""
+    cumuls = defaultdict(lambda: dict.fromkeys(champs, 0))
+    for ligne in modele.objects.filter(ancien_service__in=list(canoniques)).values('ancien_service', 'date', *champs):
+        cumul = cumuls[(ids[canoniques[ligne['ancien_service']]], ligne['date'])]
+        for champ in champs:
+            cumul[champ] += ligne[champ]
+    # Les compteurs d'un service sans libellé n'ont plus de département : ils partent.
+    modele.objects.all().delete()
+    modele.objects.bulk_create(
+        [
+            modele(departement_id=departement_id, date=date, ancien_service='', **valeurs)
+            for (departement_id, date), valeurs in cumuls.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def restaurer_libelles(apps, schema_editor):
+    """Retour arrière : les libellés texte reprennent ceux des référentiels."""
+    Employe = apps.get_model('gestion_rh', 'Employe')
+    for nom_modele, champ, cle_etrangere, ancienne in REFERENTIELS:
+        for pk, libelle in apps.get_model('gestion_rh', nom_modele).objects.values_list('pk', champ):
+            Employe.objects.filter(**{cle_etrangere: pk}).update(**{ancienne: libelle})
+    for nom_compteur in COMPTEURS:
+        modele = apps.get_model('gestion_rh', nom_compteur)
+        for pk, nom in apps.get_model('gestion_rh', 'Departement').objects.values_list('pk', 'nom'):
+            modele.objects.filter(departement=pk).update(ancien_service=nom)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_rh', '0002_referentiels'),
+    ]
+
+    operations = [
+        migrations.RunPython(reprendre_libelles, restaurer_libelles),
+    ]
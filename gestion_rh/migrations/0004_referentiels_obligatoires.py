@@ -0,0 +1,94 @@
+"""
+Référentiels des départements et des postes, dernière étape : les clés
+étrangères remplies par 0003 deviennent obligatoires et les anciennes
+colonnes texte disparaissent.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_rh', '0003_reprise_libelles'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='employe',
+            name='departement',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name='employes', to='gestion_rh.departement',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='employe',
+            name='poste',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name='employes', to='gestion_rh.poste',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='absenceservicejour',
+            name='departement',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_rh.departement',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='presenceservicejour',
+            name='departement',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_rh.departement',
+            ),
+        ),
+        # Valeur par défaut pour le retour arrière, qui recrée les colonnes sur des lignes existantes.
+        migrations.AlterField(
+            model_name='employe',
+            name='ancien_service',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='employe',
+            name='ancien_poste',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='absenceservicejour',
+            name='ancien_service',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='presenceservicejour',
+            name='ancien_service',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='employe',
+            name='ancien_service',
+        ),
+        migrations.RemoveField(
+            model_name='employe',
+            name='ancien_poste',
+        ),
+        migrations.RemoveField(
+            model_name='absenceservicejour',
+            name='ancien_service',
+        ),
+        migrations.RemoveField(
+            model_name='presenceservicejour',
+            name='ancien_service',
+        ),
+        migrations.AlterUniqueTogether(
+            name='absenceservicejour',
+            unique_together={('departement', 'date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='presenceservicejour',
+            unique_together={('departement', 'date')},
+        ),
+        migrations.AddIndex(
+            model_name='employe',
+            index=models.Index(fields=['departement', 'nom'], name='employe_departement_nom_idx'),
+        ),
+    ]
@@ -0,0 +1,168 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_rh', '0004_referentiels_obligatoires'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivePaie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.IntegerField(unique=True)),
+                ('fichier', models.CharField(help_text='Nom du fichier dans ARCHIVES_PAIE_DIR', max_length=255)),
+                ('index_mois', models.JSONField(default=dict)),
+                ('nombre_fiches', models.IntegerField(default=0)),
+                ('nombre_lignes', models.IntegerField(default=0, help_text="Lignes de primes et d'avantages")),
+                ('masse_brute', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('masse_nette', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('pk_min', models.IntegerField(default=0)),
+                ('pk_max', models.IntegerField(default=0)),
+                ('empreinte', models.CharField(help_text='SHA-256 du fichier', max_length=64)),
+                ('date_archivage', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FrequenceMotAnnonce',
+            fields=[
+                ('mot', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('annonces', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LectureAnnonces',
+            fields=[
+                ('utilisateur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('derniere_lecture', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MesureRequete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vue', models.CharField(help_text="Nom d'URL de la vue", max_length=200)),
+                ('methode', models.CharField(max_length=10)),
+                ('statut', models.PositiveSmallIntegerField()),
+                ('duree_ms', models.FloatField()),
+                ('nombre_requetes', models.PositiveIntegerField(default=0)),
+                ('duree_sql_ms', models.FloatField(default=0)),
+                ('requetes_dupliquees', models.PositiveIntegerField(default=0)),
+                ('motifs_repetes', models.JSONField(blank=True, default=list)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MotAnnonce',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mot', models.CharField(max_length=100)),
+                ('impact', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PeriodeSynthese',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.IntegerField()),
+                ('mois', models.IntegerField()),
+                ('a_recalculer', models.BooleanField(default=True)),
+                ('date_calcul', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyntheseMensuelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.IntegerField()),
+                ('mois', models.IntegerField()),
+                ('effectif', models.IntegerField(default=0, help_text='Employés embauchés à la fin du mois')),
+                ('nombre_fiches', models.IntegerField(default=0)),
+                ('masse_brute', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('masse_nette', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('jours_conge', models.IntegerField(default=0, help_text='Jours de congé validés (jours calendaires)')),
+                ('jours_presents', models.IntegerField(default=0)),
+                ('secondes_travaillees', models.BigIntegerField(default=0)),
+                ('retards', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FicheDePaieArchivee',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('gestion_rh.fichedepaie',),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='capacite',
+            field=models.PositiveIntegerField(default=20, help_text='Nombre maximal de participants'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='places_prises',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='participationformation',
+            name='statut',
+            field=models.CharField(choices=[('INSCRIT', 'Inscrit'), ('ATTENTE', "En liste d'attente"), ('TERMINE', 'Terminé'), ('ANNULE', 'Annulé')], default='INSCRIT', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='participationformation',
+            index=models.Index(fields=['formation', 'statut', 'id'], name='participation_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mesurerequete',
+            index=models.Index(fields=['date'], name='mesure_requete_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='motannonce',
+            name='annonce',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_rh.annonce'),
+        ),
+        migrations.AddIndex(
+            model_name='periodesynthese',
+            index=models.Index(fields=['a_recalculer'], name='periode_synthese_recalcul_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='periodesynthese',
+            unique_together={('annee', 'mois')},
+        ),
+        migrations.AddField(
+            model_name='synthesemensuelle',
+            name='departement',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_rh.departement'),
+        ),
+        migrations.AddIndex(
+            model_name='motannonce',
+            index=models.Index(fields=['mot', '-impact', 'annonce'], name='mot_annonce_impact_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motannonce',
+            index=models.Index(fields=['annonce', 'mot', 'impact'], name='mot_annonce_annonce_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='motannonce',
+            unique_together={('mot', 'annonce')},
+        ),
+        migrations.AddIndex(
+            model_name='synthesemensuelle',
+            index=models.Index(fields=['annee', 'mois'], name='synthese_mensuelle_periode_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='synthesemensuelle',
+            unique_together={('departement', 'annee', 'mois')},
+        ),
+    ]
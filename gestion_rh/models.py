@@ -1,10 +1,17 @@
-from django.db import models
+from django.db import NotSupportedError, models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 # On peut étendre le modèle User de base ou en créer un complètement séparé.
 # Pour la simplicité et la robustesse, on va lier notre Employe au User de Django.
 
 class Role(models.Model):
+    # Noms des rôles sur lesquels reposent les permissions de l'application
+    ADMIN = 'Admin'
+    RH = 'RH'
+    EMPLOYE = 'Employe'
+
     nom_role = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
@@ -15,6 +22,38 @@ class Utilisateur(AbstractUser):
     # On ajoute juste la liaison vers le rôle.
     role = models.ForeignKey(Role, on_delete=models.SET_NULL, null=True, blank=True)
 
+    # Le backend d'authentification charge le rôle avec l'utilisateur
+    # (select_related) : ces indicateurs ne coûtent donc aucune requête.
+    @cached_property
+    def nom_role(self):
+        return self.role.nom_role if self.role_id else None
+
+    @property
+    def is_admin(self):
+        return self.nom_role == Role.ADMIN
+
+    @property
+    def is_rh(self):
+        return self.nom_role == Role.RH
+
+    @property
+    def is_admin_or_rh(self):
+        return self.nom_role in (Role.ADMIN, Role.RH)
+
+class Departement(models.Model):
+    """Service de rattachement des employés (Informatique, Comptabilité...)."""
+    nom = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.nom
+
+class Poste(models.Model):
+    """Intitulé de poste (Développeur, Comptable...)."""
+    intitule = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.intitule
+
 class Employe(models.Model):
     # Liaison One-to-One avec le modèle Utilisateur pour l'authentification
     utilisateur = models.OneToOneField(Utilisateur, on_delete=models.CASCADE, primary_key=True)
@@ -23,11 +62,19 @@ class Employe(models.Model):
     prenom = models.CharField(max_length=100)
     date_naissance = models.DateField()
     telephone = models.CharField(max_length=20)
-    service = models.CharField(max_length=100) # Pourrait être une ForeignKey vers un modèle Departement
-    poste = models.CharField(max_length=100)   # Pourrait être une ForeignKey vers un modèle Poste
+    # Clés étrangères indexées : les regroupements par service se font sur des entiers.
+    departement = models.ForeignKey(Departement, on_delete=models.PROTECT, related_name='employes')
+    poste = models.ForeignKey(Poste, on_delete=models.PROTECT, related_name='employes')
     salaire_base = models.DecimalField(max_digits=10, decimal_places=2)
     date_embauche = models.DateField()
 
+    class Meta:
+        indexes = [
+            # Tri et pagination par clé de la liste des employés
+            models.Index(fields=['nom', 'utilisateur'], name='employe_nom_idx'),
+            models.Index(fields=['departement', 'nom'], name='employe_departement_nom_idx'),
+        ]
+
     def __str__(self):
         return f"{self.prenom} {self.nom} ({self.matricule})"
 
@@ -43,21 +90,85 @@ class Conge(models.Model):
     motif = models.TextField()
     statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='DEMANDE')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_debut', '-id'], name='conge_date_debut_idx'),
+            models.Index(fields=['statut', '-date_debut'], name='conge_statut_date_idx'),
+            # Recherche des chevauchements pour un employé
+            models.Index(fields=['employe', 'date_debut', 'date_fin'], name='conge_employe_periode_idx'),
+        ]
+
     def __str__(self):
         return f"Congé pour {self.employe} du {self.date_debut} au {self.date_fin}"
 
+    @property
+    def nombre_jours(self):
+        """Durée du congé en jours calendaires, bornes incluses."""
+        return (self.date_fin - self.date_debut).days + 1
+
+class SoldeConge(models.Model):
+    """
+    Solde de congés d'un employé pour une année.
+
+    jours_pris est tenu à jour à chaque passage d'un Conge à l'état VALIDE (ou
+    retour), voir gestion_rh.conges. Un congé est compté sur l'année de sa
+    date de début.
+    """
+    DROIT_ANNUEL = 25
+
+    employe = models.ForeignKey(Employe, on_delete=models.CASCADE, related_name='soldes_conges')
+    annee = models.IntegerField()
+    jours_acquis = models.IntegerField(default=DROIT_ANNUEL)
+    jours_pris = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('employe', 'annee')
+
+    def __str__(self):
+        return f"Solde {self.annee} de {self.employe} : {self.jours_restants} jours"
+
+    @property
+    def jours_restants(self):
+        return self.jours_acquis - self.jours_pris
+
+class AbsenceServiceJour(models.Model):
+    """
+    Nombre d'employés d'un service en congé validé pour un jour donné.
+
+    Compteur tenu à jour avec les validations de congés (voir gestion_rh.conges),
+    pour connaître la charge d'absence d'une équipe sans relire tous les congés.
+    """
+    departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    nombre = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('departement', 'date')
+
+    def __str__(self):
+        return f"{self.departement} le {self.date} : {self.nombre} absent(s)"
+
 class Formation(models.Model):
     titre = models.CharField(max_length=200)
     description = models.TextField()
     duree_heures = models.IntegerField()
+    capacite = models.PositiveIntegerField(default=20, help_text="Nombre maximal de participants")
+    # Places occupées (participations INSCRIT ou TERMINE), tenues à jour par
+    # gestion_rh.formations : la réservation d'une place est un UPDATE conditionnel.
+    places_prises = models.PositiveIntegerField(default=0, editable=False)
     participants = models.ManyToManyField(Employe, through='ParticipationFormation')
 
     def __str__(self):
         return self.titre
 
+    @property
+    def places_restantes(self):
+        return max(0, self.capacite - self.places_prises)
+
 class ParticipationFormation(models.Model):
     STATUT_CHOICES = [
         ('INSCRIT', 'Inscrit'),
+        ('ATTENTE', "En liste d'attente"),
         ('TERMINE', 'Terminé'),
         ('ANNULE', 'Annulé'),
     ]
@@ -69,6 +180,10 @@ class ParticipationFormation(models.Model):
 
     class Meta:
         unique_together = ('employe', 'formation')
+        indexes = [
+            # Liste d'attente d'une formation dans l'ordre d'arrivée, participants par statut.
+            models.Index(fields=['formation', 'statut', 'id'], name='participation_statut_idx'),
+        ]
 
 # ... (Les modèles Role, Utilisateur, Employe, Conge, Formation, ParticipationFormation existent déjà) ...
 
@@ -91,10 +206,112 @@ class Presence(models.Model):
         # Si un employé peut pointer plusieurs fois par jour (ex: pause déjeuner),
         # il faudrait retirer cette contrainte et adapter la logique.
         unique_together = ('employe', 'journee')
+        indexes = [
+            # Parcours des présences jour par jour, les plus récentes d'abord
+            models.Index(fields=['journee', '-id'], name='presence_journee_idx'),
+        ]
 
     def __str__(self):
         return f"Présence de {self.employe} le {self.journee.date_journee}"
 
+# --- Agrégats de présence matérialisés (voir gestion_rh.assiduite) ---
+
+class AgregatPresenceMixin(models.Model):
+    """Compteurs communs aux agrégats de présence."""
+    jours_presents = models.IntegerField(default=0)
+    secondes_travaillees = models.IntegerField(default=0)
+    retards = models.IntegerField(default=0)
+    departs_manquants = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def heures_travaillees(self):
+        return round(self.secondes_travaillees / 3600, 2)
+
+class PresenceMensuelle(AgregatPresenceMixin):
+    """Totaux de présence d'un employé pour un mois."""
+    employe = models.ForeignKey(Employe, on_delete=models.CASCADE, related_name='presences_mensuelles')
+    annee = models.IntegerField()
+    mois = models.IntegerField()
+
+    class Meta:
+        unique_together = ('employe', 'annee', 'mois')
+        indexes = [models.Index(fields=['annee', 'mois'], name='presence_mensuelle_periode_idx')]
+
+    def __str__(self):
+        return f"Présences de {self.employe} - {self.mois}/{self.annee}"
+
+class PresenceServiceJour(AgregatPresenceMixin):
+    """Totaux de présence d'un service pour une journée (jours_presents = nombre de présents)."""
+    departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+
+    class Meta:
+        unique_together = ('departement', 'date')
+        indexes = [models.Index(fields=['date'], name='presence_service_jour_date_idx')]
+
+    def __str__(self):
+        return f"Présences {self.departement} le {self.date}"
+
+# --- Synthèses du tableau de bord RH (voir gestion_rh.tableau_de_bord) ---
+
+class SyntheseMensuelle(models.Model):
+    """Indicateurs d'un département pour un mois, recalculés à partir des compteurs et des fiches de paie."""
+    departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name='+')
+    annee = models.IntegerField()
+    mois = models.IntegerField()
+    effectif = models.IntegerField(default=0, help_text="Employés embauchés à la fin du mois")
+    nombre_fiches = models.IntegerField(default=0)
+    masse_brute = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    masse_nette = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    jours_conge = models.IntegerField(default=0, help_text="Jours de congé validés (jours calendaires)")
+    jours_presents = models.IntegerField(default=0)
+    secondes_travaillees = models.BigIntegerField(default=0)
+    retards = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('departement', 'annee', 'mois')
+        indexes = [models.Index(fields=['annee', 'mois'], name='synthese_mensuelle_periode_idx')]
+
+    def __str__(self):
+        return f"Synthèse {self.departement} - {self.mois}/{self.annee}"
+
+class PeriodeSynthese(models.Model):
+    """Mois couvert par les synthèses ; a_recalculer est levé dès qu'une donnée source du mois change."""
+    annee = models.IntegerField()
+    mois = models.IntegerField()
+    a_recalculer = models.BooleanField(default=True)
+    date_calcul = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('annee', 'mois')
+        indexes = [models.Index(fields=['a_recalculer'], name='periode_synthese_recalcul_idx')]
+
+    def __str__(self):
+        return f"{self.mois:02d}/{self.annee}"
+
+# --- Index de recherche de l'annuaire (voir gestion_rh.annuaire) ---
+
+class MotAnnuaire(models.Model):
+    """Mot normalisé (minuscules, sans accents) d'un champ de l'employé."""
+    mot = models.CharField(max_length=100)
+    employe = models.ForeignKey(Employe, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        # L'index (mot, employe) couvre les recherches par préfixe : mot >= 'dup' AND mot < 'dup\uffff'.
+        unique_together = ('mot', 'employe')
+        indexes = [models.Index(fields=['employe'], name='mot_annuaire_employe_idx')]
+
+class TrigrammeAnnuaire(models.Model):
+    """Trigrammes des mots alphabétiques de l'annuaire, pour la recherche tolérante aux fautes."""
+    trigramme = models.CharField(max_length=3)
+    mot = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('trigramme', 'mot')
+
 class Annonce(models.Model):
     """Modèle pour les annonces internes."""
     titre = models.CharField(max_length=255)
@@ -105,6 +322,40 @@ class Annonce(models.Model):
     def __str__(self):
         return self.titre
 
+class LectureAnnonces(models.Model):
+    """
+    Repère de lecture du fil des annonces : une ligne par utilisateur, les
+    annonces publiées après derniere_lecture sont non lues (voir gestion_rh.annonces).
+    """
+    utilisateur = models.OneToOneField(Utilisateur, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    derniere_lecture = models.DateTimeField()
+
+    def __str__(self):
+        return f"Annonces lues par {self.utilisateur_id} jusqu'au {self.derniere_lecture:%d/%m/%Y %H:%M}"
+
+class MotAnnonce(models.Model):
+    """
+    Index inversé des annonces : un mot normalisé du titre ou du contenu et
+    son poids de pertinence dans l'annonce (voir gestion_rh.recherche_annonces).
+    """
+    mot = models.CharField(max_length=100)
+    annonce = models.ForeignKey(Annonce, on_delete=models.CASCADE, related_name='+')
+    impact = models.FloatField()
+
+    class Meta:
+        unique_together = ('mot', 'annonce')
+        indexes = [
+            # Les meilleures annonces d'un mot se lisent dans l'ordre de l'index, sans tri.
+            models.Index(fields=['mot', '-impact', 'annonce'], name='mot_annonce_impact_idx'),
+            # Mots d'une annonce : mise à jour de l'index et vérification des autres termes d'une requête.
+            models.Index(fields=['annonce', 'mot', 'impact'], name='mot_annonce_annonce_idx'),
+        ]
+
+class FrequenceMotAnnonce(models.Model):
+    """Nombre d'annonces contenant le mot, tenu à jour avec MotAnnonce (rareté du mot dans les scores)."""
+    mot = models.CharField(max_length=100, primary_key=True)
+    annonces = models.PositiveIntegerField(default=0)
+
 # --- Modèles pour la Fiche de Paie ---
 
 class Avantage(models.Model):
@@ -125,6 +376,33 @@ class Prime(models.Model):
     def __str__(self):
         return self.nom_prime
 
+class FicheDePaieManager(models.Manager):
+    """
+    Accès aux fiches par période qui route selon l'année : une année archivée
+    est relue de son archive (voir gestion_rh.archives_paie) sous forme de
+    liste de FicheDePaieArchivee, les autres restent des QuerySet.
+    """
+
+    def de_la_periode(self, annee, mois=None):
+        from .archives_paie import annee_archivee, lire_fiches
+        if annee_archivee(annee):
+            return lire_fiches(annee, mois)
+        fiches = self.filter(annee=annee)
+        return fiches if mois is None else fiches.filter(mois=mois)
+
+    def de_l_employe(self, employe_id):
+        """Historique complet d'un employé, archives comprises, dans l'ordre chronologique."""
+        from .archives_paie import fiches_archivees_employe
+        return [*fiches_archivees_employe(employe_id), *self.filter(employe_id=employe_id).order_by('annee', 'mois')]
+
+    def trouver(self, pk):
+        """Fiche par clé, en table ou archivée ; None si elle n'existe nulle part."""
+        fiche = self.filter(pk=pk).first()
+        if fiche is None:
+            from .archives_paie import fiche_archivee
+            fiche = fiche_archivee(pk)
+        return fiche
+
 class FicheDePaie(models.Model):
     """Le document central de la paie pour un employé pour un mois donné."""
     STATUT_CHOICES = [
@@ -148,12 +426,55 @@ class FicheDePaie(models.Model):
     avantages = models.ManyToManyField(Avantage, through='FichePaieAvantage')
     primes = models.ManyToManyField(Prime, through='FichePaiePrime')
 
+    objects = FicheDePaieManager()
+
     class Meta:
         unique_together = ('employe', 'mois', 'annee') # Une seule fiche de paie par employé par mois/année
+        indexes = [
+            models.Index(fields=['-annee', '-mois', '-id'], name='fiche_paie_periode_idx'),
+            models.Index(fields=['statut', '-annee', '-mois'], name='fiche_paie_statut_idx'),
+        ]
 
     def __str__(self):
         return f"Fiche de paie pour {self.employe} - {self.mois}/{self.annee}"
 
+class FicheDePaieArchivee(FicheDePaie):
+    """
+    Fiche relue d'une archive annuelle, en lecture seule. Ses lignes sont dans
+    lignes_primes et lignes_avantages ([(nom, montant), ...]) ; matricule, nom
+    et prenom sont ceux de l'employé au moment de l'archivage.
+    """
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise NotSupportedError("Fiche de paie archivée : restaurez son année pour la modifier.")
+
+    def delete(self, *args, **kwargs):
+        raise NotSupportedError("Fiche de paie archivée : restaurez son année pour la supprimer.")
+
+class ArchivePaie(models.Model):
+    """
+    Année de paie close sortie des tables vers un fichier JSONL compressé
+    (voir gestion_rh.archives_paie).
+    """
+    annee = models.IntegerField(unique=True)
+    fichier = models.CharField(max_length=255, help_text="Nom du fichier dans ARCHIVES_PAIE_DIR")
+    # {mois: [position, longueur]} du membre gzip de chaque mois dans le fichier
+    index_mois = models.JSONField(default=dict)
+    nombre_fiches = models.IntegerField(default=0)
+    nombre_lignes = models.IntegerField(default=0, help_text="Lignes de primes et d'avantages")
+    masse_brute = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    masse_nette = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Bornes des clés archivées, pour retrouver l'année d'une fiche par sa clé
+    pk_min = models.IntegerField(default=0)
+    pk_max = models.IntegerField(default=0)
+    empreinte = models.CharField(max_length=64, help_text="SHA-256 du fichier")
+    date_archivage = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive de paie {self.annee} ({self.nombre_fiches} fiches)"
+
 # Modèles intermédiaires pour stocker le montant spécifique au moment de la paie
 class FichePaieAvantage(models.Model):
     fiche_de_paie = models.ForeignKey(FicheDePaie, on_delete=models.CASCADE)
@@ -169,4 +490,62 @@ class FichePaiePrime(models.Model):
     montant = models.DecimalField(max_digits=10, decimal_places=2, help_text="Montant de la prime pour ce mois spécifique")
 
     class Meta:
-        unique_together = ('fiche_de_paie', 'prime')
\ No newline at end of file
+        unique_together = ('fiche_de_paie', 'prime')
+
+class Tache(models.Model):
+    """
+    Travail de fond (paie, import, bulletins...) exécuté hors du cycle de la
+    requête par la commande traiter_taches. La table sert elle-même de file.
+    """
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminée'),
+        ('ECHOUEE', 'Échouée'),
+    ]
+    type_tache = models.CharField(max_length=50)
+    parametres = models.JSONField(default=dict, blank=True)
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    progression = models.PositiveSmallIntegerField(default=0, help_text="Avancement en pourcentage")
+    message = models.CharField(max_length=255, blank=True)
+    resultat = models.JSONField(null=True, blank=True)
+    erreur = models.TextField(blank=True)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    max_tentatives = models.PositiveSmallIntegerField(default=3)
+    executer_apres = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    # Dernier signe de vie du worker : une tâche EN_COURS muette trop longtemps est reprise.
+    battement = models.DateTimeField(null=True, blank=True)
+    demandeur = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Réservation : prochaine tâche EN_ATTENTE exécutable, dans l'ordre d'arrivée.
+            models.Index(fields=['statut', 'executer_apres', 'id'], name='tache_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_tache} #{self.pk} ({self.get_statut_display()})"
+
+class MesureRequete(models.Model):
+    """Mesure d'une requête HTTP échantillonnée par l'instrumentation des vues (voir gestion_rh.instrumentation)."""
+    vue = models.CharField(max_length=200, help_text="Nom d'URL de la vue")
+    methode = models.CharField(max_length=10)
+    statut = models.PositiveSmallIntegerField()
+    duree_ms = models.FloatField()
+    nombre_requetes = models.PositiveIntegerField(default=0)
+    duree_sql_ms = models.FloatField(default=0)
+    # Exécutions identiques (même SQL, mêmes paramètres) au-delà de la première
+    requetes_dupliquees = models.PositiveIntegerField(default=0)
+    # Formes SQL répétées au-delà du seuil N+1 : [{"sql": forme, "nombre": n}, ...]
+    motifs_repetes = models.JSONField(default=list, blank=True)
+    date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['date'], name='mesure_requete_date_idx')]
+
+    def __str__(self):
+        return f"{self.methode} {self.vue} : {self.duree_ms:.1f} ms, {self.nombre_requetes} requêtes"
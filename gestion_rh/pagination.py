@@ -0,0 +1,115 @@
+"""
+Pagination par clé (« keyset » / seek) pour les listes volumineuses.
+
+Au lieu d'un OFFSET dont le coût grandit avec le numéro de page, chaque page
+repart des valeurs de tri de la dernière ligne affichée, transmises dans le
+paramètre `apres`. Avec un index sur les colonnes de tri, le coût d'une page
+ne dépend plus du nombre de lignes de la table.
+"""
+import base64
+import json
+from functools import reduce
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+def encoder_curseur(valeurs):
+    brut = json.dumps(valeurs, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur):
+    """Décode un curseur ; lève ValueError s'il est illisible."""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        valeurs = json.loads(brut)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Curseur de pagination invalide.") from exc
+    if not isinstance(valeurs, list):
+        raise ValueError("Curseur de pagination invalide.")
+    return valeurs
+
+
+def filtre_apres(cles, valeurs):
+    """
+    Construit la condition « strictement après `valeurs` » pour l'ordre `cles`.
+
+    Pour (a, b) trié croissant : a > va OU (a = va ET b > vb). Un préfixe '-'
+    inverse le sens de la comparaison, comme dans order_by().
+    """
+    conditions = []
+    for i, cle in enumerate(cles):
+        champ = cle.lstrip('-')
+        lookup = 'lt' if cle.startswith('-') else 'gt'
+        egalites = {c.lstrip('-'): v for c, v in zip(cles[:i], valeurs[:i])}
+        conditions.append(Q(**egalites, **{f'{champ}__{lookup}': valeurs[i]}))
+    return reduce(lambda a, b: a | b, conditions)
+
+
+class FiltresMixin:
+    """
+    Filtres serveur lus dans la query string.
+
+    `filtres` associe un paramètre GET à un lookup ORM ; seuls les paramètres
+    renseignés sont appliqués, et `filtres_actifs` garde ceux qui l'ont été.
+    """
+    filtres = {}
+
+    def filtrer(self, queryset):
+        self.filtres_actifs = {}
+        for parametre, lookup in self.filtres.items():
+            valeur = self.request.GET.get(parametre)
+            if not valeur:
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: valeur})
+            except (ValidationError, ValueError):
+                # Valeur mal formée (date, nombre...) : le filtre est ignoré.
+                continue
+            self.filtres_actifs[parametre] = valeur
+        return queryset
+
+
+class KeysetPaginationMixin(FiltresMixin):
+    """
+    Pagination par clé et filtres serveur pour une ListView.
+
+    - `cles_tri` : colonnes de tri, la dernière devant être unique (la clé primaire) ;
+    - `filtres` : voir FiltresMixin ;
+    - `taille_page` : nombre de lignes par page.
+
+    Le contexte reçoit `url_page_suivante` (None sur la dernière page) et
+    `filtres_actifs`, le dictionnaire des filtres effectivement appliqués.
+    """
+    cles_tri = ('-pk',)
+    taille_page = 50
+
+    def get_queryset(self):
+        queryset = self.filtrer(super().get_queryset()).order_by(*self.cles_tri)
+        curseur = self.request.GET.get('apres')
+        if curseur:
+            try:
+                valeurs = decoder_curseur(curseur)
+                if len(valeurs) == len(self.cles_tri):
+                    queryset = queryset.filter(filtre_apres(self.cles_tri, valeurs))
+            except (ValidationError, ValueError):
+                pass
+        return queryset
+
+    def valeurs_tri(self, objet):
+        return [attrgetter(cle.lstrip('-').replace('__', '.'))(objet) for cle in self.cles_tri]
+
+    def get_context_data(self, **kwargs):
+        lignes = list(self.object_list[:self.taille_page + 1])
+        page, suivante = lignes[:self.taille_page], len(lignes) > self.taille_page
+        context = super().get_context_data(object_list=page, **kwargs)
+        context['filtres_actifs'] = self.filtres_actifs
+        context['url_page_suivante'] = None
+        if suivante:
+            parametres = self.request.GET.copy()
+            parametres['apres'] = encoder_curseur(self.valeurs_tri(page[-1]))
+            context['url_page_suivante'] = f"?{parametres.urlencode()}"
+        return context
@@ -0,0 +1,295 @@
+"""
+Moteur de calcul de la paie en masse.
+
+Au lieu de saisir chaque FicheDePaie à la main, on calcule toutes les fiches
+d'un mois en une seule passe : quelques requêtes agrégées par lot d'employés,
+un calcul des totaux en mémoire, puis une écriture groupée (upsert) par lot.
+
+Pour les gros effectifs, le calcul peut être réparti sur plusieurs processus :
+les employés sont découpés en tranches contiguës de clés primaires, chaque
+tranche est calculée dans un worker, puis écrite par le processus principal
+dans sa propre transaction avant un rapprochement final des totaux du mois.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import django
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+
+from .archives_paie import annee_archivee
+from .models import Employe, FicheDePaie, FichePaieAvantage, FichePaiePrime
+from .tableau_de_bord import marquer_periodes
+
+ZERO = Decimal('0.00')
+CENTIME = Decimal('0.01')
+
+# Champs recalculés à chaque passage ; date_creation et statut ne sont jamais écrasés.
+CHAMPS_CALCULES = [
+    'salaire_brut', 'total_primes', 'total_avantages',
+    'cotisations_sociales', 'impot_sur_revenu', 'salaire_net',
+]
+
+
+class ErreurRapprochement(Exception):
+    """Les totaux relus en base ne correspondent pas aux totaux calculés."""
+
+
+@dataclass
+class ResultatPaie:
+    """Bilan d'un passage du moteur de paie."""
+    mois: int
+    annee: int
+    crees: int = 0
+    mis_a_jour: int = 0
+    ignores: int = 0  # Fiches déjà validées ou émises, laissées intactes
+    duree: float = 0.0
+    total_net: Decimal = field(default=ZERO)
+    nb_workers: int = 1
+
+    @property
+    def lignes(self):
+        return self.crees + self.mis_a_jour
+
+    @property
+    def lignes_par_seconde(self):
+        return self.lignes / self.duree if self.duree else 0.0
+
+
+def calculer_salaire_net(salaire_brut, total_primes, total_avantages, cotisations, impot):
+    """Formule unique du net à payer, partagée par tous les chemins de calcul."""
+    net = salaire_brut + total_primes + total_avantages - cotisations - impot
+    return net.quantize(CENTIME)
+
+
+def _sommes_par_fiche(modele, fiche_ids):
+    """Renvoie {fiche_id: somme des montants} pour les lignes d'un modèle de liaison."""
+    if not fiche_ids:
+        return {}
+    lignes = (
+        modele.objects.filter(fiche_de_paie_id__in=fiche_ids)
+        .values('fiche_de_paie_id')
+        .annotate(total=Sum('montant'))
+        .values_list('fiche_de_paie_id', 'total')
+    )
+    return dict(lignes)
+
+
+def calculer_lot(mois, annee, employes):
+    """
+    Calcule les fiches d'un lot d'employés.
+
+    `employes` est une liste de tuples (pk, salaire_base). Renvoie la liste
+    des FicheDePaie à écrire, le nombre de fiches déjà existantes (brouillons
+    recalculés) et le nombre de fiches ignorées car déjà validées.
+    Les montants saisis sur les fiches existantes (lignes de primes/avantages,
+    cotisations, impôt) sont conservés et intégrés aux totaux.
+    """
+    pks = [pk for pk, _ in employes]
+    existantes = {
+        ligne['employe_id']: ligne
+        for ligne in FicheDePaie.objects.filter(
+            mois=mois, annee=annee, employe_id__in=pks,
+        ).values('id', 'employe_id', 'statut', 'cotisations_sociales', 'impot_sur_revenu')
+    }
+    brouillons = [f['id'] for f in existantes.values() if f['statut'] == 'BROUILLON']
+    primes = _sommes_par_fiche(FichePaiePrime, brouillons)
+    avantages = _sommes_par_fiche(FichePaieAvantage, brouillons)
+
+    fiches = []
+    ignores = 0
+    mis_a_jour = 0
+    for pk, salaire_base in employes:
+        existante = existantes.get(pk)
+        if existante is None:
+            fiche_id, cotisations, impot = None, ZERO, ZERO
+        elif existante['statut'] != 'BROUILLON':
+            ignores += 1
+            continue
+        else:
+            mis_a_jour += 1
+            fiche_id = existante['id']
+            cotisations = existante['cotisations_sociales']
+            impot = existante['impot_sur_revenu']
+        total_primes = primes.get(fiche_id) or ZERO
+        total_avantages = avantages.get(fiche_id) or ZERO
+        fiches.append(FicheDePaie(
+            employe_id=pk,
+            mois=mois,
+            annee=annee,
+            salaire_brut=salaire_base,
+            total_primes=total_primes,
+            total_avantages=total_avantages,
+            cotisations_sociales=cotisations,
+            impot_sur_revenu=impot,
+            salaire_net=calculer_salaire_net(salaire_base, total_primes, total_avantages, cotisations, impot),
+        ))
+    return fiches, mis_a_jour, ignores
+
+
+def _cle(fiche):
+    return fiche.employe_id, fiche.mois, fiche.annee
+
+
+def ecrire_lot(fiches, taille_lot=None):
+    """
+    Écrit un lot de fiches en un seul upsert, dans sa propre transaction, et
+    renvoie (fiches écrites, nombre de fiches créées).
+
+    Le conflit est résolu sur ('employe', 'mois', 'annee') : les fiches
+    absentes sont créées, les brouillons existants sont recalculés, et un
+    second passage sur le même mois est donc idempotent. Le statut est relu
+    sous verrou dans la transaction d'écriture, sans se fier à la lecture du
+    calcul : une fiche validée ou émise entre-temps est laissée intacte.
+    """
+    if not fiches:
+        return [], 0
+    with transaction.atomic():
+        # Les lots couvrent des clés d'employés contiguës : une plage plutôt qu'une liste de clés.
+        statuts = {
+            (employe_id, mois, annee): statut
+            for employe_id, mois, annee, statut in FicheDePaie.objects.select_for_update().filter(
+                employe_id__gte=min(fiche.employe_id for fiche in fiches),
+                employe_id__lte=max(fiche.employe_id for fiche in fiches),
+                mois__in={fiche.mois for fiche in fiches},
+                annee__in={fiche.annee for fiche in fiches},
+            ).values_list('employe_id', 'mois', 'annee', 'statut').iterator()
+        }
+        ecrites = [fiche for fiche in fiches if statuts.get(_cle(fiche), 'BROUILLON') == 'BROUILLON']
+        FicheDePaie.objects.bulk_create(
+            ecrites,
+            update_conflicts=True,
+            unique_fields=['employe', 'mois', 'annee'],
+            update_fields=CHAMPS_CALCULES,
+            batch_size=taille_lot,
+        )
+        marquer_periodes({(fiche.annee, fiche.mois) for fiche in ecrites})
+    return ecrites, sum(1 for fiche in ecrites if _cle(fiche) not in statuts)
+
+
+def _ecrire_et_compter(resultat, fiches, ignores, taille_lot=None):
+    """Écrit les fiches calculées et reporte dans `resultat` ce qui a réellement été écrit."""
+    ecrites, creees = ecrire_lot(fiches, taille_lot)
+    resultat.crees += creees
+    resultat.mis_a_jour += len(ecrites) - creees
+    resultat.ignores += ignores + len(fiches) - len(ecrites)
+    resultat.total_net += sum((fiche.salaire_net for fiche in ecrites), ZERO)
+
+
+def lots_employes(taille_lot, queryset=None):
+    """Parcourt les employés par clé primaire croissante (pagination par clé)."""
+    queryset = Employe.objects.all() if queryset is None else queryset
+    dernier = None
+    while True:
+        lot = queryset.order_by('pk')
+        if dernier is not None:
+            lot = lot.filter(pk__gt=dernier)
+        lot = list(lot.values_list('pk', 'salaire_base')[:taille_lot])
+        if not lot:
+            return
+        yield lot
+        dernier = lot[-1][0]
+
+
+def verifier_periode(mois, annee):
+    if not 1 <= mois <= 12:
+        raise ValueError("Le mois doit être compris entre 1 et 12.")
+    if annee_archivee(annee):
+        raise ValueError(f"L'année {annee} est archivée : restaurez-la avant d'en recalculer la paie.")
+
+
+def lancer_paie(mois, annee, taille_lot=1000, queryset=None, rappel=None):
+    """
+    Génère ou recalcule toutes les fiches de paie du mois demandé.
+
+    `rappel`, s'il est fourni, est appelé avec le ResultatPaie en cours après
+    chaque lot (suivi de l'avancement d'une tâche de fond).
+    """
+    verifier_periode(mois, annee)
+    resultat = ResultatPaie(mois=mois, annee=annee)
+    debut = time.perf_counter()
+    for employes in lots_employes(taille_lot, queryset):
+        fiches, _, ignores = calculer_lot(mois, annee, employes)
+        _ecrire_et_compter(resultat, fiches, ignores)
+        if rappel is not None:
+            rappel(resultat)
+    resultat.duree = time.perf_counter() - debut
+    return resultat
+
+
+# --- Calcul réparti sur plusieurs processus ---
+
+def tranches_employes(nb_tranches):
+    """
+    Découpe les employés en tranches contiguës de clés primaires.
+
+    Renvoie une liste de bornes (pk_min, pk_max) incluses, de tailles égales
+    à un employé près. Le découpage ne dépend que des clés présentes en base
+    et du nombre de tranches demandé.
+    """
+    pks = list(Employe.objects.order_by('pk').values_list('pk', flat=True))
+    if not pks:
+        return []
+    taille = -(-len(pks) // max(nb_tranches, 1))
+    return [(pks[i], pks[min(i + taille, len(pks)) - 1]) for i in range(0, len(pks), taille)]
+
+
+def calculer_tranche(mois, annee, pk_min, pk_max, taille_lot=1000):
+    """Calcule, sans rien écrire, les fiches des employés d'une tranche de clés."""
+    queryset = Employe.objects.filter(pk__gte=pk_min, pk__lte=pk_max)
+    fiches, mis_a_jour, ignores = [], 0, 0
+    for employes in lots_employes(taille_lot, queryset):
+        lot, lot_mis_a_jour, lot_ignores = calculer_lot(mois, annee, employes)
+        fiches.extend(lot)
+        mis_a_jour += lot_mis_a_jour
+        ignores += lot_ignores
+    return fiches, mis_a_jour, ignores
+
+
+def rapprocher(resultat):
+    """
+    Vérifie que les brouillons du mois en base correspondent au calcul.
+
+    Après un passage complet, chaque brouillon du mois vient d'être écrit par
+    le moteur : leur nombre et la somme de leur net doivent donc être égaux
+    aux totaux accumulés dans `resultat`.
+    """
+    totaux = FicheDePaie.objects.filter(
+        mois=resultat.mois, annee=resultat.annee, statut='BROUILLON',
+    ).aggregate(nombre=Count('id'), net=Sum('salaire_net'))
+    # SQLite peut sommer les décimaux en flottant : on compare au centime.
+    net = (totaux['net'] or ZERO).quantize(CENTIME)
+    if totaux['nombre'] != resultat.lignes or net != resultat.total_net:
+        raise ErreurRapprochement(
+            f"Paie {resultat.mois:02d}/{resultat.annee} : {totaux['nombre']} fiches pour {net} en base, "
+            f"{resultat.lignes} fiches pour {resultat.total_net} calculées."
+        )
+
+
+def lancer_paie_parallele(mois, annee, nb_workers, taille_lot=1000):
+    """
+    Calcule la paie du mois en répartissant les tranches d'employés sur `nb_workers` processus.
+
+    Les workers ne font que lire et calculer ; le processus principal écrit
+    chaque tranche dans sa propre transaction, dans l'ordre des tranches, ce
+    qui garantit des montants identiques quel que soit le nombre de workers.
+    """
+    verifier_periode(mois, annee)
+    resultat = ResultatPaie(mois=mois, annee=annee, nb_workers=nb_workers)
+    debut = time.perf_counter()
+    tranches = tranches_employes(nb_workers)
+    # Les processus fils ne doivent pas hériter d'une connexion ouverte.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=nb_workers, initializer=django.setup) as pool:
+        calculs = [
+            pool.submit(calculer_tranche, mois, annee, pk_min, pk_max, taille_lot)
+            for pk_min, pk_max in tranches
+        ]
+        for calcul in calculs:
+            fiches, _, ignores = calcul.result()
+            _ecrire_et_compter(resultat, fiches, ignores, taille_lot)
+    rapprocher(resultat)
+    resultat.duree = time.perf_counter() - debut
+    return resultat
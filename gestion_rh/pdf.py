@@ -0,0 +1,108 @@
+"""
+Rendu PDF des bulletins de paie, sans dépendance externe.
+
+Ce module n'importe pas Django : il est chargé tel quel par les processus
+de rendu, qui ne reçoivent que des données déjà extraites de la base et
+n'ouvrent aucune connexion.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+# À incrémenter quand la mise en page change : les bulletins en cache sont alors régénérés.
+VERSION_GABARIT = 1
+
+LARGEUR_PAGE, HAUTEUR_PAGE = 595, 842  # A4 en points
+
+
+def _texte_pdf(texte):
+    """Chaîne littérale PDF en WinAnsi (Helvetica standard), caractères spéciaux échappés."""
+    brut = str(texte).encode('cp1252', errors='replace')
+    return b'(' + brut.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def document_pdf(lignes):
+    """
+    Construit un PDF d'une page à partir de lignes (x, y, taille, texte, gras).
+
+    Seules les polices standard Helvetica et Helvetica-Bold sont utilisées :
+    elles n'ont pas besoin d'être embarquées dans le fichier.
+    """
+    contenu = b''.join(
+        b'BT /%s %d Tf %d %d Td %s Tj ET\n' % (b'F2' if gras else b'F1', taille, x, y, _texte_pdf(texte))
+        for x, y, taille, texte, gras in lignes
+    )
+    police = b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+    objets = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+        b'/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>' % (LARGEUR_PAGE, HAUTEUR_PAGE),
+        police % b'Helvetica',
+        police % b'Helvetica-Bold',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(contenu), contenu),
+    ]
+    sortie = bytearray(b'%PDF-1.4\n')
+    positions = []
+    for numero, objet in enumerate(objets, start=1):
+        positions.append(len(sortie))
+        sortie += b'%d 0 obj\n%s\nendobj\n' % (numero, objet)
+    debut_xref = len(sortie)
+    sortie += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objets) + 1)
+    sortie += b''.join(b'%010d 00000 n \n' % position for position in positions)
+    sortie += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objets) + 1, debut_xref)
+    return bytes(sortie)
+
+
+def mise_en_page_bulletin(bulletin):
+    """Lignes de texte d'un bulletin (dictionnaire produit par gestion_rh.bulletins)."""
+    lignes = [
+        (50, 780, 18, "BULLETIN DE PAIE", True),
+        (50, 755, 11, f"Période : {bulletin['mois']:02d}/{bulletin['annee']}", False),
+        (50, 720, 11, f"{bulletin['prenom']} {bulletin['nom']}", True),
+        (50, 704, 10, f"Matricule : {bulletin['matricule']}", False),
+        (50, 690, 10, f"Service : {bulletin['service']} - Poste : {bulletin['poste']}", False),
+        (50, 650, 10, "Libellé", True),
+        (420, 650, 10, "Montant", True),
+    ]
+    y = 630
+
+    def ligne(libelle, montant, gras=False):
+        nonlocal y
+        lignes.append((50, y, 10, libelle, gras))
+        lignes.append((420, y, 10, montant, gras))
+        y -= 16
+
+    ligne("Salaire de base", bulletin['salaire_brut'])
+    for nom, montant in bulletin['primes']:
+        ligne(f"Prime : {nom}", montant)
+    for nom, montant in bulletin['avantages']:
+        ligne(f"Avantage : {nom}", montant)
+    ligne("Total primes", bulletin['total_primes'], True)
+    ligne("Total avantages", bulletin['total_avantages'], True)
+    ligne("Cotisations sociales", f"- {bulletin['cotisations_sociales']}")
+    ligne("Impôt sur le revenu", f"- {bulletin['impot_sur_revenu']}")
+    y -= 10
+    ligne("NET À PAYER", bulletin['salaire_net'], True)
+    lignes.append((50, 60, 8, f"Statut : {bulletin['statut']}", False))
+    return lignes
+
+
+def rendre_bulletin(bulletin):
+    return document_pdf(mise_en_page_bulletin(bulletin))
+
+
+def rendre_dans_cache(bulletin, dossier):
+    """
+    Rend un bulletin et l'écrit dans `dossier` sous son empreinte.
+
+    L'écriture passe par un fichier temporaire renommé : un lecteur ne voit
+    jamais un PDF à moitié écrit, même si deux processus rendent le même
+    bulletin en même temps. Renvoie le nombre de pages rendues.
+    """
+    chemin = Path(dossier) / f"{bulletin['empreinte']}.pdf"
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, suffix='.tmp')
+    with os.fdopen(descripteur, 'wb') as fichier:
+        fichier.write(rendre_bulletin(bulletin))
+    os.replace(temporaire, chemin)
+    return 1
@@ -0,0 +1,299 @@
+"""
+Pointages (Presence) : import en masse et pointage en libre-service.
+
+Import : le fichier exporté par les badgeuses est lu ligne à ligne comme un
+générateur et écrit par lots de taille fixe ; la mémoire consommée ne dépend
+que de la taille d'un lot, du nombre d'employés et du nombre de journées
+rencontrées, jamais de la taille du fichier.
+
+Libre-service : chaque pointage d'un employé connecté écrit directement sa
+Presence sur la JourneeTravail du jour, dont l'id est gardé en cache (et
+oublié si la journée a été supprimée ou recréée entre-temps). Les
+écritures passent par l'ORM (create, save) et non par un INSERT ... ON
+CONFLICT ou un UPDATE filtré, pour que les signaux tiennent les agrégats :
+l'arrivée coûte un INSERT (plus une lecture si elle était déjà pointée), le
+départ une lecture et un UPDATE.
+
+Les agrégats de présence (gestion_rh.assiduite) suivent : les pointages
+unitaires passent par les signaux, l'import reconstruit les jours touchés.
+"""
+import csv
+import datetime
+import io
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .assiduite import reconstruire_agregats_presence
+from .models import Employe, JourneeTravail, Presence
+
+# Nombre maximal de lignes rejetées dont on conserve le détail.
+MAX_ERREURS_DETAILLEES = 100
+
+
+@dataclass
+class ResultatImport:
+    """Bilan d'un import de pointages."""
+    lues: int = 0
+    importees: int = 0  # Présences créées ou modifiées (un même jour revu dans un autre lot compte à nouveau)
+    rejetees: int = 0
+    journees_creees: int = 0
+    duree: float = 0.0
+    erreurs: list = field(default_factory=list)  # [(numéro de ligne, raison), ...]
+
+    @property
+    def lignes_par_seconde(self):
+        return self.lues / self.duree if self.duree else 0.0
+
+    def rejeter(self, numero, raison):
+        self.rejetees += 1
+        if len(self.erreurs) < MAX_ERREURS_DETAILLEES:
+            self.erreurs.append((numero, raison))
+
+
+def lire_lignes(flux, format_fichier):
+    """
+    Génère les lignes d'un export de badgeuse sous forme de dictionnaires.
+
+    Format CSV : en-tête `matricule,date,heure_arrivee,heure_depart`.
+    Format JSONL : un objet JSON par ligne avec les mêmes clés.
+    Les lignes JSON illisibles sont renvoyées sous forme de chaîne d'erreur.
+    """
+    if format_fichier == 'csv':
+        yield from csv.DictReader(flux)
+    elif format_fichier == 'jsonl':
+        for ligne in flux:
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            try:
+                yield json.loads(ligne)
+            except ValueError:
+                yield "JSON invalide"
+    else:
+        raise ValueError(f"Format de fichier inconnu : {format_fichier}")
+
+
+def format_depuis_nom(nom_fichier):
+    return 'jsonl' if str(nom_fichier).lower().endswith(('.jsonl', '.json')) else 'csv'
+
+
+def _analyser(ligne, employes):
+    """Convertit une ligne brute en (employe_id, date, arrivée, départ) ou lève ValueError."""
+    if not isinstance(ligne, dict):
+        raise ValueError(ligne)
+    employe_id = employes.get((ligne.get('matricule') or '').strip())
+    if employe_id is None:
+        raise ValueError(f"Matricule inconnu : {ligne.get('matricule')!r}")
+    date = datetime.date.fromisoformat((ligne.get('date') or '').strip())
+    arrivee = datetime.time.fromisoformat((ligne.get('heure_arrivee') or '').strip())
+    depart = (ligne.get('heure_depart') or '').strip()
+    depart = datetime.time.fromisoformat(depart) if depart else None
+    return employe_id, date, arrivee, depart
+
+
+class _CacheJournees:
+    """Associe une date à l'id de sa JourneeTravail en créant les journées manquantes par lots."""
+
+    def __init__(self):
+        self.ids = {}
+        self.creees = 0
+
+    def resoudre(self, dates):
+        manquantes = set(dates) - self.ids.keys()
+        if not manquantes:
+            return
+        self.ids.update(
+            JourneeTravail.objects.filter(date_journee__in=manquantes).values_list('date_journee', 'id')
+        )
+        a_creer = manquantes - self.ids.keys()
+        if a_creer:
+            JourneeTravail.objects.bulk_create(
+                [JourneeTravail(date_journee=d) for d in a_creer], ignore_conflicts=True,
+            )
+            self.ids.update(
+                JourneeTravail.objects.filter(date_journee__in=a_creer).values_list('date_journee', 'id')
+            )
+            self.creees += len(a_creer)
+
+
+def _fusionner(arrivee, depart, arrivee_prec, depart_prec):
+    """Plusieurs passages le même jour : première arrivée, dernier départ."""
+    return min(arrivee, arrivee_prec), max(filter(None, (depart, depart_prec)), default=None)
+
+
+def _ecrire_lot(lot, journees):
+    """
+    Écrit un lot de pointages {(employe_id, date): (arrivée, départ)} et
+    renvoie le nombre de présences créées ou modifiées.
+
+    Les doublons d'un même lot ont déjà été fusionnés ; un pointage déjà en
+    base pour le même couple (lot précédent, import antérieur, pointage en
+    libre-service) est fusionné de la même façon, jamais remplacé. Les
+    présences existantes sont lues sous verrou dans la transaction d'écriture.
+    """
+    with transaction.atomic():
+        journees.resoudre(date for _, date in lot)
+        lot = {(employe_id, journees.ids[date]): heures for (employe_id, date), heures in lot.items()}
+        existantes = Presence.objects.select_for_update().filter(
+            employe_id__in={employe_id for employe_id, _ in lot},
+            journee_id__in={journee_id for _, journee_id in lot},
+        ).values_list('employe_id', 'journee_id', 'heure_arrivee', 'heure_depart')
+        for employe_id, journee_id, arrivee_prec, depart_prec in existantes.iterator():
+            cle = (employe_id, journee_id)
+            if cle not in lot:
+                continue
+            heures = _fusionner(*lot[cle], arrivee_prec, depart_prec)
+            if heures == (arrivee_prec, depart_prec):
+                del lot[cle]  # Rien de nouveau pour cette présence.
+            else:
+                lot[cle] = heures
+        Presence.objects.bulk_create(
+            [
+                Presence(employe_id=employe_id, journee_id=journee_id, heure_arrivee=arrivee, heure_depart=depart)
+                for (employe_id, journee_id), (arrivee, depart) in lot.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['employe', 'journee'],
+            update_fields=['heure_arrivee', 'heure_depart'],
+        )
+    return len(lot)
+
+
+def importer_presences(flux, format_fichier='csv', taille_lot=5000, rappel=None):
+    """
+    Importe un flux texte de pointages et renvoie un ResultatImport.
+
+    `rappel`, s'il est fourni, est appelé avec le ResultatImport en cours
+    après l'écriture de chaque lot.
+    """
+    resultat = ResultatImport()
+    debut = time.perf_counter()
+    employes = dict(Employe.objects.values_list('matricule', 'pk'))
+    journees = _CacheJournees()
+    dates = set()
+    lot = {}
+    for numero, ligne in enumerate(lire_lignes(flux, format_fichier), start=1):
+        resultat.lues += 1
+        try:
+            employe_id, date, arrivee, depart = _analyser(ligne, employes)
+        except (ValueError, TypeError, AttributeError) as exc:
+            resultat.rejeter(numero, str(exc))
+            continue
+        dates.add(date)
+        cle = (employe_id, date)
+        if cle in lot:
+            arrivee, depart = _fusionner(arrivee, depart, *lot[cle])
+        lot[cle] = (arrivee, depart)
+        if len(lot) >= taille_lot:
+            resultat.importees += _ecrire_lot(lot, journees)
+            lot = {}
+            if rappel is not None:
+                rappel(resultat)
+    if lot:
+        resultat.importees += _ecrire_lot(lot, journees)
+    # L'upsert en masse contourne les signaux : on recalcule les agrégats des jours importés.
+    reconstruire_agregats_presence(dates)
+    resultat.journees_creees = journees.creees
+    resultat.duree = time.perf_counter() - debut
+    return resultat
+
+
+def importer_fichier_televerse(fichier, taille_lot=5000):
+    """Importe un fichier envoyé par formulaire sans le charger entièrement en mémoire."""
+    flux = io.TextIOWrapper(fichier.file, encoding='utf-8-sig', newline='')
+    try:
+        return importer_presences(flux, format_depuis_nom(fichier.name), taille_lot)
+    finally:
+        flux.detach()
+
+
+# --- Pointage en libre-service ---
+
+class EmployeInconnu(Exception):
+    """Aucun employé ne correspond à l'identifiant qui pointe."""
+
+
+# {date: id de la JourneeTravail}, limité à la journée en cours.
+_journee_du_jour = {}
+
+
+def journee_du_jour_id(date=None):
+    """Renvoie l'id de la JourneeTravail du jour, créée au premier pointage puis mise en cache."""
+    date = date or timezone.localdate()
+    journee_id = _journee_du_jour.get(date)
+    if journee_id is None:
+        journee_id = JourneeTravail.objects.get_or_create(date_journee=date)[0].pk
+        _journee_du_jour.clear()
+        _journee_du_jour[date] = journee_id
+    return journee_id
+
+
+def _oublier_journee_perimee(journee_id):
+    """
+    Vide le cache si la journée `journee_id` n'existe plus (supprimée ou
+    recréée par le RH) ; renvoie True dans ce cas.
+    """
+    if JourneeTravail.objects.filter(pk=journee_id).exists():
+        return False
+    _journee_du_jour.clear()
+    return True
+
+
+def _maintenant():
+    return timezone.localtime().time().replace(microsecond=0)
+
+
+def pointer_arrivee(employe_id, heure=None):
+    """
+    Enregistre l'arrivée du jour par un INSERT direct et renvoie l'heure
+    d'arrivée enregistrée.
+
+    Un second pointage d'arrivée le même jour est sans effet : c'est la
+    première arrivée qui fait foi, et c'est elle qui est renvoyée. Lève
+    EmployeInconnu si `employe_id` ne correspond à aucun employé. Si la
+    journée en cache a disparu, le pointage est refait une fois sur celle du
+    jour.
+    """
+    heure = heure or _maintenant()
+    for nouvel_essai in (True, False):
+        journee_id = journee_du_jour_id()
+        try:
+            with transaction.atomic():
+                Presence.objects.create(employe_id=employe_id, journee_id=journee_id, heure_arrivee=heure)
+            return heure
+        except IntegrityError:
+            arrivee = Presence.objects.filter(employe_id=employe_id, journee_id=journee_id).values_list(
+                'heure_arrivee', flat=True,
+            ).first()
+            if arrivee is not None:
+                return arrivee
+            if not Employe.objects.filter(pk=employe_id).exists():
+                raise EmployeInconnu(employe_id)
+            if not (nouvel_essai and _oublier_journee_perimee(journee_id)):
+                raise
+
+
+def pointer_depart(employe_id, heure=None):
+    """
+    Enregistre le départ du jour.
+
+    Renvoie None si aucune arrivée n'a été pointée aujourd'hui. Un nouveau
+    pointage de départ remplace le précédent.
+    """
+    heure = heure or _maintenant()
+    for nouvel_essai in (True, False):
+        journee_id = journee_du_jour_id()
+        with transaction.atomic():
+            presence = Presence.objects.filter(
+                employe_id=employe_id, journee_id=journee_id,
+            ).only('employe_id', 'journee_id', 'heure_arrivee', 'heure_depart').first()
+            if presence is not None:
+                presence.heure_depart = heure
+                presence.save(update_fields=['heure_depart'])
+                return heure
+        if not (nouvel_essai and _oublier_journee_perimee(journee_id)):
+            return None
@@ -0,0 +1,280 @@
+"""
+Recherche plein texte dans les annonces (titre et contenu).
+
+Index inversé dans MotAnnonce : une ligne par mot normalisé (minuscules,
+sans accents, hors mots vides) et par annonce, avec l'impact du mot dans
+l'annonce, sa part du score BM25 calculée à l'indexation : fréquence du mot
+(les mots du titre comptent POIDS_TITRE fois), saturée et rapportée à la
+longueur de l'annonce. Le score d'une annonce est la somme, sur les termes
+de la requête, de idf(terme) × impact.
+
+Tous les termes doivent être présents ; un terme terminé par * est un
+préfixe (« format* »). Aucune recherche ne parcourt les textes : chaque
+terme est une lecture de l'index (mot = 'x', ou plage mot >= 'x' AND
+mot < 'x\\uffff' pour un préfixe). Le terme le plus rare mène : ses
+PLAFOND_CANDIDATS meilleures annonces (dans l'ordre de l'index mot, impact)
+qui contiennent aussi les autres termes (sous-requêtes sur l'index) sont
+classées par score exact. Pour un seul terme, le classement est exact ; pour
+plusieurs, une annonce où le terme rare pèse peu peut manquer quand il a
+plus de candidats que le plafond.
+
+Le nombre d'annonces de chaque mot (FrequenceMotAnnonce, pour l'idf) est
+tenu à jour avec l'index : la rareté d'un terme courant se lit en une ligne
+au lieu d'un comptage. L'index suit les enregistrements d'Annonce par
+signaux. Les nombres lus sont gardés quelques secondes dans un cache LRU du
+processus.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .annuaire import CacheLRU, normaliser
+from .exports import paquets
+from .models import Annonce, FrequenceMotAnnonce, MotAnnonce
+
+MOTS_VIDES = frozenset((
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'cette', 'dans', 'de', 'des', 'du', 'elle', 'en', 'est', 'et',
+    'il', 'ils', 'la', 'le', 'les', 'leur', 'leurs', 'ne', 'nous', 'on', 'ou', 'par', 'pas', 'plus', 'pour',
+    'qu', 'que', 'qui', 'sa', 'se', 'ses', 'son', 'sont', 'sur', 'un', 'une', 'vos', 'votre', 'vous',
+    'l', 'd', 'j', 'n', 's', 'c', 'y',
+))
+POIDS_TITRE = 3
+# Paramètres BM25 ; la longueur de référence est fixe pour que l'impact d'un mot ne dépende que de son annonce.
+K1 = 1.2
+B = 0.75
+LONGUEUR_REFERENCE = 80
+PLAFOND_CANDIDATS = 1000
+LIMITE_PAR_DEFAUT = 20
+MOTS_EXTRAIT = 30
+TAILLE_LOT_INDEXATION = 2000
+
+_MOTS = re.compile(r'[a-z0-9]+')
+_MOTS_TEXTE = re.compile(r'\w+')
+
+
+@dataclass(frozen=True)
+class Terme:
+    mot: str
+    prefixe: bool = False
+
+    def correspond(self, mot):
+        return mot.startswith(self.mot) if self.prefixe else mot == self.mot
+
+    def condition(self):
+        if self.prefixe:
+            return {'mot__gte': self.mot, 'mot__lt': self.mot + '\uffff'}
+        return {'mot': self.mot}
+
+
+def mots_texte(texte):
+    return [mot for mot in _MOTS.findall(normaliser(texte)) if mot not in MOTS_VIDES]
+
+
+def impacts(titre, contenu):
+    """{mot: impact} d'une annonce."""
+    mots_titre, mots_contenu = mots_texte(titre), mots_texte(contenu)
+    frequences = {}
+    for mot in mots_contenu:
+        frequences[mot] = frequences.get(mot, 0) + 1
+    for mot in mots_titre:
+        frequences[mot] = frequences.get(mot, 0) + POIDS_TITRE
+    normalisation = K1 * (1 - B + B * (len(mots_titre) + len(mots_contenu)) / LONGUEUR_REFERENCE)
+    return {
+        mot[:100]: round(frequence * (K1 + 1) / (frequence + normalisation), 6)
+        for mot, frequence in frequences.items()
+    }
+
+
+def termes_requete(requete):
+    """Termes distincts de la requête, mots vides exclus ; « mot* » est un préfixe."""
+    termes = []
+    for brut in requete.split():
+        ajoute = False
+        for mot in _MOTS.findall(normaliser(brut)):
+            ajoute = mot not in MOTS_VIDES and all(terme.mot != mot for terme in termes)
+            if ajoute:
+                termes.append(Terme(mot))
+        # L'étoile ne porte que sur le dernier mot du jeton, s'il vient d'ajouter un terme :
+        # « paie le* » ne fait pas de « paie » un préfixe.
+        if brut.endswith('*') and ajoute and len(termes[-1].mot) >= 2:
+            termes[-1] = Terme(termes[-1].mot, prefixe=True)
+    return termes
+
+
+# --- Maintenance de l'index ---
+
+def indexer_annonces(annonce_ids):
+    """
+    Met l'index à jour pour les annonces données : seuls les mots ajoutés,
+    disparus ou dont l'impact a changé sont écrits. Renvoie le nombre de
+    mots ajoutés.
+    """
+    ajoutes = 0
+    for lot in paquets(annonce_ids, TAILLE_LOT_INDEXATION):
+        attendus = {
+            (annonce_id, mot): impact
+            for annonce_id, titre, contenu in Annonce.objects.filter(pk__in=lot).values_list('pk', 'titre', 'contenu')
+            for mot, impact in impacts(titre, contenu).items()
+        }
+        existants = {
+            (annonce_id, mot): (pk, impact)
+            for pk, annonce_id, mot, impact
+            in MotAnnonce.objects.filter(annonce_id__in=lot).values_list('pk', 'annonce_id', 'mot', 'impact')
+        }
+        obsoletes = [pk for cle, (pk, _) in existants.items() if cle not in attendus]
+        modifies = [
+            MotAnnonce(pk=pk, impact=attendus[cle]) for cle, (pk, impact) in existants.items()
+            if cle in attendus and attendus[cle] != impact
+        ]
+        nouveaux = [
+            MotAnnonce(annonce_id=annonce_id, mot=mot, impact=impact)
+            for (annonce_id, mot), impact in attendus.items() if (annonce_id, mot) not in existants
+        ]
+        variations = Counter(mot for _, mot in attendus.keys() - existants.keys())
+        variations.subtract(mot for _, mot in existants.keys() - attendus.keys())
+        with transaction.atomic():
+            for paquet in paquets(obsoletes, 500):
+                MotAnnonce.objects.filter(pk__in=paquet).delete()
+            MotAnnonce.objects.bulk_update(modifies, ['impact'], batch_size=500)
+            MotAnnonce.objects.bulk_create(nouveaux, batch_size=TAILLE_LOT_INDEXATION, ignore_conflicts=True)
+            ajuster_frequences(variations)
+        ajoutes += len(nouveaux)
+    cache_frequences.vider()
+    return ajoutes
+
+
+def desindexer_annonce(annonce_id):
+    """Retire les mots d'une annonce sur le point d'être supprimée du nombre d'annonces par mot."""
+    ajuster_frequences(Counter({
+        mot: -1 for mot in MotAnnonce.objects.filter(annonce_id=annonce_id).values_list('mot', flat=True)
+    }))
+    cache_frequences.vider()
+
+
+def ajuster_frequences(variations):
+    """Applique des variations {mot: +n/-n} au nombre d'annonces de chaque mot."""
+    variations = {mot: variation for mot, variation in variations.items() if variation}
+    # Lignes créées à zéro puis incrémentées en base : deux indexations simultanées ne perdent rien.
+    FrequenceMotAnnonce.objects.bulk_create(
+        [FrequenceMotAnnonce(mot=mot) for mot in variations], batch_size=TAILLE_LOT_INDEXATION, ignore_conflicts=True,
+    )
+    par_variation = {}
+    for mot, variation in variations.items():
+        par_variation.setdefault(variation, []).append(mot)
+    for variation, mots in par_variation.items():
+        for paquet in paquets(mots, 500):
+            FrequenceMotAnnonce.objects.filter(mot__in=paquet).update(annonces=F('annonces') + variation)
+
+
+def reconstruire_index_annonces():
+    """Reconstruit entièrement l'index des annonces ; renvoie le nombre de mots indexés."""
+    MotAnnonce.objects.all().delete()
+    FrequenceMotAnnonce.objects.all().delete()
+    return indexer_annonces(Annonce.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000))
+
+
+# --- Recherche ---
+
+cache_frequences = CacheLRU(duree=10.0)
+
+
+def nombre_annonces():
+    total = cache_frequences.lire('total')
+    if total is None:
+        total = Annonce.objects.count()
+        cache_frequences.ecrire('total', total)
+    return total
+
+
+def idf(terme, total):
+    """Rareté du terme ; 0 s'il n'apparaît dans aucune annonce. Un préfixe cumule les annonces de ses mots."""
+    frequence = cache_frequences.lire(terme)
+    if frequence is None:
+        frequence = FrequenceMotAnnonce.objects.filter(**terme.condition()).aggregate(n=Sum('annonces'))['n'] or 0
+        cache_frequences.ecrire(terme, frequence)
+    if not frequence:
+        return 0.0
+    return math.log(1 + (total - frequence + 0.5) / (frequence + 0.5))
+
+
+def surligner(texte, termes, mots_max=None):
+    """
+    Texte échappé où les mots correspondant aux termes sont entourés de
+    <mark> ; avec `mots_max`, extrait de cette longueur autour de la première
+    correspondance.
+    """
+    mots = list(_MOTS_TEXTE.finditer(texte))
+    correspondances = {}
+    trouves = []
+    for mot in mots:
+        if mot[0] not in correspondances:
+            normalise = normaliser(mot[0])
+            correspondances[mot[0]] = any(terme.correspond(normalise) for terme in termes)
+        trouves.append(correspondances[mot[0]])
+    debut, fin = 0, len(mots)
+    if mots_max is not None and len(mots) > mots_max:
+        premier = trouves.index(True) if any(trouves) else 0
+        debut = max(0, min(premier - mots_max // 3, len(mots) - mots_max))
+        fin = debut + mots_max
+    position = mots[debut].start() if debut else 0
+    limite = mots[fin - 1].end() if fin < len(mots) else len(texte)
+    # Le texte entre deux correspondances est échappé d'un seul tenant.
+    parties = ['… '] if debut else []
+    for i in range(debut, fin):
+        if trouves[i]:
+            parties.append(escape(texte[position:mots[i].start()]))
+            parties.append(f'<mark>{escape(mots[i][0])}</mark>')
+            position = mots[i].end()
+    parties.append(escape(texte[position:limite]))
+    if fin < len(mots):
+        parties.append(' …')
+    return mark_safe(''.join(parties))
+
+
+def rechercher_annonces(requete, limite=LIMITE_PAR_DEFAUT, decalage=0):
+    """
+    Annonces correspondant à `requete`, de la plus pertinente à la moins
+    pertinente ; chacune porte `pertinence`, `titre_surligne` et `extrait`.
+    """
+    termes = termes_requete(requete)
+    if not termes:
+        return []
+    total = nombre_annonces()
+    poids = {terme: idf(terme, total) for terme in termes}
+    if not all(poids.values()):
+        return []
+    principal, *autres = sorted(termes, key=lambda terme: -poids[terme])
+    # Impact de chaque autre terme dans l'annonce candidate (le meilleur pour un préfixe), NULL s'il est absent.
+    colonnes = {
+        f'impact_{i}': Subquery(
+            MotAnnonce.objects.filter(annonce_id=OuterRef('annonce_id'), **terme.condition())
+            .order_by('-impact').values('impact')[:1]
+        )
+        for i, terme in enumerate(autres)
+    }
+    candidats = MotAnnonce.objects.filter(**principal.condition()).annotate(**colonnes).filter(
+        **{f'{colonne}__isnull': False for colonne in colonnes},
+    )
+    scores = {}
+    for annonce_id, impact, *impacts_autres in candidats.order_by('-impact').values_list(
+        'annonce_id', 'impact', *colonnes,
+    )[:PLAFOND_CANDIDATS]:
+        score = poids[principal] * impact + sum(poids[terme] * x for terme, x in zip(autres, impacts_autres))
+        # Un préfixe peut correspondre à plusieurs mots d'une annonce : le meilleur compte.
+        scores[annonce_id] = max(scores.get(annonce_id, 0.0), score)
+    classement = sorted(scores, key=lambda annonce_id: (-scores[annonce_id], -annonce_id))[decalage:decalage + limite]
+    annonces = Annonce.objects.select_related('auteur').in_bulk(classement)
+    resultats = []
+    for annonce_id in classement:
+        annonce = annonces[annonce_id]
+        annonce.pertinence = scores[annonce_id]
+        annonce.titre_surligne = surligner(annonce.titre, termes)
+        annonce.extrait = surligner(annonce.contenu, termes, MOTS_EXTRAIT)
+        resultats.append(annonce)
+    return resultats
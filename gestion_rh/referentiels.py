@@ -0,0 +1,111 @@
+"""
+Référentiels des départements et des postes.
+
+Les libellés saisis librement (« Informatique », « informatique  »,
+« Infomatique »...) sont ramenés à une clé normalisée (minuscules, sans
+accents ni espaces superflus), éventuellement rapprochée des clés voisines
+à une faute près, puis regroupés sous la variante la plus fréquente. Les
+affectations sont ensuite réécrites par un UPDATE par groupe, jamais ligne
+à ligne.
+
+La reprise des anciennes colonnes texte Employe.service / Employe.poste est
+la migration 0003_reprise_libelles, qui se sert de regrouper() et de
+resoudre() avec les modèles historiques : ces deux fonctions ne doivent
+dépendre que du modèle qu'on leur passe.
+"""
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .annuaire import distance_edition, normaliser
+from .models import Departement, Employe, Poste
+from .tableau_de_bord import marquer_depuis
+
+# (modèle, champ libellé, clé étrangère sur Employe)
+REFERENTIELS = (
+    (Departement, 'nom', 'departement'),
+    (Poste, 'intitule', 'poste'),
+)
+LONGUEUR_MIN_APPROCHEE = 5
+
+
+def cle_libelle(libelle):
+    return re.sub(r'\s+', ' ', normaliser(libelle)).strip()
+
+
+def regrouper(comptes, approche=False):
+    """
+    Associe chaque libellé de `comptes` ({libellé: occurrences}) à son libellé
+    canonique : la variante la plus fréquente de sa clé normalisée. Avec
+    `approche`, une clé à une faute d'une clé plus fréquente lui est rattachée.
+    """
+    par_cle = defaultdict(Counter)
+    for libelle, nombre in comptes.items():
+        if libelle and libelle.strip():
+            par_cle[cle_libelle(libelle)][libelle] += nombre
+    totaux = sorted(par_cle, key=lambda cle: (-sum(par_cle[cle].values()), cle))
+    rattachement = {}
+    retenues = []
+    for cle in totaux:
+        cible = cle
+        if approche and len(cle) >= LONGUEUR_MIN_APPROCHEE:
+            cible = next((r for r in retenues if distance_edition(cle, r) <= 1), cle)
+        if cible == cle:
+            retenues.append(cle)
+        rattachement[cle] = cible
+    canoniques = {cle: par_cle[cle].most_common(1)[0][0] for cle in retenues}
+    return {
+        libelle: canoniques[rattachement[cle_libelle(libelle)]]
+        for libelle in comptes if libelle and libelle.strip()
+    }
+
+
+def resoudre(modele, champ, libelles):
+    """
+    Renvoie {libellé: pk} pour `libelles`, en rapprochant chaque libellé des
+    lignes existantes par clé normalisée et en créant d'un coup celles qui manquent.
+    """
+    existants = {cle_libelle(valeur): pk for pk, valeur in modele.objects.values_list('pk', champ)}
+    manquants = {}
+    for libelle in libelles:
+        cle = cle_libelle(libelle)
+        if cle and cle not in existants:
+            manquants.setdefault(cle, libelle.strip())
+    if manquants:
+        modele.objects.bulk_create([modele(**{champ: v}) for v in manquants.values()], ignore_conflicts=True)
+        existants.update(
+            (cle_libelle(valeur), pk)
+            for pk, valeur in modele.objects.filter(**{f'{champ}__in': manquants.values()}).values_list('pk', champ)
+        )
+    return {libelle: existants[cle_libelle(libelle)] for libelle in libelles if cle_libelle(libelle)}
+
+
+def fusionner_doublons(modele, champ, cle_etrangere, approche=False):
+    """
+    Fusionne les lignes d'un référentiel dont les libellés se regroupent :
+    les employés sont réaffectés à la ligne canonique (un UPDATE par doublon)
+    puis les doublons sont supprimés. Renvoie le nombre de lignes supprimées.
+    """
+    lignes = list(modele.objects.annotate(effectif=Count('employes')).values_list('pk', champ, 'effectif'))
+    canoniques = regrouper({libelle: effectif + 1 for _, libelle, effectif in lignes}, approche)
+    pk_par_libelle = {libelle: pk for pk, libelle, _ in lignes}
+    doublons = {
+        pk: pk_par_libelle[canoniques[libelle]]
+        for pk, libelle, _ in lignes if pk_par_libelle[canoniques[libelle]] != pk
+    }
+    with transaction.atomic():
+        for doublon, garde in doublons.items():
+            Employe.objects.filter(**{cle_etrangere: doublon}).update(**{cle_etrangere: garde})
+        modele.objects.filter(pk__in=doublons).delete()
+        if doublons and modele is Departement:
+            marquer_depuis()
+    return len(doublons)
+
+
+def effectifs_par_departement():
+    """Départements avec leur effectif et leur masse salariale de base, par jointure sur la clé indexée."""
+    return Departement.objects.annotate(
+        effectif=Count('employes'), masse_salariale=Sum('employes__salaire_base'),
+    ).order_by('nom')
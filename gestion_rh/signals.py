@@ -0,0 +1,191 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .annonces import invalider_fil
+from .annuaire import cache_recherche, indexer_employes
+from .assiduite import changer_service_presences, etat_presence, repercuter_presences
+from .conges import appliquer_transitions, changer_service_absences, etat_conge
+from .formations import retirer_employe
+from .models import Annonce, Conge, Employe, FicheDePaie, Presence
+from .recherche_annonces import desindexer_annonce, indexer_annonces
+from .tableau_de_bord import marquer_depuis, marquer_periodes
+
+CHAMPS_ETAT_CONGE = ('employe_id', 'statut', 'date_debut', 'date_fin')
+CHAMPS_ETAT_PRESENCE = ('employe_id', 'journee_id', 'heure_arrivee', 'heure_depart')
+CHAMPS_AFFECTATION = ('departement_id', 'date_embauche')
+
+
+# --- Soldes de congés et absences par service ---
+# L'état « validé » d'un congé est mémorisé au chargement, ce qui permet de
+# calculer la variation à l'enregistrement sans relire la base.
+
+@receiver(post_init, sender=Conge)
+def memoriser_etat_conge(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._etat_valide = None
+    elif all(champ in instance.__dict__ for champ in CHAMPS_ETAT_CONGE):
+        instance._etat_valide = etat_conge(instance)
+
+
+@receiver(pre_save, sender=Conge)
+def relire_etat_conge(sender, instance, **kwargs):
+    # Instance chargée partiellement (only/defer) : on relit l'état en base.
+    if not hasattr(instance, '_etat_valide'):
+        ancien = Conge.objects.filter(pk=instance.pk).only(*CHAMPS_ETAT_CONGE).first()
+        instance._etat_valide = etat_conge(ancien) if ancien else None
+
+
+@receiver(post_save, sender=Conge)
+def repercuter_conge(sender, instance, **kwargs):
+    nouvel_etat = etat_conge(instance)
+    appliquer_transitions([(instance._etat_valide, nouvel_etat)])
+    instance._etat_valide = nouvel_etat
+
+
+@receiver(post_delete, sender=Conge)
+def retirer_conge(sender, instance, **kwargs):
+    if hasattr(instance, '_etat_valide'):
+        appliquer_transitions([(instance._etat_valide, None)])
+
+
+# --- Agrégats de présence ---
+# Même principe : l'état du pointage au chargement sert à calculer la variation.
+
+@receiver(post_init, sender=Presence)
+def memoriser_etat_presence(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._etat_agregats = None
+    elif all(champ in instance.__dict__ for champ in CHAMPS_ETAT_PRESENCE):
+        instance._etat_agregats = etat_presence(instance)
+
+
+@receiver(pre_save, sender=Presence)
+def relire_etat_presence(sender, instance, **kwargs):
+    if not hasattr(instance, '_etat_agregats'):
+        ancienne = Presence.objects.filter(pk=instance.pk).only(*CHAMPS_ETAT_PRESENCE).first()
+        instance._etat_agregats = etat_presence(ancienne) if ancienne else None
+
+
+@receiver(post_save, sender=Presence)
+def repercuter_presence(sender, instance, **kwargs):
+    nouvel_etat = etat_presence(instance)
+    repercuter_presences([(instance._etat_agregats, nouvel_etat)])
+    instance._etat_agregats = nouvel_etat
+
+
+@receiver(post_delete, sender=Presence)
+def retirer_presence(sender, instance, **kwargs):
+    if hasattr(instance, '_etat_agregats'):
+        repercuter_presences([(instance._etat_agregats, None)])
+
+
+# --- Changement de service ---
+# Absences et présences par service sont rangées sous le service actuel de
+# l'employé : à chaque changement, tout son historique passe à son nouveau
+# service. Sans cela, modifier plus tard un ancien congé ou pointage
+# décompterait du nouveau service ce qui avait été compté dans l'ancien.
+# L'affectation d'origine est mémorisée au chargement (memoriser_affectation) ;
+# ce receveur est enregistré avant marquer_effectifs, qui la renouvelle.
+
+@receiver(pre_save, sender=Employe)
+def relire_affectation(sender, instance, **kwargs):
+    if not hasattr(instance, '_affectation') and not instance._state.adding:
+        instance._affectation = Employe.objects.filter(pk=instance.pk).values_list(
+            'departement_id', 'date_embauche',
+        ).first()
+
+
+@receiver(post_save, sender=Employe)
+def deplacer_agregats_service(sender, instance, created, **kwargs):
+    ancienne = getattr(instance, '_affectation', None)
+    if not created and ancienne and ancienne[0] != instance.departement_id:
+        with transaction.atomic():
+            changer_service_absences(instance.pk, ancienne[0], instance.departement_id)
+            changer_service_presences(instance.pk, ancienne[0], instance.departement_id)
+
+
+# --- Index de recherche de l'annuaire ---
+# Les mots de l'employé supprimé partent en cascade ; il reste à vider le cache.
+
+@receiver(post_save, sender=Employe)
+def indexer_employe(sender, instance, **kwargs):
+    indexer_employes([instance.pk])
+
+
+@receiver(post_delete, sender=Employe)
+def desindexer_employe(sender, instance, **kwargs):
+    cache_recherche.vider()
+
+
+# --- Places en formation ---
+# Les participations d'un employé supprimé partent en cascade : ses places
+# sont libérées avant, pour les listes d'attente et le compteur places_prises.
+
+@receiver(pre_delete, sender=Employe)
+def liberer_places_formation(sender, instance, **kwargs):
+    retirer_employe(instance.pk)
+
+
+# --- Fil des annonces ---
+# Toute annonce créée, modifiée ou supprimée rend caduques les pages en cache.
+
+@receiver(post_save, sender=Annonce)
+@receiver(post_delete, sender=Annonce)
+def invalider_fil_annonces(sender, instance, **kwargs):
+    transaction.on_commit(invalider_fil)
+
+
+# --- Recherche dans les annonces ---
+# Les mots d'une annonce supprimée partent en cascade ; leur nombre d'annonces
+# est décompté avant, tant qu'ils sont encore en base.
+
+@receiver(post_save, sender=Annonce)
+def indexer_annonce(sender, instance, **kwargs):
+    indexer_annonces([instance.pk])
+
+
+@receiver(pre_delete, sender=Annonce)
+def retirer_annonce_de_l_index(sender, instance, **kwargs):
+    desindexer_annonce(instance.pk)
+
+
+# --- Synthèses du tableau de bord ---
+# Congés et pointages marquent leurs mois dans appliquer_transitions et
+# repercuter_presences ; restent les fiches de paie saisies à la main et les
+# affectations des employés, dont dépendent les effectifs de chaque mois.
+
+@receiver(pre_save, sender=FicheDePaie)
+def marquer_ancienne_periode_fiche(sender, instance, **kwargs):
+    if instance.pk is not None:
+        ancienne = FicheDePaie.objects.filter(pk=instance.pk).values_list('annee', 'mois').first()
+        if ancienne and ancienne != (instance.annee, instance.mois):
+            marquer_periodes([ancienne])
+
+
+@receiver(post_save, sender=FicheDePaie)
+@receiver(post_delete, sender=FicheDePaie)
+def marquer_periode_fiche(sender, instance, **kwargs):
+    marquer_periodes([(instance.annee, instance.mois)])
+
+
+@receiver(post_init, sender=Employe)
+def memoriser_affectation(sender, instance, **kwargs):
+    if all(champ in instance.__dict__ for champ in CHAMPS_AFFECTATION):
+        instance._affectation = (instance.departement_id, instance.date_embauche)
+
+
+@receiver(post_save, sender=Employe)
+def marquer_effectifs(sender, instance, created, **kwargs):
+    affectation = (instance.departement_id, instance.date_embauche)
+    ancienne = getattr(instance, '_affectation', None)
+    if created or ancienne != affectation:
+        # Les effectifs changent depuis la plus ancienne des deux dates d'embauche.
+        dates = [instance.date_embauche] + ([ancienne[1]] if ancienne and not created else [])
+        marquer_depuis(min(dates))
+    instance._affectation = affectation
+
+
+@receiver(post_delete, sender=Employe)
+def retirer_effectif(sender, instance, **kwargs):
+    marquer_depuis(instance.date_embauche)
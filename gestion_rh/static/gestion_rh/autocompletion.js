@@ -0,0 +1,95 @@
+// Saisie semi-automatique des listes déroulantes <select data-autocompletion="url">.
+// Le select ne contient que l'option choisie : un champ de recherche le remplace
+// à l'écran et les choix sont demandés au serveur, page par page, à la saisie.
+// Les événements sont délégués au document, et les formulaires chargés en
+// AJAX sont préparés dès leur arrivée.
+$(function () {
+    const DELAI_SAISIE = 250;
+
+    const initialiser = function (select) {
+        if (select.data("autocompletion-pret")) {
+            return select.data("autocompletion-pret");
+        }
+        const recherche = $('<input type="search" class="form-control" autocomplete="off">')
+            .attr("placeholder", "Rechercher…")
+            .val(select.find("option:selected").val() ? select.find("option:selected").text() : "");
+        const liste = $('<div class="list-group position-absolute w-100 shadow" style="z-index: 1050"></div>').hide();
+        const bloc = $('<div class="position-relative"></div>').append(recherche, liste);
+        select.addClass("d-none").after(bloc);
+        const etat = {select: select, recherche: recherche, liste: liste, page: 1, minuterie: null, requete: null};
+        select.data("autocompletion-pret", etat);
+        recherche.data("autocompletion", etat);
+        return etat;
+    };
+
+    const charger = function (etat, page) {
+        if (etat.requete) {
+            etat.requete.abort();
+        }
+        etat.page = page;
+        etat.requete = $.getJSON(etat.select.data("autocompletion"), {q: etat.recherche.val(), page: page}, function (data) {
+            if (page === 1) {
+                etat.liste.empty();
+            }
+            etat.liste.find(".js-autocompletion-plus").remove();
+            $.each(data.resultats, function (_, choix) {
+                $('<button type="button" class="list-group-item list-group-item-action js-autocompletion-choix"></button>')
+                    .text(choix.texte).attr("data-id", choix.id).appendTo(etat.liste);
+            });
+            if (data.plus) {
+                $('<button type="button" class="list-group-item list-group-item-light js-autocompletion-plus">Plus de résultats…</button>')
+                    .appendTo(etat.liste);
+            }
+            if (!etat.liste.children().length) {
+                $('<div class="list-group-item text-muted">Aucun résultat</div>').appendTo(etat.liste);
+            }
+            etat.liste.show();
+        });
+    };
+
+    const initialiserTout = function (conteneur) {
+        $(conteneur).find("select[data-autocompletion]").each(function () {
+            initialiser($(this));
+        });
+    };
+
+    initialiserTout(document);
+    // Formulaires chargés en AJAX (modale générique, voir employe_list.html) ; les champs déjà prêts sont sautés.
+    $(document).ajaxComplete(function () {
+        initialiserTout(document);
+    });
+
+    $(document).on("input focus", "input[type=search]", function () {
+        const etat = $(this).data("autocompletion");
+        if (!etat) {
+            return;
+        }
+        clearTimeout(etat.minuterie);
+        etat.minuterie = setTimeout(function () { charger(etat, 1); }, DELAI_SAISIE);
+    });
+
+    $(document).on("mousedown", ".js-autocompletion-choix, .js-autocompletion-plus", function (e) {
+        // mousedown : le choix est pris avant que le champ ne perde le focus.
+        e.preventDefault();
+        const etat = $(this).closest(".position-relative").find("input[type=search]").data("autocompletion");
+        if ($(this).hasClass("js-autocompletion-plus")) {
+            charger(etat, etat.page + 1);
+            return;
+        }
+        const option = $("<option selected></option>").val($(this).data("id")).text($(this).text());
+        etat.select.find("option[value!='']").remove();
+        etat.select.append(option).trigger("change");
+        etat.recherche.val($(this).text());
+        etat.liste.hide();
+    });
+
+    $(document).on("blur", "input[type=search]", function () {
+        const etat = $(this).data("autocompletion");
+        if (etat) {
+            etat.liste.hide();
+            if (!etat.recherche.val()) {
+                etat.select.val("").trigger("change");
+            }
+        }
+    });
+});
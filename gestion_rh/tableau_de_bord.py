@@ -0,0 +1,340 @@
+"""
+Tableau de bord RH : effectifs par département, masse salariale par mois,
+utilisation des congés et absentéisme.
+
+Rien n'est calculé sur les tables sources à l'affichage : les indicateurs
+sont lus dans SyntheseMensuelle (une ligne par département et par mois),
+recalculée à partir des compteurs déjà matérialisés (AbsenceServiceJour,
+PresenceServiceJour), des embauches et des fiches de paie du mois (relues
+dans leur archive annuelle pour une année archivée). Une page lit au plus nb_mois x départements lignes, quel que soit l'historique.
+
+Recalcul incrémental : tout changement d'une donnée source (congé validé,
+pointage, fiche de paie, affectation d'un employé) marque son mois dans
+PeriodeSynthese, et rafraichir_syntheses() ne recalcule que les mois
+marqués. La commande rafraichir_tableau_de_bord le fait chaque nuit ; la
+tâche de même nom le fait en journée, planifiée par les workers dès que des
+mois sont marqués. L'affichage du tableau de bord n'écrit jamais en base :
+c'est aussi la commande, la tâche ou le worker qui ouvre le mois courant.
+
+Les sections de la page sont gardées dans le cache Django sous des clés
+versionnées : un recalcul ou un nouveau marquage incrémente la version, ce
+qui invalide tous les fragments d'un coup. Le cache doit être partagé entre
+les processus web et les workers (voir CACHES dans les settings).
+"""
+import calendar
+import datetime
+import time
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .archives_paie import sommes_par_departement
+from .exports import paquets
+from .models import (
+    AbsenceServiceJour, ArchivePaie, Employe, FicheDePaie, PeriodeSynthese, PresenceServiceJour, SoldeConge,
+    SyntheseMensuelle,
+)
+
+CLE_VERSION = 'tableau_de_bord:version'
+# Durée de vie des fragments ; en pratique ils sont invalidés bien avant.
+DUREE_FRAGMENTS = 6 * 3600
+NB_MOIS_PAR_DEFAUT = 12
+NB_MOIS_MAX = 36
+# Mois recalculés par transaction.
+TAILLE_LOT_PERIODES = 24
+
+
+# --- Périodes (annee, mois) ---
+
+def periodes_entre(date_debut, date_fin):
+    """Mois couverts par l'intervalle, bornes incluses."""
+    annee, mois = date_debut.year, date_debut.month
+    while (annee, mois) <= (date_fin.year, date_fin.month):
+        yield annee, mois
+        annee, mois = (annee + 1, 1) if mois == 12 else (annee, mois + 1)
+
+
+def derniers_mois(nb_mois, annee, mois):
+    """Les `nb_mois` mois finissant en (annee, mois), du plus ancien au plus récent."""
+    periodes = []
+    for _ in range(nb_mois):
+        periodes.append((annee, mois))
+        annee, mois = (annee - 1, 12) if mois == 1 else (annee, mois - 1)
+    return periodes[::-1]
+
+
+def bornes(annee, mois):
+    return datetime.date(annee, mois, 1), datetime.date(annee, mois, calendar.monthrange(annee, mois)[1])
+
+
+def jours_ouvres(annee, mois, jusqu_au=None):
+    """Jours du lundi au vendredi du mois, arrêtés à `jusqu_au` s'il tombe dans le mois."""
+    debut, fin = bornes(annee, mois)
+    if jusqu_au is not None:
+        fin = min(fin, jusqu_au)
+    return sum(1 for n in range((fin - debut).days + 1) if (debut + datetime.timedelta(days=n)).weekday() < 5)
+
+
+def _filtre_periodes(periodes):
+    return reduce(or_, (Q(annee=annee, mois=mois) for annee, mois in periodes))
+
+
+# --- Marquage des mois à recalculer ---
+
+def marquer_periodes(periodes):
+    """
+    Marque des mois à recalculer. Un mois déjà marqué ne coûte qu'une
+    lecture, ce qui rend l'appel supportable à chaque pointage.
+    """
+    periodes = set(periodes)
+    if not periodes:
+        return
+    etats = dict(
+        ((annee, mois), a_recalculer) for annee, mois, a_recalculer
+        in PeriodeSynthese.objects.filter(_filtre_periodes(periodes)).values_list('annee', 'mois', 'a_recalculer')
+    )
+    manquantes = periodes - etats.keys()
+    a_marquer = [p for p, a_recalculer in etats.items() if not a_recalculer]
+    if manquantes:
+        PeriodeSynthese.objects.bulk_create(
+            [PeriodeSynthese(annee=annee, mois=mois) for annee, mois in manquantes], ignore_conflicts=True,
+        )
+    if a_marquer:
+        PeriodeSynthese.objects.filter(_filtre_periodes(a_marquer)).update(a_recalculer=True)
+    if manquantes or a_marquer:
+        transaction.on_commit(invalider_fragments)
+
+
+def marquer_depuis(date=None):
+    """
+    Marque tous les mois connus à partir de celui de `date` (tous sans date),
+    ainsi que le mois courant : c'est le cas d'une embauche ou d'un changement
+    de département, qui modifie les effectifs de chaque mois suivant.
+    """
+    mois_suivants = PeriodeSynthese.objects.filter(a_recalculer=False)
+    if date is not None:
+        mois_suivants = mois_suivants.filter(Q(annee__gt=date.year) | Q(annee=date.year, mois__gte=date.month))
+    if mois_suivants.update(a_recalculer=True):
+        transaction.on_commit(invalider_fragments)
+    aujourd_hui = timezone.localdate()
+    marquer_periodes([(aujourd_hui.year, aujourd_hui.month)])
+
+
+def ouvrir_mois_courant():
+    """Ajoute le mois courant aux périodes (à calculer) s'il n'y figure pas encore."""
+    aujourd_hui = timezone.localdate()
+    if not PeriodeSynthese.objects.filter(annee=aujourd_hui.year, mois=aujourd_hui.month).exists():
+        marquer_periodes([(aujourd_hui.year, aujourd_hui.month)])
+
+
+# --- Recalcul des synthèses ---
+
+def toutes_les_periodes():
+    """Mois depuis la plus ancienne donnée source (fiche, congé ou pointage) jusqu'au mois courant."""
+    aujourd_hui = timezone.localdate()
+    debuts = [
+        AbsenceServiceJour.objects.order_by('date').values_list('date', flat=True).first(),
+        PresenceServiceJour.objects.order_by('date').values_list('date', flat=True).first(),
+    ]
+    fiche = FicheDePaie.objects.order_by('annee', 'mois').values_list('annee', 'mois').first()
+    if fiche:
+        debuts.append(datetime.date(fiche[0], fiche[1], 1))
+    archive = ArchivePaie.objects.order_by('annee').values_list('annee', 'index_mois').first()
+    if archive:
+        debuts.append(datetime.date(archive[0], min(int(mois) for mois in archive[1]), 1))
+    debut = min((d for d in debuts if d), default=aujourd_hui)
+    return list(periodes_entre(min(debut, aujourd_hui), aujourd_hui))
+
+
+def _effectifs(periodes):
+    """{(departement_id, annee, mois): employés embauchés à la fin du mois}, en une requête."""
+    embauches = defaultdict(list)
+    for ligne in Employe.objects.values(
+        'departement', annee=ExtractYear('date_embauche'), mois=ExtractMonth('date_embauche'),
+    ).annotate(nombre=Count('pk')).order_by():
+        embauches[ligne['departement']].append(((ligne['annee'], ligne['mois']), ligne['nombre']))
+    effectifs = {}
+    for departement_id, par_mois in embauches.items():
+        for periode in periodes:
+            effectif = sum(nombre for embauche, nombre in par_mois if embauche <= periode)
+            if effectif:
+                effectifs[(departement_id, *periode)] = effectif
+    return effectifs
+
+
+def calculer_syntheses(periodes):
+    """Construit (sans les écrire) les SyntheseMensuelle des mois donnés."""
+    lignes = defaultdict(dict)
+    for cle, effectif in _effectifs(periodes).items():
+        lignes[cle]['effectif'] = effectif
+    archivees = set(ArchivePaie.objects.values_list('annee', flat=True))
+    for annee, mois in periodes:
+        debut, fin = bornes(annee, mois)
+        if annee in archivees:
+            for departement_id, sommes in sommes_par_departement(annee, mois).items():
+                lignes[(departement_id, annee, mois)].update(sommes)
+        else:
+            for ligne in FicheDePaie.objects.filter(annee=annee, mois=mois).values('employe__departement').annotate(
+                nombre_fiches=Count('pk'), masse_brute=Sum('salaire_brut'), masse_nette=Sum('salaire_net'),
+            ).order_by():
+                lignes[(ligne.pop('employe__departement'), annee, mois)].update(ligne)
+        for ligne in AbsenceServiceJour.objects.filter(date__range=(debut, fin)).values('departement').annotate(
+            jours_conge=Sum('nombre'),
+        ).order_by():
+            lignes[(ligne.pop('departement'), annee, mois)].update(ligne)
+        for ligne in PresenceServiceJour.objects.filter(date__range=(debut, fin)).values('departement').annotate(
+            jours_presents=Sum('jours_presents'), secondes_travaillees=Sum('secondes_travaillees'),
+            retards=Sum('retards'),
+        ).order_by():
+            lignes[(ligne.pop('departement'), annee, mois)].update(ligne)
+    return [
+        SyntheseMensuelle(departement_id=departement_id, annee=annee, mois=mois, **champs)
+        for (departement_id, annee, mois), champs in lignes.items()
+    ]
+
+
+def rafraichir_syntheses(periodes=None):
+    """
+    Recalcule les synthèses des mois donnés, ou à défaut des mois marqués ;
+    renvoie la liste des mois recalculés.
+
+    Le marquage est levé avant la lecture des sources, dans sa propre
+    transaction : un changement validé pendant le calcul marque à nouveau
+    son mois au lieu d'être perdu.
+    """
+    if periodes is None:
+        periodes = list(PeriodeSynthese.objects.filter(a_recalculer=True).values_list('annee', 'mois'))
+    periodes = sorted(set(periodes))
+    for lot in paquets(periodes, TAILLE_LOT_PERIODES):
+        PeriodeSynthese.objects.bulk_create(
+            [PeriodeSynthese(annee=annee, mois=mois, a_recalculer=False) for annee, mois in lot],
+            ignore_conflicts=True,
+        )
+        PeriodeSynthese.objects.filter(_filtre_periodes(lot)).update(a_recalculer=False)
+        try:
+            syntheses = calculer_syntheses(lot)
+            with transaction.atomic():
+                SyntheseMensuelle.objects.filter(_filtre_periodes(lot)).delete()
+                SyntheseMensuelle.objects.bulk_create(syntheses, batch_size=1000)
+                PeriodeSynthese.objects.filter(_filtre_periodes(lot)).update(date_calcul=timezone.now())
+        except Exception:
+            marquer_periodes(lot)
+            raise
+    if periodes:
+        invalider_fragments()
+    return periodes
+
+
+# --- Fragments en cache ---
+
+def version_fragments():
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        # Clé perdue (cache vidé) : on repart d'une valeur jamais utilisée.
+        cache.add(CLE_VERSION, time.time_ns(), None)
+        version = cache.get(CLE_VERSION)
+    return version
+
+
+def invalider_fragments():
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:
+        cache.add(CLE_VERSION, time.time_ns(), None)
+
+
+def fragment(nom, calcul, *parametres):
+    """Résultat de calcul(*parametres), gardé en cache jusqu'à la prochaine invalidation."""
+    cle = ':'.join(['tableau_de_bord', str(version_fragments()), nom, *map(str, parametres)])
+    return cache.get_or_set(cle, lambda: calcul(*parametres), DUREE_FRAGMENTS)
+
+
+# --- Sections du tableau de bord ---
+
+def effectifs_par_service(annee, mois):
+    return [
+        {'service': ligne['departement__nom'], 'effectif': ligne['effectif']}
+        for ligne in SyntheseMensuelle.objects.filter(annee=annee, mois=mois, effectif__gt=0).values(
+            'departement__nom', 'effectif',
+        ).order_by('departement__nom')
+    ]
+
+
+def masse_salariale(annee, mois, nb_mois):
+    periodes = derniers_mois(nb_mois, annee, mois)
+    totaux = {
+        (ligne.pop('annee'), ligne.pop('mois')): ligne
+        for ligne in SyntheseMensuelle.objects.filter(_filtre_periodes(periodes)).values('annee', 'mois').annotate(
+            nombre_fiches=Sum('nombre_fiches'), masse_brute=Sum('masse_brute'), masse_nette=Sum('masse_nette'),
+        ).order_by()
+    }
+    vide = {'nombre_fiches': 0, 'masse_brute': 0, 'masse_nette': 0}
+    return [{'annee': a, 'mois': m, **totaux.get((a, m), vide)} for a, m in periodes]
+
+
+def utilisation_conges(annee, mois):
+    """Jours de congé pris depuis janvier rapportés aux droits de l'année, par département."""
+    services = {}
+    for ligne in SyntheseMensuelle.objects.filter(annee=annee, mois__lte=mois).values(
+        'departement__nom', 'effectif', 'jours_conge',
+    ).order_by('departement__nom', 'mois'):
+        service = services.setdefault(ligne['departement__nom'], {'jours_pris': 0})
+        service['jours_pris'] += ligne['jours_conge']
+        service['effectif'] = ligne['effectif']  # celui du dernier mois
+    resultats = []
+    for nom, service in services.items():
+        droits = service['effectif'] * SoldeConge.DROIT_ANNUEL
+        resultats.append({
+            'service': nom, 'jours_pris': service['jours_pris'], 'jours_acquis': droits,
+            'taux': round(100 * service['jours_pris'] / droits, 1) if droits else 0.0,
+        })
+    return resultats
+
+
+def absenteisme(annee, mois, nb_mois, jour):
+    """Par mois : part des jours ouvrés attendus sans pointage, et retards."""
+    periodes = derniers_mois(nb_mois, annee, mois)
+    totaux = {
+        (ligne.pop('annee'), ligne.pop('mois')): ligne
+        for ligne in SyntheseMensuelle.objects.filter(_filtre_periodes(periodes)).values('annee', 'mois').annotate(
+            effectif=Sum('effectif'), jours_presents=Sum('jours_presents'), retards=Sum('retards'),
+        ).order_by()
+    }
+    resultats = []
+    for a, m in periodes:
+        total = totaux.get((a, m), {'effectif': 0, 'jours_presents': 0, 'retards': 0})
+        attendus = total['effectif'] * jours_ouvres(a, m, jour)
+        resultats.append({
+            'annee': a, 'mois': m, 'retards': total['retards'], 'jours_attendus': attendus,
+            # Mois sans aucun pointage : pas de suivi des présences, pas de taux.
+            'taux': round(100 * max(0, attendus - total['jours_presents']) / attendus, 1)
+            if attendus and total['jours_presents'] else None,
+        })
+    return resultats
+
+
+def etat_syntheses():
+    """Nombre de mois en attente de recalcul et date du dernier recalcul."""
+    return PeriodeSynthese.objects.aggregate(
+        a_recalculer=Count('pk', filter=Q(a_recalculer=True)), date_calcul=Max('date_calcul'),
+    )
+
+
+def donnees_tableau_de_bord(nb_mois=NB_MOIS_PAR_DEFAUT):
+    """Contexte complet du tableau de bord, chaque section venant de son fragment en cache."""
+    aujourd_hui = timezone.localdate()
+    annee, mois = aujourd_hui.year, aujourd_hui.month
+    return {
+        'nb_mois': nb_mois,
+        'effectifs': fragment('effectifs', effectifs_par_service, annee, mois),
+        'masse_salariale': fragment('masse_salariale', masse_salariale, annee, mois, nb_mois),
+        'conges': fragment('conges', utilisation_conges, annee, mois),
+        'absenteisme': fragment('absenteisme', absenteisme, annee, mois, nb_mois, aujourd_hui),
+        'etat': fragment('etat', etat_syntheses),
+    }
@@ -0,0 +1,364 @@
+"""
+File de tâches de fond adossée à la base de données.
+
+Les traitements lourds (paie du mois, import de pointages, production des
+bulletins) sont enregistrés comme des lignes Tache par les vues, puis
+exécutés par un ou plusieurs processus `manage.py traiter_taches`. Aucun
+broker externe : la table Tache est la file, ce qui suffit à un serveur
+unique hors ligne.
+
+Réservation d'une tâche :
+- sur les bases qui le permettent (PostgreSQL, MySQL 8, Oracle), par
+  SELECT ... FOR UPDATE SKIP LOCKED : chaque worker saute les lignes déjà
+  verrouillées par un autre et ne se bloque jamais ;
+- sur SQLite, qui n'a pas de verrou de ligne, par un UPDATE conditionnel
+  (statut encore EN_ATTENTE) : les écritures y étant sérialisées, un seul
+  worker voit sa mise à jour aboutir, les autres passent au candidat suivant.
+
+Une tâche en échec est replanifiée avec un délai croissant jusqu'à
+`max_tentatives`. Pendant l'exécution, un fil du worker renouvelle le
+battement de la tâche toutes les INTERVALLE_BATTEMENT secondes, qu'elle
+remonte ou non sa progression ; une tâche EN_COURS dont le battement n'a pas
+été renouvelé depuis DELAI_ORPHELINE (worker arrêté, machine redémarrée) est
+remise en file.
+"""
+import datetime
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .bulletins import ProductionBulletins, donnees_bulletins, flux_archive, purger_cache
+from .integration import ecrire_rapport, integrer_employes
+from .models import Conge, Employe, FicheDePaie, PeriodeSynthese, Tache
+from .paie import lancer_paie
+from .pointage import importer_presences
+from .tableau_de_bord import ouvrir_mois_courant, rafraichir_syntheses, toutes_les_periodes
+
+# Délai avant la première nouvelle tentative, doublé à chaque échec.
+DELAI_REESSAI = datetime.timedelta(seconds=30)
+DELAI_ORPHELINE = datetime.timedelta(minutes=10)
+# Période du battement de vie d'une tâche en cours, bien en deçà de DELAI_ORPHELINE.
+INTERVALLE_BATTEMENT = 60
+# Intervalle minimal entre deux écritures de progression d'une même tâche.
+INTERVALLE_PROGRESSION = 1.0
+# Candidats examinés par tentative de réservation sans SKIP LOCKED.
+CANDIDATS_RESERVATION = 10
+
+# {type_tache: fonction(progression, **parametres) -> résultat sérialisable en JSON}
+REGISTRE = {}
+
+
+def tache(type_tache):
+    """Décorateur qui enregistre une fonction comme type de tâche."""
+    def enregistrer(fonction):
+        REGISTRE[type_tache] = fonction
+        return fonction
+    return enregistrer
+
+
+def dossier_taches():
+    """Dossier des fichiers reçus ou produits par les tâches."""
+    dossier = Path(getattr(settings, 'TACHES_DOSSIER', settings.BASE_DIR / 'cache' / 'taches'))
+    dossier.mkdir(parents=True, exist_ok=True)
+    return dossier
+
+
+def enregistrer_fichier(fichier):
+    """Copie un fichier téléversé dans le dossier des tâches, morceau par morceau ; renvoie son chemin."""
+    chemin = dossier_taches() / f"televerse_{uuid.uuid4().hex}{Path(fichier.name).suffix}"
+    with open(chemin, 'wb') as destination:
+        for morceau in fichier.chunks():
+            destination.write(morceau)
+    return chemin
+
+
+def nom_worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def planifier(type_tache, parametres=None, demandeur=None, max_tentatives=3):
+    """Ajoute une tâche à la file et la renvoie."""
+    if type_tache not in REGISTRE:
+        raise ValueError(f"Type de tâche inconnu : {type_tache}")
+    return Tache.objects.create(
+        type_tache=type_tache, parametres=parametres or {},
+        demandeur=demandeur, max_tentatives=max_tentatives,
+    )
+
+
+def tache_en_file(type_tache, parametres=None):
+    """Tâche de même type et mêmes paramètres qui attend ou est en cours, sinon None (lecture seule)."""
+    parametres = parametres or {}
+    for existante in Tache.objects.filter(type_tache=type_tache, statut__in=('EN_ATTENTE', 'EN_COURS')):
+        if existante.parametres == parametres:
+            return existante
+    return None
+
+
+def planifier_unique(type_tache, parametres=None, demandeur=None):
+    """
+    Planifie une tâche, sauf si une tâche de même type et mêmes paramètres
+    attend déjà ou est en cours : c'est alors celle-ci qui est renvoyée.
+    """
+    return tache_en_file(type_tache, parametres) or planifier(type_tache, parametres, demandeur)
+
+
+def planifier_actualisation_tableau_de_bord():
+    """
+    Ouvre le mois courant et planifie le recalcul des mois marqués s'il y en
+    a ; renvoie la tâche, ou None. Appelée périodiquement par les workers,
+    pour que l'affichage du tableau de bord n'écrive jamais en base.
+    """
+    ouvrir_mois_courant()
+    if not PeriodeSynthese.objects.filter(a_recalculer=True).exists():
+        return None
+    return planifier_unique('rafraichir_tableau_de_bord')
+
+
+def relancer(tache_id):
+    """Remet en file une tâche échouée, avec un nouveau crédit de tentatives. Renvoie True si c'est fait."""
+    return bool(Tache.objects.filter(pk=tache_id, statut='ECHOUEE').update(
+        statut='EN_ATTENTE', tentatives=0, executer_apres=timezone.now(), progression=0, message='',
+    ))
+
+
+class Progression:
+    """Remonte l'avancement d'une tâche ; chaque écriture vaut aussi battement de vie."""
+
+    def __init__(self, tache_id, worker):
+        self.tache_id = tache_id
+        self.worker = worker
+        self.derniere_ecriture = 0.0
+
+    def avancer(self, fait, total=None, message=''):
+        maintenant = time.monotonic()
+        termine = total is not None and fait >= total
+        if not termine and maintenant - self.derniere_ecriture < INTERVALLE_PROGRESSION:
+            return
+        self.derniere_ecriture = maintenant
+        champs = {'battement': timezone.now(), 'message': message[:255]}
+        if total:
+            champs['progression'] = min(100, fait * 100 // total)
+        Tache.objects.filter(pk=self.tache_id, worker=self.worker).update(**champs)
+
+    def reprise(self):
+        """État enregistré par une tentative précédente (voir enregistrer), {} au premier essai."""
+        return Tache.objects.filter(pk=self.tache_id).values_list('resultat', flat=True).first() or {}
+
+    def enregistrer(self, etat):
+        """
+        Enregistre aussitôt un état de reprise (dans `resultat`, remplacé par
+        le résultat final) : une tâche aux effets externes s'en sert pour ne
+        pas les refaire à la tentative suivante.
+        """
+        Tache.objects.filter(pk=self.tache_id, worker=self.worker).update(resultat=etat, battement=timezone.now())
+
+
+class Battement:
+    """
+    Fil qui renouvelle le battement d'une tâche tant qu'elle s'exécute, pour
+    qu'une tâche longue ou muette ne passe pas pour orpheline.
+    """
+
+    def __init__(self, tache_id, worker, intervalle=None):
+        self.tache_id = tache_id
+        self.worker = worker
+        self.intervalle = intervalle or INTERVALLE_BATTEMENT
+        self.arret = threading.Event()
+        self.fil = threading.Thread(target=self.battre, name=f"battement-{tache_id}", daemon=True)
+
+    def battre(self):
+        try:
+            while not self.arret.wait(self.intervalle):
+                try:
+                    Tache.objects.filter(pk=self.tache_id, worker=self.worker, statut='EN_COURS').update(
+                        battement=timezone.now(),
+                    )
+                except DatabaseError:
+                    pass  # Base occupée (écriture longue de la tâche) : nouvel essai au prochain battement.
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.fil.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.arret.set()
+        self.fil.join()
+
+
+def _file():
+    return Tache.objects.filter(statut='EN_ATTENTE', executer_apres__lte=timezone.now()).order_by(
+        'executer_apres', 'pk',
+    )
+
+
+def reserver(worker):
+    """Réserve la prochaine tâche exécutable pour `worker` ; renvoie la Tache ou None."""
+    maintenant = timezone.now()
+    prise = {
+        'statut': 'EN_COURS', 'worker': worker, 'battement': maintenant,
+        'date_debut': maintenant, 'tentatives': F('tentatives') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            tache_id = _file().select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if tache_id is None:
+                return None
+            Tache.objects.filter(pk=tache_id).update(**prise)
+    else:
+        for candidat in _file().values_list('pk', flat=True)[:CANDIDATS_RESERVATION]:
+            if Tache.objects.filter(pk=candidat, statut='EN_ATTENTE').update(**prise):
+                tache_id = candidat
+                break
+        else:
+            return None
+    return Tache.objects.get(pk=tache_id)
+
+
+def executer(tache, worker):
+    """Exécute une tâche réservée et enregistre son résultat, ou planifie une nouvelle tentative."""
+    fonction = REGISTRE.get(tache.type_tache)
+    a_jour = Tache.objects.filter(pk=tache.pk, worker=worker, statut='EN_COURS')
+    try:
+        if fonction is None:
+            raise ValueError(f"Type de tâche inconnu : {tache.type_tache}")
+        with Battement(tache.pk, worker):
+            resultat = fonction(Progression(tache.pk, worker), **tache.parametres)
+    except Exception:
+        erreur = traceback.format_exc()
+        if tache.tentatives < tache.max_tentatives:
+            a_jour.update(
+                statut='EN_ATTENTE', erreur=erreur, battement=None,
+                executer_apres=timezone.now() + DELAI_REESSAI * 2 ** (tache.tentatives - 1),
+                message=f"Échec de la tentative {tache.tentatives}, nouvel essai planifié.",
+            )
+        else:
+            a_jour.update(statut='ECHOUEE', erreur=erreur, date_fin=timezone.now(), message="Échec définitif.")
+        return False
+    a_jour.update(statut='TERMINEE', progression=100, resultat=resultat, date_fin=timezone.now())
+    return True
+
+
+def liberer_taches_orphelines(delai=DELAI_ORPHELINE):
+    """
+    Remet en file les tâches EN_COURS dont le worker s'est tu (arrêt brutal,
+    machine redémarrée) ; celles qui ont épuisé leurs tentatives échouent.
+    Renvoie le nombre de tâches traitées.
+    """
+    orphelines = Tache.objects.filter(statut='EN_COURS', battement__lt=timezone.now() - delai)
+    echouees = orphelines.filter(tentatives__gte=F('max_tentatives')).update(
+        statut='ECHOUEE', date_fin=timezone.now(), message="Worker interrompu, tentatives épuisées.",
+    )
+    reprises = orphelines.update(
+        statut='EN_ATTENTE', executer_apres=timezone.now(), battement=None,
+        message="Worker interrompu, tâche remise en file.",
+    )
+    return echouees + reprises
+
+
+# --- Types de tâches ---
+
+@tache('lancer_paie')
+def tache_lancer_paie(progression, mois, annee):
+    total = Employe.objects.count()
+    resultat = lancer_paie(mois, annee, rappel=lambda r: progression.avancer(
+        r.lignes + r.ignores, total, f"{r.lignes + r.ignores} employés traités",
+    ))
+    return {
+        'crees': resultat.crees, 'mis_a_jour': resultat.mis_a_jour, 'ignores': resultat.ignores,
+        'total_net': str(resultat.total_net), 'duree': round(resultat.duree, 2),
+    }
+
+
+@tache('importer_presences')
+def tache_importer_presences(progression, fichier, format_fichier):
+    with open(fichier, encoding='utf-8-sig', newline='') as flux:
+        resultat = importer_presences(flux, format_fichier, rappel=lambda r: progression.avancer(
+            r.lues, message=f"{r.lues} lignes lues",
+        ))
+    os.remove(fichier)
+    return {
+        'importees': resultat.importees, 'rejetees': resultat.rejetees,
+        'erreurs': resultat.erreurs, 'duree': round(resultat.duree, 2),
+    }
+
+
+@tache('generer_bulletins')
+def tache_generer_bulletins(progression, mois, annee, nb_workers=2):
+    fiches = FicheDePaie.objects.filter(mois=mois, annee=annee)
+    total = fiches.count()
+    production = ProductionBulletins(donnees_bulletins(fiches), nb_workers=nb_workers)
+    chemin = dossier_taches() / f"bulletins_{annee}-{mois:02d}_{uuid.uuid4().hex[:8]}.zip"
+    with open(chemin, 'wb') as archive:
+        for morceau in flux_archive(production):
+            archive.write(morceau)
+            progression.avancer(production.resultat.bulletins, total, f"{production.resultat.bulletins} bulletins")
+    return {
+        'fichier': str(chemin), 'bulletins': production.resultat.bulletins,
+        'rendus': production.resultat.rendus, 'en_cache': production.resultat.en_cache,
+        'purges': purger_cache(),
+    }
+
+
+@tache('integrer_employes')
+def tache_integrer_employes(progression, fichier, format_fichier):
+    with open(fichier, encoding='utf-8-sig', newline='') as flux:
+        resultat = integrer_employes(flux, format_fichier, rappel=lambda r: progression.avancer(
+            r.creees + r.rejetees, r.lues, f"{r.creees} employés créés",
+        ))
+    os.remove(fichier)
+    bilan = {'creees': resultat.creees, 'rejetees': resultat.rejetees, 'duree': round(resultat.duree, 2)}
+    if resultat.erreurs:
+        chemin = dossier_taches() / f"rapport_integration_{uuid.uuid4().hex[:8]}.csv"
+        with open(chemin, 'w', encoding='utf-8', newline='') as rapport:
+            ecrire_rapport(resultat, rapport)
+        bilan['fichier'] = str(chemin)
+    return bilan
+
+
+@tache('rafraichir_tableau_de_bord')
+def tache_rafraichir_tableau_de_bord(progression, tout=False):
+    ouvrir_mois_courant()
+    periodes = rafraichir_syntheses(toutes_les_periodes() if tout else None)
+    return {'mois': len(periodes)}
+
+
+@tache('notifier_conges')
+def tache_notifier_conges(progression, conges):
+    # Un message par congé, tous envoyés sur une même connexion SMTP. Chaque
+    # envoi est enregistré aussitôt : après un échec SMTP en cours de route,
+    # la tentative suivante ne renvoie pas les messages déjà partis.
+    envoyes = progression.reprise().get('envoyes', [])
+    lignes = Conge.objects.filter(pk__in=conges).values_list(
+        'pk', 'statut', 'date_debut', 'date_fin', 'employe__prenom', 'employe__utilisateur__email',
+    )
+    decisions = {'VALIDE': 'validée', 'REFUSE': 'refusée'}
+    messages = [
+        (pk, EmailMessage(
+            f"Votre demande de congé a été {decisions[statut]}",
+            f"Bonjour {prenom},\n\nVotre demande de congé du {debut:%d/%m/%Y} au {fin:%d/%m/%Y} "
+            f"a été {decisions[statut]}.",
+            None, [email],
+        ))
+        for pk, statut, debut, fin, prenom, email in lignes if email and statut in decisions
+    ]
+    a_envoyer = [(pk, message) for pk, message in messages if pk not in envoyes]
+    if a_envoyer:
+        with get_connection(fail_silently=False) as connexion:
+            for pk, message in a_envoyer:
+                connexion.send_messages([message])
+                envoyes.append(pk)
+                progression.enregistrer({'envoyes': envoyes})
+    return {'envoyes': len(envoyes), 'sans_email': len(lignes) - len(messages)}
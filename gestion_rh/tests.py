@@ -1,3 +1,631 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .annuaire import cache_recherche, rechercher
+from .archives_paie import archiver_annee, restaurer_annee
+from .assiduite import reconstruire_agregats_presence
+from .bulletins import donnees_bulletins, purger_cache
+from .conges import reconstruire_absences, reconstruire_soldes, solde, traiter_demandes
+from .formations import ErreurInscription, changer_capacite, desinscrire, inscrire, inscrire_service
+from .models import (
+    AbsenceServiceJour, ArchivePaie, Conge, Departement, Employe, FicheDePaie, FicheDePaieArchivee, FichePaiePrime,
+    Formation, JourneeTravail, ParticipationFormation, PeriodeSynthese, Poste, Presence, PresenceServiceJour, Prime,
+    Role, SoldeConge, Tache, Utilisateur,
+)
+from .paie import ResultatPaie, _ecrire_et_compter, calculer_lot
+from .pointage import EmployeInconnu, importer_presences, journee_du_jour_id, pointer_arrivee, pointer_depart
+from .recherche_annonces import Terme, termes_requete
+from .taches import (
+    REGISTRE, executer, liberer_taches_orphelines, planifier, planifier_actualisation_tableau_de_bord, reserver,
+)
+from .views import FicheDePaieEmployeListView, FicheDePaieListView, FicheDePaiePdfView, TableauDeBordView
+
+
+def creer_employe(matricule='M1', departement=None):
+    return Employe.objects.create(
+        utilisateur=Utilisateur.objects.create(username=matricule.lower()), matricule=matricule, nom='Martin',
+        prenom='Alice', date_naissance=datetime.date(1990, 1, 1), telephone='0600000000',
+        departement=departement or Departement.objects.get_or_create(nom='Informatique')[0],
+        poste=Poste.objects.get_or_create(intitule='Développeur')[0],
+        salaire_base=3000, date_embauche=datetime.date(2020, 1, 1),
+    )
+
+
+class RechercheAnnuaireTests(TestCase):
+
+    def test_page_complete_malgre_plusieurs_mots_par_employe(self):
+        # Chaque employé a quatre mots commençant par « ma », classés avant ceux du suivant.
+        for matricule, nom in (('M1', 'Maa Mab Mac Mad'), ('M2', 'Mae Maf Mag Mah'), ('M3', 'Mai Maj Mak Mal')):
+            employe = creer_employe(matricule)
+            employe.nom = nom
+            employe.save()
+        cache_recherche.vider()
+        self.assertEqual([fiche['matricule'] for fiche in rechercher('ma', limite=2)], ['M1', 'M2'])
+        self.assertEqual(len(rechercher('ma')), 3)
+
+
+class RepriseLibellesTests(TransactionTestCase):
+    avant = [('gestion_rh', '0002_referentiels')]
+    apres = [('gestion_rh', '0004_referentiels_obligatoires')]
+
+    def migrer(self, cible):
+        executeur = MigrationExecutor(connection)
+        executeur.migrate(cible)
+        return executeur.loader.project_state(cible).apps
+
+    def tearDown(self):
+        self.migrer(MigrationExecutor(connection).loader.graph.leaf_nodes('gestion_rh'))
+
+    def test_libelles_dedoublonnes_et_compteurs_cumules(self):
+        apps = self.migrer(self.avant)
+        Employe = apps.get_model('gestion_rh', 'Employe')
+        Utilisateur = apps.get_model('gestion_rh', 'Utilisateur')
+        for numero, (service, poste) in enumerate((
+            ('Informatique', 'Développeur'), ('informatique ', 'developpeur'),
+            ('INFORMATIQUE', 'Comptable'), ('Comptabilité', 'Comptable'), ('', ''), ('Informatique', 'Comptable'),
+        )):
+            Employe.objects.create(
+                utilisateur=Utilisateur.objects.create(username=f'u{numero}'), matricule=f'M{numero}',
+                nom='Martin', prenom='Alice', date_naissance=datetime.date(1990, 1, 1), telephone='0600000000',
+                ancien_service=service, ancien_poste=poste, salaire_base=3000, date_embauche=datetime.date(2020, 1, 1),
+            )
+        AbsenceServiceJour = apps.get_model('gestion_rh', 'AbsenceServiceJour')
+        AbsenceServiceJour.objects.bulk_create([
+            AbsenceServiceJour(ancien_service=service, date=datetime.date(2024, 3, 4), nombre=nombre)
+            for service, nombre in (('Informatique', 2), ('informatique ', 1), ('Comptabilité', 1))
+        ])
+
+        apps = self.migrer(self.apres)
+        Employe = apps.get_model('gestion_rh', 'Employe')
+        self.assertEqual(
+            sorted(apps.get_model('gestion_rh', 'Departement').objects.values_list('nom', flat=True)),
+            ['Comptabilité', 'Informatique', 'Non renseigné'],
+        )
+        self.assertEqual(
+            sorted(apps.get_model('gestion_rh', 'Poste').objects.values_list('intitule', flat=True)),
+            ['Comptable', 'Développeur', 'Non renseigné'],
+        )
+        self.assertEqual(
+            dict(Employe.objects.values_list('matricule', 'departement__nom')),
+            {'M0': 'Informatique', 'M1': 'Informatique', 'M2': 'Informatique', 'M3': 'Comptabilité',
+             'M4': 'Non renseigné', 'M5': 'Informatique'},
+        )
+        self.assertEqual(
+            sorted(apps.get_model('gestion_rh', 'AbsenceServiceJour').objects.values_list(
+                'departement__nom', 'nombre',
+            )),
+            [('Comptabilité', 1), ('Informatique', 3)],
+        )
+
+
+class ImportPresencesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employe = creer_employe()
+
+    def importer(self, lignes, taille_lot=5000):
+        flux = io.StringIO('matricule,date,heure_arrivee,heure_depart\n' + ''.join(f'{l}\n' for l in lignes))
+        return importer_presences(flux, 'csv', taille_lot=taille_lot)
+
+    def presence(self):
+        return Presence.objects.values_list('heure_arrivee', 'heure_depart').get(employe=self.employe)
+
+    def test_journee_repartie_sur_deux_lots(self):
+        # Un lot d'une clé : la seconde ligne du même jour arrive dans un autre lot.
+        resultat = self.importer([
+            'M1,2024-03-04,09:00,17:30',
+            'M2,2024-03-04,08:00,',
+            'M1,2024-03-04,08:30,',
+        ], taille_lot=1)
+        self.assertEqual(self.presence(), (datetime.time(8, 30), datetime.time(17, 30)))
+        self.assertEqual(resultat.rejetees, 1)
+        self.assertEqual(resultat.importees, 2)
+
+    def test_reimport_fusionne_avec_le_pointage_existant(self):
+        journee = JourneeTravail.objects.create(date_journee=datetime.date(2024, 3, 4))
+        Presence.objects.create(employe=self.employe, journee=journee, heure_arrivee=datetime.time(8, 0))
+        resultat = self.importer(['M1,2024-03-04,09:15,18:00'])
+        self.assertEqual(self.presence(), (datetime.time(8, 0), datetime.time(18, 0)))
+        self.assertEqual(resultat.importees, 1)
+        # Même fichier une seconde fois : rien ne change, rien n'est réécrit.
+        resultat = self.importer(['M1,2024-03-04,09:15,'])
+        self.assertEqual(self.presence(), (datetime.time(8, 0), datetime.time(18, 0)))
+        self.assertEqual(resultat.importees, 0)
+
+
+class PointageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employe = creer_employe()
+
+    def test_second_pointage_d_arrivee_renvoie_la_premiere_heure(self):
+        self.assertEqual(pointer_arrivee(self.employe.pk, datetime.time(8, 0)), datetime.time(8, 0))
+        self.assertEqual(pointer_arrivee(self.employe.pk, datetime.time(9, 30)), datetime.time(8, 0))
+        self.assertEqual(Presence.objects.get(employe=self.employe).heure_arrivee, datetime.time(8, 0))
+
+
+class PointageJourneeRecreeTests(TransactionTestCase):
+    # Les clés étrangères SQLite sont vérifiées au COMMIT : hors TestCase.
+
+    def test_journee_recreee_apres_mise_en_cache(self):
+        employe = creer_employe()
+        JourneeTravail.objects.filter(pk=journee_du_jour_id()).delete()
+        JourneeTravail.objects.create(date_journee=timezone.localdate())
+        self.assertEqual(pointer_arrivee(employe.pk, datetime.time(8, 0)), datetime.time(8, 0))
+        self.assertEqual(Presence.objects.get(employe=employe).journee.date_journee, timezone.localdate())
+        # Un autre processus garde l'ancienne journée en cache : le départ la retrouve aussi.
+        JourneeTravail.objects.filter(pk=journee_du_jour_id()).update(date_journee=datetime.date(2000, 1, 1))
+        JourneeTravail.objects.create(date_journee=timezone.localdate())
+        Presence.objects.create(
+            employe=employe, journee=JourneeTravail.objects.get(date_journee=timezone.localdate()),
+            heure_arrivee=datetime.time(9, 0),
+        )
+        JourneeTravail.objects.filter(date_journee=datetime.date(2000, 1, 1)).delete()
+        self.assertEqual(pointer_depart(employe.pk, datetime.time(17, 0)), datetime.time(17, 0))
+
+    def test_employe_inconnu(self):
+        with self.assertRaises(EmployeInconnu):
+            pointer_arrivee(12345, datetime.time(8, 0))
+
+
+class TermesRequeteTests(TestCase):
+
+    def test_etoile_sur_mot_vide_ou_doublon_sans_effet(self):
+        self.assertEqual(termes_requete('paie le*'), [Terme('paie')])
+        self.assertEqual(termes_requete('congé du*'), [Terme('conge')])
+        self.assertEqual(termes_requete('paie paie*'), [Terme('paie')])
+
+    def test_etoile_sur_dernier_mot(self):
+        self.assertEqual(termes_requete('congé pai*'), [Terme('conge'), Terme('pai', prefixe=True)])
+        self.assertEqual(termes_requete('p*'), [Terme('p')])
+
+
+class EcriturePaieTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employe = creer_employe()
+
+    def test_fiche_validee_entre_calcul_et_ecriture_reste_intacte(self):
+        FicheDePaie.objects.create(employe=self.employe, mois=3, annee=2024, salaire_brut=2500, salaire_net=2500)
+        fiches, mis_a_jour, ignores = calculer_lot(3, 2024, [(self.employe.pk, self.employe.salaire_base)])
+        self.assertEqual((len(fiches), mis_a_jour, ignores), (1, 1, 0))
+        # Validée par le RH pendant le calcul.
+        FicheDePaie.objects.filter(employe=self.employe).update(statut='VALIDE')
+        resultat = ResultatPaie(mois=3, annee=2024)
+        _ecrire_et_compter(resultat, fiches, ignores)
+        fiche = FicheDePaie.objects.get(employe=self.employe)
+        self.assertEqual((fiche.statut, fiche.salaire_net), ('VALIDE', 2500))
+        self.assertEqual((resultat.crees, resultat.mis_a_jour, resultat.ignores), (0, 0, 1))
+
+
+class SoldesCongesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employe = creer_employe()
+
+    def jours_pris(self, annee=2024):
+        return solde(self.employe.pk, annee).jours_pris
+
+    def test_solde_suit_validation_modification_et_suppression(self):
+        conge = Conge.objects.create(
+            employe=self.employe, date_debut=datetime.date(2024, 3, 4), date_fin=datetime.date(2024, 3, 8),
+        )
+        self.assertEqual(self.jours_pris(), 0)
+        conge.statut = 'VALIDE'
+        conge.save()
+        self.assertEqual(self.jours_pris(), 5)
+        # Instance chargée partiellement : l'état précédent est relu en base.
+        conge = Conge.objects.only('pk', 'date_fin').get(pk=conge.pk)
+        conge.date_fin = datetime.date(2024, 3, 5)
+        conge.save()
+        self.assertEqual(self.jours_pris(), 2)
+        # Report sur l'année suivante : le solde 2024 est rendu, 2025 est débité.
+        conge = Conge.objects.get(pk=conge.pk)
+        conge.date_debut, conge.date_fin = datetime.date(2025, 1, 6), datetime.date(2025, 1, 7)
+        conge.save()
+        self.assertEqual((self.jours_pris(), self.jours_pris(2025)), (0, 2))
+        conge.delete()
+        self.assertEqual(self.jours_pris(2025), 0)
+
+    def test_reconstruction_identique_au_suivi_incremental(self):
+        for debut, fin, statut in (
+            ((2024, 3, 4), (2024, 3, 8), 'VALIDE'),
+            ((2024, 5, 6), (2024, 5, 6), 'VALIDE'),
+            ((2024, 6, 3), (2024, 6, 7), 'REFUSE'),
+        ):
+            Conge.objects.create(
+                employe=self.employe, date_debut=datetime.date(*debut), date_fin=datetime.date(*fin), statut=statut,
+            )
+        self.assertEqual(self.jours_pris(), 6)
+        SoldeConge.objects.update(jours_pris=0)
+        self.assertEqual(reconstruire_soldes(), 1)
+        self.assertEqual(self.jours_pris(), 6)
+
+
+class TraitementDemandesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employe = creer_employe()
+
+    def conge(self, debut, fin, statut='DEMANDE'):
+        return Conge.objects.create(
+            employe=self.employe, date_debut=datetime.date(2024, *debut), date_fin=datetime.date(2024, *fin),
+            statut=statut,
+        ).pk
+
+    def test_validation_en_masse(self):
+        self.conge((3, 4), (3, 8), 'VALIDE')
+        chevauche_valide = self.conge((3, 6), (3, 7))
+        retenue = self.conge((3, 11), (3, 12))
+        chevauche_lot = self.conge((3, 12), (3, 13))
+        refusee = self.conge((4, 1), (4, 2), 'REFUSE')
+        with CaptureQueriesContext(connection) as requetes:
+            resultat = traiter_demandes([chevauche_valide, retenue, chevauche_lot, refusee, 9999], 'VALIDE')
+        self.assertEqual(resultat.traites, [retenue])
+        self.assertEqual(resultat.ignores, {
+            chevauche_valide: "chevauche un congé validé", chevauche_lot: "chevauche une autre demande du lot",
+            refusee: "déjà refusé", 9999: "introuvable",
+        })
+        # Un seul UPDATE pour les statuts ; soldes et absences suivent.
+        table = Conge._meta.db_table
+        self.assertEqual(len([q for q in requetes if q['sql'].startswith(f'UPDATE "{table}"')]), 1)
+        self.assertEqual(Conge.objects.get(pk=retenue).statut, 'VALIDE')
+        self.assertEqual(solde(self.employe.pk, 2024).jours_pris, 7)
+        self.assertTrue(AbsenceServiceJour.objects.filter(date=datetime.date(2024, 3, 11)).exists())
+        self.assertEqual(Tache.objects.get(pk=resultat.tache_id).parametres, {'conges': [retenue]})
+
+        resultat = traiter_demandes([chevauche_valide, chevauche_lot, retenue], 'REFUSE')
+        self.assertEqual((sorted(resultat.traites), resultat.ignores), (
+            sorted([chevauche_valide, chevauche_lot]), {retenue: "déjà validé"},
+        ))
+        self.assertEqual(solde(self.employe.pk, 2024).jours_pris, 7)
+
+
+class PurgeBulletinsTests(TestCase):
+
+    def test_purge_des_pdf_sans_fiche(self):
+        fiche = FicheDePaie.objects.create(
+            employe=creer_employe(), mois=3, annee=2024, salaire_brut=2500, salaire_net=2500,
+        )
+        avant = next(donnees_bulletins(FicheDePaie.objects.all()))['empreinte']
+        fiche.salaire_brut = 2600
+        fiche.save()
+        actuelle = next(donnees_bulletins(FicheDePaie.objects.all()))['empreinte']
+        with tempfile.TemporaryDirectory() as dossier, override_settings(BULLETINS_CACHE_DIR=dossier):
+            fichiers = {nom: os.path.join(dossier, nom) for nom in (
+                f'{actuelle}.pdf', f'{avant}.pdf', 'abandonne.tmp', 'recent.pdf', 'autre.txt',
+            )}
+            for nom, chemin in fichiers.items():
+                open(chemin, 'wb').close()
+                if nom != 'recent.pdf':
+                    os.utime(chemin, (0, 0))
+            self.assertEqual(purger_cache(), 2)
+            self.assertEqual(sorted(os.listdir(dossier)), sorted([f'{actuelle}.pdf', 'recent.pdf', 'autre.txt']))
+
+
+class ArchivesPaieTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employe = creer_employe()
+        cls.rh = Utilisateur.objects.create(username='rh', role=Role.objects.create(nom_role=Role.RH))
+        prime = Prime.objects.create(nom_prime='Rendement')
+        for mois in (1, 2):
+            fiche = FicheDePaie.objects.create(
+                employe=cls.employe, mois=mois, annee=2020, statut='EMISE', salaire_brut=3000, total_primes=150,
+                salaire_net=2400,
+            )
+            FichePaiePrime.objects.create(fiche_de_paie=fiche, prime=prime, montant=150)
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(
+            ARCHIVES_PAIE_DIR=os.path.join(dossier.name, 'archives'),
+            BULLETINS_CACHE_DIR=os.path.join(dossier.name, 'bulletins'),
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def etat_tables(self):
+        return (
+            list(FicheDePaie.objects.order_by('pk').values()),
+            list(FichePaiePrime.objects.order_by('fiche_de_paie_id').values('fiche_de_paie_id', 'prime_id', 'montant')),
+        )
+
+    def vue(self, classe, chemin, utilisateur, **kwargs):
+        requete = RequestFactory().get(chemin)
+        requete.user = utilisateur
+        vue = classe()
+        vue.setup(requete, **kwargs)
+        return vue, requete
+
+    def test_archivage_puis_restauration_a_l_identique(self):
+        avant = self.etat_tables()
+        premiere = avant[0][0]['id']
+        archive = archiver_annee(2020)
+        self.assertEqual((archive.nombre_fiches, archive.nombre_lignes), (2, 2))
+        self.assertFalse(FicheDePaie.objects.filter(annee=2020).exists())
+        fiches = FicheDePaie.objects.de_la_periode(2020, 1)
+        self.assertEqual([(f.pk, f.salaire_net, f.lignes_primes) for f in fiches],
+                         [(premiere, 2400, [('Rendement', 150)])])
+        self.assertIsInstance(FicheDePaie.objects.trouver(premiere), FicheDePaieArchivee)
+
+        self.assertEqual(restaurer_annee(2020), 2)
+        self.assertFalse(ArchivePaie.objects.exists())
+        self.assertEqual(self.etat_tables(), avant)
+
+    def test_annee_archivee_consultable(self):
+        premiere = FicheDePaie.objects.order_by('pk').first().pk
+        bulletin_en_table = next(donnees_bulletins(FicheDePaie.objects.filter(pk=premiere)))
+        archiver_annee(2020)
+
+        vue, requete = self.vue(FicheDePaiePdfView, f'/rh/fiches-paie/{premiere}/pdf/', self.rh)
+        reponse = vue.get(requete, pk=premiere)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(b''.join(reponse.streaming_content).startswith(b'%PDF'))
+        # Même contenu, donc même PDF en cache, qu'avant l'archivage.
+        self.assertEqual(reponse.filename, 'bulletin_M1_2020-01.pdf')
+        self.assertTrue(os.path.exists(os.path.join(
+            os.path.dirname(reponse.file_to_stream.name), f"{bulletin_en_table['empreinte']}.pdf",
+        )))
+        reponse.close()
+
+        vue, requete = self.vue(FicheDePaieListView, '/rh/fiches-paie/?annee=2020&mois=1', self.rh)
+        contexte = vue.get(requete).context_data
+        self.assertEqual(contexte['annee_archivee'], 2020)
+        self.assertEqual([f.pk for f in contexte['fiches_paie']], [premiere])
+        vue, requete = self.vue(FicheDePaieListView, '/rh/fiches-paie/?annee=2020', self.rh)
+        contexte = vue.get(requete).context_data
+        self.assertEqual((contexte['annee_archivee'], list(contexte['fiches_paie'])), (2020, []))
+
+        vue, requete = self.vue(FicheDePaieEmployeListView, '/employe/fiches-paie/', self.employe.utilisateur)
+        fiches = async_to_sync(vue.donnees)(requete)['fiches_paie']
+        self.assertEqual([(f.annee, f.mois) for f in fiches], [(2020, 2), (2020, 1)])
+
+
+class InscriptionsFormationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employes = [creer_employe(f'M{numero}').pk for numero in range(1, 5)]
+
+    def setUp(self):
+        self.formation = Formation.objects.create(titre='Django', description='', duree_heures=7, capacite=2)
+
+    def statuts(self):
+        return dict(ParticipationFormation.objects.filter(formation=self.formation).values_list('employe_id', 'statut'))
+
+    def places_prises(self):
+        return Formation.objects.get(pk=self.formation.pk).places_prises
+
+    def test_pas_de_surreservation_et_promotion_de_la_liste_d_attente(self):
+        un, deux, trois, quatre = self.employes
+        self.assertEqual([inscrire(self.formation.pk, e) for e in self.employes],
+                         ['INSCRIT', 'INSCRIT', 'ATTENTE', 'ATTENTE'])
+        self.assertEqual(self.places_prises(), 2)
+        with self.assertRaises(ErreurInscription):
+            inscrire(self.formation.pk, un)
+        # La place libérée revient au premier arrivé de la liste d'attente.
+        desinscrire(self.formation.pk, deux)
+        self.assertEqual(self.statuts(), {un: 'INSCRIT', deux: 'ANNULE', trois: 'INSCRIT', quatre: 'ATTENTE'})
+        self.assertEqual(self.places_prises(), 2)
+        # Une attente annulée ne libère aucune place.
+        desinscrire(self.formation.pk, quatre)
+        self.assertEqual((self.statuts()[quatre], self.places_prises()), ('ANNULE', 2))
+        with self.assertRaises(ErreurInscription):
+            desinscrire(self.formation.pk, quatre)
+
+    def test_reinscription_apres_annulation_en_fin_de_liste(self):
+        un, deux, trois, quatre = self.employes
+        for employe in (un, deux, trois):
+            inscrire(self.formation.pk, employe)
+        desinscrire(self.formation.pk, un)
+        inscrire(self.formation.pk, quatre)
+        self.assertEqual(inscrire(self.formation.pk, un), 'ATTENTE')
+        desinscrire(self.formation.pk, deux)
+        self.assertEqual(self.statuts(), {un: 'ATTENTE', deux: 'ANNULE', trois: 'INSCRIT', quatre: 'INSCRIT'})
+
+    def test_capacite_jamais_sous_les_places_prises(self):
+        trois, quatre = self.employes[2:]
+        for employe in self.employes:
+            inscrire(self.formation.pk, employe)
+        self.assertFalse(changer_capacite(self.formation.pk, 1))
+        self.assertEqual(Formation.objects.get(pk=self.formation.pk).capacite, 2)
+        self.assertTrue(changer_capacite(self.formation.pk, 3))
+        statuts = self.statuts()
+        self.assertEqual((statuts[trois], statuts[quatre], self.places_prises()), ('INSCRIT', 'ATTENTE', 3))
+
+    def test_inscription_d_un_service(self):
+        un, deux, trois, quatre = self.employes
+        inscrire(self.formation.pk, deux)
+        desinscrire(self.formation.pk, deux)
+        inscrire(self.formation.pk, trois)
+        departement = Employe.objects.get(pk=un).departement_id
+        resultat = inscrire_service(self.formation.pk, departement)
+        # deux, annulé, est réinscrit ; trois l'était déjà.
+        self.assertEqual((resultat.inscrits, resultat.en_attente, resultat.deja_inscrits), ([un], [deux, quatre], 1))
+        self.assertEqual(self.statuts(), {un: 'INSCRIT', deux: 'ATTENTE', trois: 'INSCRIT', quatre: 'ATTENTE'})
+        self.assertEqual(self.places_prises(), 2)
+        self.assertEqual(inscrire_service(self.formation.pk, departement).deja_inscrits, 4)
+
+
+class ChangementServiceTests(TestCase):
+
+    def compteurs(self):
+        return (
+            sorted(AbsenceServiceJour.objects.exclude(nombre=0).values_list('departement_id', 'date', 'nombre')),
+            sorted(PresenceServiceJour.objects.exclude(jours_presents=0).values_list(
+                'departement_id', 'date', 'jours_presents', 'secondes_travaillees',
+            )),
+        )
+
+    def test_agregats_suivent_le_nouveau_service(self):
+        employe = creer_employe()
+        journee = JourneeTravail.objects.create(date_journee=datetime.date(2024, 3, 4))
+        presence = Presence.objects.create(
+            employe=employe, journee=journee, heure_arrivee=datetime.time(8, 0), heure_depart=datetime.time(17, 0),
+        )
+        conge = Conge.objects.create(
+            employe=employe, date_debut=datetime.date(2024, 3, 5), date_fin=datetime.date(2024, 3, 6), statut='VALIDE',
+        )
+        employe.departement = Departement.objects.create(nom='Comptabilité')
+        employe.save()
+        # Modifications ultérieures des anciens enregistrements.
+        presence.heure_depart = datetime.time(16, 0)
+        presence.save()
+        conge.statut = 'REFUSE'
+        conge.save()
+        attendu = self.compteurs()
+        self.assertTrue(all(ligne[0] == employe.departement_id for ligne in attendu[1]))
+        self.assertEqual(attendu[0], [])
+        reconstruire_absences()
+        reconstruire_agregats_presence()
+        self.assertEqual(self.compteurs(), attendu)
+
+
+class BattementTests(TransactionTestCase):
+
+    def test_tache_sans_progression_n_est_pas_orpheline(self):
+        liberees = []
+
+        def muette(progression):
+            # Aucun appel à progression.avancer, plus longtemps que le délai d'orpheline.
+            time.sleep(0.5)
+            liberees.append(liberer_taches_orphelines(datetime.timedelta(seconds=0.3)))
+            return {}
+
+        REGISTRE['test_muette'] = muette
+        self.addCleanup(REGISTRE.pop, 'test_muette')
+        tache = planifier('test_muette')
+        with mock.patch('gestion_rh.taches.INTERVALLE_BATTEMENT', 0.05):
+            self.assertTrue(executer(reserver('w1'), 'w1'))
+        self.assertEqual(liberees, [0])
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), ('TERMINEE', 1))
+
+
+class FileTachesTests(TestCase):
+
+    def setUp(self):
+        self.appels = 0
+
+        def instable(progression, echecs):
+            self.appels += 1
+            if self.appels <= echecs:
+                raise RuntimeError("échec")
+            return {'appels': self.appels}
+
+        REGISTRE['test_instable'] = instable
+        self.addCleanup(REGISTRE.pop, 'test_instable')
+
+    def test_chaque_tache_reservee_une_seule_fois(self):
+        premiere, seconde = planifier('test_instable', {'echecs': 0}), planifier('test_instable', {'echecs': 0})
+        self.assertEqual(reserver('w1').pk, premiere.pk)
+        self.assertEqual(reserver('w2').pk, seconde.pk)
+        self.assertIsNone(reserver('w3'))
+        self.assertEqual(
+            sorted(Tache.objects.values_list('worker', 'statut', 'tentatives')),
+            [('w1', 'EN_COURS', 1), ('w2', 'EN_COURS', 1)],
+        )
+
+    def test_nouvelle_tentative_differee_puis_echec_definitif(self):
+        tache = planifier('test_instable', {'echecs': 5}, max_tentatives=2)
+        self.assertFalse(executer(reserver('w1'), 'w1'))
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.worker), ('EN_ATTENTE', 'w1'))
+        self.assertGreater(tache.executer_apres, timezone.now())
+        self.assertIsNone(reserver('w1'))  # Pas avant le délai de nouvel essai.
+        Tache.objects.update(executer_apres=timezone.now())
+        self.assertFalse(executer(reserver('w2'), 'w2'))
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives, self.appels), ('ECHOUEE', 2, 2))
+
+    def test_reussite_apres_echec(self):
+        tache = planifier('test_instable', {'echecs': 1})
+        executer(reserver('w1'), 'w1')
+        Tache.objects.update(executer_apres=timezone.now())
+        self.assertTrue(executer(reserver('w1'), 'w1'))
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives, tache.resultat), ('TERMINEE', 2, {'appels': 2}))
+
+    def test_orphelines_remises_en_file_ou_echouees(self):
+        reprise = planifier('test_instable', {'echecs': 0})
+        epuisee = planifier('test_instable', {'echecs': 0}, max_tentatives=1)
+        for _ in range(2):
+            reserver('w1')
+        Tache.objects.update(battement=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(liberer_taches_orphelines(), 2)
+        self.assertEqual(Tache.objects.get(pk=reprise.pk).statut, 'EN_ATTENTE')
+        self.assertEqual(Tache.objects.get(pk=epuisee.pk).statut, 'ECHOUEE')
+
+
+class NotificationCongesTests(TestCase):
+
+    def test_nouvelle_tentative_ne_renvoie_pas_les_messages_partis(self):
+        conges = []
+        for matricule in ('M1', 'M2', 'M3'):
+            employe = creer_employe(matricule)
+            Utilisateur.objects.filter(pk=employe.pk).update(email=f'{matricule.lower()}@example.com')
+            conges.append(Conge.objects.create(
+                employe=employe, date_debut=datetime.date(2024, 3, 4), date_fin=datetime.date(2024, 3, 5),
+                statut='VALIDE',
+            ).pk)
+        tache = planifier('notifier_conges', {'conges': conges})
+        envoyer = EmailBackend.send_messages
+
+        def panne_au_second_envoi(backend, messages):
+            if len(mail.outbox) == 1:
+                raise ConnectionError("SMTP indisponible")
+            return envoyer(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', panne_au_second_envoi):
+            self.assertFalse(executer(reserver('w1'), 'w1'))
+        self.assertEqual(len(mail.outbox), 1)
+        Tache.objects.update(executer_apres=timezone.now())
+        self.assertTrue(executer(reserver('w1'), 'w1'))
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['m1@example.com', 'm2@example.com', 'm3@example.com'],
+        )
+        tache.refresh_from_db()
+        self.assertEqual(tache.resultat, {'envoyes': 3, 'sans_email': 0})
+
+
+class TableauDeBordTests(TestCase):
+
+    def test_affichage_sans_ecriture(self):
+        PeriodeSynthese.objects.create(annee=2024, mois=3, a_recalculer=True)
+        requete = RequestFactory().get('/rh/tableau-de-bord/')
+        requete.user = Utilisateur.objects.create(username='rh', role=Role.objects.create(nom_role=Role.RH))
+        vue = TableauDeBordView()
+        vue.setup(requete)
+        with CaptureQueriesContext(connection) as requetes:
+            contexte = vue.get_context_data()
+        ecritures = [q['sql'] for q in requetes if not q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(ecritures, [])
+        self.assertIsNone(contexte['tache_actualisation'])
+        # Le worker ouvre le mois courant et planifie le recalcul, une seule fois.
+        tache = planifier_actualisation_tableau_de_bord()
+        self.assertEqual(planifier_actualisation_tableau_de_bord().pk, tache.pk)
+        aujourd_hui = timezone.localdate()
+        self.assertTrue(PeriodeSynthese.objects.filter(annee=aujourd_hui.year, mois=aujourd_hui.month).exists())
+        self.assertEqual(vue.get_context_data()['tache_actualisation'].pk, tache.pk)
@@ -5,6 +5,8 @@ from . import views
 urlpatterns = [
     # URLs pour les employés
     path('employes/', views.EmployeListView.as_view(), name='employe_list'),
+    path('employes/recherche/', views.AnnuaireRechercheView.as_view(), name='annuaire_recherche'),
+    path('autocompletion/<slug:source>/', views.AutocompletionView.as_view(), name='autocompletion'),
     path('employes/<int:pk>/', views.EmployeDetailView.as_view(), name='employe_detail'),
     path('employes/creer/', views.EmployeCreateView.as_view(), name='employe_create'),
     path('employes/<int:pk>/modifier/', views.EmployeUpdateView.as_view(), name='employe_update'),
@@ -13,36 +15,86 @@ urlpatterns = [
     # URLs pour les congés (côté RH)
     path('rh/conges/', views.CongeGestionListView.as_view(), name='conge_gestion_list'),
     path('rh/conges/<int:pk>/modifier/', views.CongeGestionUpdateView.as_view(), name='conge_gestion_update'),
+    path('rh/conges/traitement/', views.CongeTraitementMasseView.as_view(), name='conge_traitement_masse'),
+    path('rh/conges/traitement/api/', views.CongeTraitementMasseApiView.as_view(), name='conge_traitement_masse_api'),
 
-    # URLs pour les congés (côté employé)
+    # URLs du libre-service employé (congés, bulletins, présences)
     path('employe/conges/', views.CongeDemandeListView.as_view(), name='conge_demande_list'),
     path('employe/conges/demander/', views.CongeDemandeCreateView.as_view(), name='conge_demande_create'),
+    path('employe/fiches-paie/', views.FicheDePaieEmployeListView.as_view(), name='fiche_paie_employe_list'),
+    path('employe/presences/', views.PresenceEmployeListView.as_view(), name='presence_employe_list'),
 
     # URLs pour les présences
+    path('pointer/arrivee/', views.PointageView.as_view(sens='arrivee'), name='pointage_arrivee'),
+    path('pointer/depart/', views.PointageView.as_view(sens='depart'), name='pointage_depart'),
     path('presences/', views.PresenceListView.as_view(), name='presence_list'),
     path('presences/creer/', views.PresenceCreateView.as_view(), name='presence_create'),
+    path('presences/importer/', views.PresenceImportView.as_view(), name='presence_import'),
+    path('presences/exporter/', views.PresenceExportView.as_view(), name='presence_export'),
     path('presences/<int:pk>/modifier/', views.PresenceUpdateView.as_view(), name='presence_update'),
     path('presences/<int:pk>/supprimer/', views.PresenceDeleteView.as_view(), name='presence_delete'),
 
     # URLs pour les fiches de paie (côté RH)
     path('rh/fiches-paie/', views.FicheDePaieListView.as_view(), name='fiche_paie_list'),
     path('rh/fiches-paie/creer/', views.FicheDePaieCreateView.as_view(), name='fiche_paie_create'),
+    path('rh/fiches-paie/lancer/', views.FicheDePaieLancementView.as_view(), name='fiche_paie_lancement'),
+    path('rh/fiches-paie/exporter/', views.FicheDePaieExportView.as_view(), name='fiche_paie_export'),
+    path('rh/fiches-paie/bulletins/', views.FicheDePaieArchiveView.as_view(), name='fiche_paie_archive'),
     path('rh/fiches-paie/<int:pk>/', views.FicheDePaieDetailView.as_view(), name='fiche_paie_detail'),
+    path('rh/fiches-paie/<int:pk>/pdf/', views.FicheDePaiePdfView.as_view(), name='fiche_paie_pdf'),
     path('rh/fiches-paie/<int:pk>/modifier/', views.FicheDePaieUpdateView.as_view(), name='fiche_paie_update'),
     path('rh/fiches-paie/<int:pk>/supprimer/', views.FicheDePaieDeleteView.as_view(), name='fiche_paie_delete'),
+
+    # Tableau de bord RH
+    path('rh/tableau-de-bord/', views.TableauDeBordView.as_view(), name='tableau_de_bord'),
+    path('rh/tableau-de-bord/actualiser/', views.TableauDeBordActualiserView.as_view(), name='tableau_de_bord_actualiser'),
+
+    # URLs pour les départements et les postes
+    path('rh/departements/', views.DepartementListView.as_view(), name='departement_list'),
+    path('rh/departements/creer/', views.DepartementCreateView.as_view(), name='departement_create'),
+    path('rh/departements/<int:pk>/modifier/', views.DepartementUpdateView.as_view(), name='departement_update'),
+    path('rh/departements/<int:pk>/supprimer/', views.DepartementDeleteView.as_view(), name='departement_delete'),
+    path('rh/postes/', views.PosteListView.as_view(), name='poste_list'),
+    path('rh/postes/creer/', views.PosteCreateView.as_view(), name='poste_create'),
+    path('rh/postes/<int:pk>/modifier/', views.PosteUpdateView.as_view(), name='poste_update'),
+    path('rh/postes/<int:pk>/supprimer/', views.PosteDeleteView.as_view(), name='poste_delete'),
+
+    # URLs pour les tâches de fond
+    path('rh/taches/', views.TacheListView.as_view(), name='tache_list'),
+    path('rh/taches/<int:pk>/', views.TacheDetailView.as_view(), name='tache_detail'),
+    path('rh/taches/<int:pk>/statut/', views.TacheStatutView.as_view(), name='tache_statut'),
+    path('rh/taches/<int:pk>/relancer/', views.TacheRelancerView.as_view(), name='tache_relancer'),
+    path('rh/taches/<int:pk>/fichier/', views.TacheFichierView.as_view(), name='tache_fichier'),
     
-    # Ajouter ici les URLs pour Formations, Annonces, Avantages, Primes, Rôles, Utilisateurs)
+    # URLs pour les formations
+    path('rh/formations/', views.FormationListView.as_view(), name='formation_list'),
+    path('rh/formations/creer/', views.FormationCreateView.as_view(), name='formation_create'),
+    path('rh/formations/<int:pk>/modifier/', views.FormationUpdateView.as_view(), name='formation_update'),
+    path('rh/formations/<int:pk>/supprimer/', views.FormationDeleteView.as_view(), name='formation_delete'),
+    path('rh/formations/<int:pk>/participants/', views.FormationParticipantsView.as_view(), name='formation_participants'),
+    path('rh/formations/<int:pk>/inscrire-service/', views.FormationInscriptionServiceView.as_view(), name='formation_inscription_service'),
+    path('formations/', views.FormationCatalogueView.as_view(), name='formation_catalogue'),
+    path('formations/<int:pk>/inscription/', views.FormationInscriptionView.as_view(), name='formation_inscription'),
+    path('formations/<int:pk>/desinscription/', views.FormationInscriptionView.as_view(action='desinscrire'), name='formation_desinscription'),
+
+    # Ajouter ici les URLs pour Annonces, Avantages, Primes, Rôles, Utilisateurs)
     path('roles/', views.RoleListView.as_view(), name='role_list'),
     path('roles/creer/', views.RoleCreateView.as_view(), name='role_create'),
     path('roles/<int:pk>/modifier/', views.RoleUpdateView.as_view(), name='role_update'),
     path('roles/<int:pk>/supprimer/', views.RoleDeleteView.as_view(), name='role_delete'),
     path('utilisateurs/', views.UtilisateurListView.as_view(), name='utilisateur_list'),
     path('utilisateurs/creer/', views.UtilisateurCreateView.as_view(), name='utilisateur_create'),
+    path('utilisateurs/importer/', views.UtilisateurImportView.as_view(), name='utilisateur_import'),
     path('utilisateurs/<int:pk>/modifier/', views.UtilisateurUpdateView.as_view(), name='utilisateur_update'),
     path('utilisateurs/<int:pk>/supprimer/', views.UtilisateurDeleteView.as_view(), name='utilisateur_delete'), 
+    path('instrumentation/', views.InstrumentationRapportView.as_view(), name='instrumentation_rapport'),
     
     
     # Exemple pour les annonces
     path('annonces/', views.AnnonceListView.as_view(), name='annonce_list'),
     path('annonces/creer/', views.AnnonceCreateView.as_view(), name='annonce_create'),
+    path('annonces/recherche/', views.AnnonceRechercheView.as_view(), name='annonce_recherche'),
+    path('annonces/<int:pk>/', views.AnnonceDetailView.as_view(), name='annonce_detail'),
+    path('annonces/<int:pk>/modifier/', views.AnnonceUpdateView.as_view(), name='annonce_update'),
+    path('annonces/<int:pk>/supprimer/', views.AnnonceDeleteView.as_view(), name='annonce_delete'),
 ]
\ No newline at end of file
@@ -1,51 +1,138 @@
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import (
+    View,
     ListView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView,
+    FormView,
+    TemplateView,
 )
+from django.views.generic.base import ContextMixin, TemplateResponseMixin
 from .models import (
     Employe, Conge, Presence, Annonce, Avantage, Prime, Role,
-    FicheDePaie, FichePaiePrime, FichePaieAvantage,
-    Utilisateur
+    FicheDePaie, FicheDePaieArchivee, FichePaiePrime, FichePaieAvantage,
+    Utilisateur, Tache, Departement, Poste, PresenceMensuelle, Formation, ParticipationFormation
 )
 from .forms import (
     EmployeForm, CongeForm, PresenceForm, AnnonceForm, AvantageForm, PrimeForm,
-    FicheDePaieForm, RoleForm, UtilisateurCreationForm, UtilisateurUpdateForm
+    FicheDePaieForm, RoleForm, UtilisateurCreationForm, UtilisateurUpdateForm,
+    LancementPaieForm, ImportPresenceForm, ImportEmployesForm, DepartementForm, PosteForm, TraitementCongesForm,
+    FormationForm, InscriptionServiceForm
+)
+from . import annonces, autocompletion
+from .annuaire import LIMITE_PAR_DEFAUT, rechercher
+from .archives_paie import annee_archivee, lignes_export as lignes_archive_export
+from .assiduite import presences_du_mois
+from .bulletins import (
+    ProductionBulletins, chemin_bulletin, donnees_bulletin_archive, donnees_bulletins, flux_archive, nom_fichier,
 )
+from .conges import ErreurTraitement, asolde, solde, soldes_par_employe, traiter_demandes, verifier_conge
+from .exports import lignes_fiches, lignes_presences, reponse_export
+from .formations import ErreurInscription, changer_capacite, desinscrire, inscrire, inscrire_service
+from .instrumentation import rapport, tampon
+from .pagination import FiltresMixin, KeysetPaginationMixin, decoder_curseur
+from .pointage import EmployeInconnu, format_depuis_nom, pointer_arrivee, pointer_depart
+from .recherche_annonces import rechercher_annonces
+from .referentiels import effectifs_par_departement
+from .tableau_de_bord import NB_MOIS_MAX, NB_MOIS_PAR_DEFAUT, bornes, donnees_tableau_de_bord
+from .taches import enregistrer_fichier, planifier, planifier_unique, relancer, tache_en_file
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, ProtectedError, Q, Subquery
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 
 # --- Mixins de Permissions pour Admin et RH ---
-# A adapter selon vos besoins précis
-# Supposons que l'Admin a le rôle 'Admin' et que le RH a le rôle 'RH'
+# L'Admin a le rôle 'Admin' et le RH le rôle 'RH' (voir Role.ADMIN / Role.RH).
+# Les indicateurs is_admin / is_rh sont calculés sur l'utilisateur chargé avec
+# son rôle par RoleModelBackend : ces tests ne font aucune requête.
+# AnonymousUser n'a pas ces attributs, d'où le getattr.
 class AdminRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.role and self.request.user.role.nom_role == 'Admin'
+        return getattr(self.request.user, 'is_admin', False)
 
 class RhRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.role and self.request.user.role.nom_role == 'RH'
+        return getattr(self.request.user, 'is_rh', False)
 
 # Combine les deux pour les vues accessibles aux deux rôles
 class AdminOrRhRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        is_admin = self.request.user.is_authenticated and self.request.user.role and self.request.user.role.nom_role == 'Admin'
-        is_rh = self.request.user.is_authenticated and self.request.user.role and self.request.user.role.nom_role == 'RH'
-        return is_admin or is_rh
+        return getattr(self.request.user, 'is_admin_or_rh', False)
+
+# --- Pages asynchrones du libre-service employé ---
+# Pages en lecture, très sollicitées aux mêmes heures : l'utilisateur est
+# chargé par request.auser() et les données par l'ORM asynchrone avant le
+# rendu (le gabarit ne fait aucune requête). Sous ASGI, un worker sert
+# d'autres employés pendant ces lectures ; sous WSGI, Django exécute la vue
+# dans une boucle propre à la requête : mêmes URL, mêmes pages.
+class LectureAsyncView(ContextMixin, TemplateResponseMixin, View):
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data(**await self.donnees(request)))
+
+    async def donnees(self, request):
+        """Contexte propre à la page, lu par l'ORM asynchrone."""
+        return {}
 
 # ==============================================
 # Vues pour le modèle Employe (Gérées par le RH)
 # ==============================================
 
-class EmployeListView(AdminOrRhRequiredMixin, ListView):
+class EmployeListView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
     model = Employe
     template_name = 'rh/employe_list.html'
     context_object_name = 'employes'
+    queryset = Employe.objects.select_related('departement', 'poste')
+    cles_tri = ('nom', 'pk')
+    filtres = {'departement': 'departement', 'poste': 'poste'}
+
+class AnnuaireRechercheView(LoginRequiredMixin, View):
+    """Recherche d'employés pour la saisie semi-automatique (?q=&limite=), en JSON."""
+
+    def get(self, request):
+        try:
+            limite = min(50, max(1, int(request.GET.get('limite', LIMITE_PAR_DEFAUT))))
+        except ValueError:
+            limite = LIMITE_PAR_DEFAUT
+        return JsonResponse({'resultats': rechercher(request.GET.get('q', ''), limite)})
+
+class AutocompletionView(LoginRequiredMixin, View):
+    """Choix d'un champ à saisie semi-automatique (?q=&page=), en JSON : {resultats: [{id, texte}], plus}."""
+
+    def get(self, request, source):
+        choix = autocompletion.SOURCES.get(source)
+        if choix is None:
+            raise Http404("Source de saisie semi-automatique inconnue.")
+        if choix.rh_seulement and not getattr(request.user, 'is_admin_or_rh', False):
+            return JsonResponse({'erreur': "Accès réservé aux RH."}, status=403)
+        try:
+            page = min(autocompletion.PAGES_MAX, max(1, int(request.GET.get('page', 1))))
+        except ValueError:
+            page = 1
+        debut = (page - 1) * autocompletion.TAILLE_PAGE
+        # Un choix de plus que la page : il indique seulement s'il y a une page suivante.
+        lignes = choix.fonction(request.GET.get('q', '').strip(), debut, debut + autocompletion.TAILLE_PAGE + 1)
+        return JsonResponse({
+            'resultats': [{'id': cle, 'texte': texte} for cle, texte in lignes[:autocompletion.TAILLE_PAGE]],
+            'plus': len(lignes) > autocompletion.TAILLE_PAGE and page < autocompletion.PAGES_MAX,
+        })
 
 class EmployeDetailView(AdminOrRhRequiredMixin, DetailView):
     model = Employe
@@ -77,14 +164,18 @@ class EmployeDeleteView(AdminOrRhRequiredMixin, DeleteView):
 # ==================================================
 
 # Vues pour l'employé pour faire sa demande
-class CongeDemandeListView(LoginRequiredMixin, ListView):
-    model = Conge
+class CongeDemandeListView(LectureAsyncView):
     template_name = 'employe/conge_demande_list.html'
-    context_object_name = 'conges_demandes'
 
-    def get_queryset(self):
-        # Ne montrer que les congés de l'utilisateur connecté
-        return Conge.objects.filter(employe__utilisateur=self.request.user)
+    async def donnees(self, request):
+        # Ne montrer que les congés de l'utilisateur connecté (clé de l'employé = clé de l'utilisateur)
+        conges = [conge async for conge in Conge.objects.filter(employe_id=request.user.pk).select_related('employe').order_by('-date_debut')]
+        return {
+            'object_list': conges,
+            'conges_demandes': conges,
+            # Solde de l'année en cours, lu directement (pas de somme sur l'historique)
+            'solde': await asolde(request.user.pk, timezone.localdate().year),
+        }
 
 class CongeDemandeCreateView(LoginRequiredMixin, CreateView):
     model = Conge
@@ -93,6 +184,18 @@ class CongeDemandeCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('conge_demande_list')
 
     def form_valid(self, form):
+        verification = verifier_conge(
+            self.request.user.pk, form.cleaned_data['date_debut'], form.cleaned_data['date_fin'],
+        )
+        if verification.chevauche:
+            form.add_error(None, "Cette période chevauche un congé déjà demandé ou validé.")
+            return self.form_invalid(form)
+        if verification.absences_max:
+            messages.info(
+                self.request,
+                f"Jusqu'à {verification.absences_max} collègue(s) du service {verification.service} "
+                f"sont déjà en congé sur cette période."
+            )
         # Assigner l'employé connecté automatiquement
         form.instance.employe = self.request.user.employe
         # Le statut est 'DEMANDE' par défaut dans le modèle, ce qui est correct
@@ -100,10 +203,23 @@ class CongeDemandeCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
     
 # Vues pour le RH pour gérer les congés
-class CongeGestionListView(AdminOrRhRequiredMixin, ListView):
+class CongeGestionListView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
     model = Conge
     template_name = 'rh/conge_gestion_list.html'
     context_object_name = 'conges'
+    queryset = Conge.objects.select_related('employe')
+    cles_tri = ('-date_debut', '-id')
+    # Un congé est retenu s'il chevauche la période [du, au].
+    filtres = {'statut': 'statut', 'departement': 'employe__departement', 'du': 'date_fin__gte', 'au': 'date_debut__lte'}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Soldes de l'année en cours des employés de la page, en une requête
+        conges = context['object_list']
+        soldes = soldes_par_employe({c.employe_id for c in conges}, timezone.localdate().year)
+        for conge in conges:
+            conge.solde = soldes[conge.employe_id]
+        return context
 
 class CongeGestionUpdateView(AdminOrRhRequiredMixin, UpdateView):
     model = Conge
@@ -111,6 +227,80 @@ class CongeGestionUpdateView(AdminOrRhRequiredMixin, UpdateView):
     template_name = 'rh/conge_gestion_form.html'
     success_url = reverse_lazy('conge_gestion_list')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['solde'] = solde(self.object.employe_id, self.object.date_debut.year)
+        # Chevauchements et collègues absents, pour éclairer la validation
+        context['verification'] = verifier_conge(
+            self.object.employe_id, self.object.date_debut, self.object.date_fin, exclure_pk=self.object.pk,
+        )
+        return context
+
+class CongeTraitementMasseView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    Demandes en attente, cochées puis validées ou refusées en une fois
+    (voir conges.traiter_demandes). Les soldes sont affichés comme dans la
+    liste de gestion.
+    """
+    model = Conge
+    template_name = 'rh/conge_traitement_masse.html'
+    context_object_name = 'conges'
+    queryset = Conge.objects.filter(statut='DEMANDE').select_related('employe')
+    cles_tri = ('date_debut', 'id')
+    filtres = {'departement': 'employe__departement', 'du': 'date_fin__gte', 'au': 'date_debut__lte'}
+    taille_page = 500
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        conges = context['object_list']
+        soldes = soldes_par_employe({c.employe_id for c in conges}, timezone.localdate().year)
+        for conge in conges:
+            conge.solde = soldes[conge.employe_id]
+        context['form'] = kwargs.get('form') or TraitementCongesForm()
+        return context
+
+    def post(self, request, *args, **kwargs):
+        form = TraitementCongesForm(request.POST)
+        if not form.is_valid():
+            self.object_list = self.get_queryset()
+            return self.render_to_response(self.get_context_data(form=form))
+        try:
+            resultat = traiter_demandes(form.cleaned_data['conges'], form.cleaned_data['statut'], request.user)
+        except ErreurTraitement as exc:
+            messages.error(request, str(exc))
+        else:
+            decision = 'validée(s)' if resultat.statut == 'VALIDE' else 'refusée(s)'
+            messages.success(request, f"{len(resultat.traites)} demande(s) {decision}.")
+            if resultat.ignores:
+                messages.warning(request, f"{len(resultat.ignores)} demande(s) ignorée(s) : " + ', '.join(
+                    f"n° {pk} ({motif})" for pk, motif in sorted(resultat.ignores.items())[:20]
+                ))
+        return redirect(request.get_full_path())
+
+class CongeTraitementMasseApiView(AdminOrRhRequiredMixin, View):
+    """
+    Traitement en masse en JSON : {"conges": [ids], "statut": "VALIDE" | "REFUSE"}.
+    Répond {"traites": [...], "ignores": {id: motif}, "tache": id} en un aller-retour.
+    """
+    http_method_names = ['post']
+
+    def post(self, request):
+        try:
+            donnees = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'erreurs': {'__all__': ["Corps JSON invalide."]}}, status=400)
+        form = TraitementCongesForm(donnees if isinstance(donnees, dict) else {})
+        if not form.is_valid():
+            return JsonResponse({'erreurs': form.errors}, status=400)
+        try:
+            resultat = traiter_demandes(form.cleaned_data['conges'], form.cleaned_data['statut'], request.user)
+        except ErreurTraitement as exc:
+            return JsonResponse({'erreurs': {'__all__': [str(exc)]}}, status=409)
+        return JsonResponse({
+            'statut': resultat.statut, 'traites': resultat.traites,
+            'ignores': resultat.ignores, 'tache': resultat.tache_id,
+        })
+
 # =====================================================
 # Vues pour le modèle Presence (Gérées par le RH/Admin)
 # =====================================================
@@ -118,10 +308,65 @@ class CongeGestionUpdateView(AdminOrRhRequiredMixin, UpdateView):
 # "Pointer" (pour l'employé) peut être une vue simple qui enregistre l'heure d'arrivée/départ.
 # "Gérer les présences" (pour le RH) est une vue CRUD classique.
 
-class PresenceListView(AdminOrRhRequiredMixin, ListView):
+class PointageView(LoginRequiredMixin, View):
+    """
+    Pointage de l'employé connecté (arrivée ou départ), sans formulaire.
+
+    La clé primaire d'Employe étant celle de l'Utilisateur, le pointage se fait
+    directement avec request.user.pk sans charger le profil employé.
+    """
+    http_method_names = ['post']
+    sens = 'arrivee'
+
+    def post(self, request, *args, **kwargs):
+        if self.sens == 'arrivee':
+            try:
+                heure = pointer_arrivee(request.user.pk)
+            except EmployeInconnu:
+                return JsonResponse({'erreur': "Aucun profil employé pour cet utilisateur."}, status=403)
+        else:
+            heure = pointer_depart(request.user.pk)
+            if heure is None:
+                return JsonResponse({'erreur': "Aucune arrivée pointée aujourd'hui."}, status=409)
+        return JsonResponse({'sens': self.sens, 'heure': heure.strftime('%H:%M:%S')})
+
+class PresenceEmployeListView(LectureAsyncView):
+    """Pointages et totaux du mois (?annee=&mois=, mois courant par défaut) de l'employé connecté."""
+    template_name = 'employe/presence_list.html'
+
+    async def donnees(self, request):
+        aujourd_hui = timezone.localdate()
+        try:
+            annee = int(request.GET.get('annee', aujourd_hui.year))
+            mois = int(request.GET.get('mois', aujourd_hui.month))
+            debut, fin = bornes(annee, mois)
+        except ValueError:
+            annee, mois = aujourd_hui.year, aujourd_hui.month
+            debut, fin = bornes(annee, mois)
+        presences = [
+            presence async for presence in Presence.objects.filter(
+                employe_id=request.user.pk, journee__date_journee__range=(debut, fin),
+            ).select_related('employe', 'journee').order_by('journee__date_journee')
+        ]
+        agregat = await PresenceMensuelle.objects.filter(employe_id=request.user.pk, annee=annee, mois=mois).afirst()
+        return {
+            'object_list': presences,
+            'presences': presences,
+            'presences_du_mois': agregat or PresenceMensuelle(employe_id=request.user.pk, annee=annee, mois=mois),
+            'mois_affiche': debut,
+        }
+
+class PresenceListView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
     model = Presence
     template_name = 'rh/presence_list.html'
     context_object_name = 'presences'
+    queryset = Presence.objects.select_related('employe', 'journee')
+    cles_tri = ('-journee__date_journee', '-id')
+    filtres = {
+        'departement': 'employe__departement',
+        'du': 'journee__date_journee__gte',
+        'au': 'journee__date_journee__lte',
+    }
 
 class PresenceCreateView(AdminOrRhRequiredMixin, CreateView):
     model = Presence
@@ -140,14 +385,107 @@ class PresenceDeleteView(AdminOrRhRequiredMixin, DeleteView):
     template_name = 'rh/presence_confirm_delete.html'
     success_url = reverse_lazy('presence_list')
 
+class PresenceExportView(AdminOrRhRequiredMixin, FiltresMixin, View):
+    """Export en flux des présences (?format=csv|xlsx), avec les filtres de la liste."""
+    filtres = PresenceListView.filtres
+
+    def get(self, request, *args, **kwargs):
+        format_export = request.GET.get('format', 'csv')
+        if format_export not in ('csv', 'xlsx'):
+            raise Http404("Format d'export inconnu.")
+        presences = self.filtrer(Presence.objects.all())
+        return reponse_export(lignes_presences(presences), format_export, 'presences')
+
+class PresenceImportView(AdminOrRhRequiredMixin, FormView):
+    """Import en masse d'un export de badgeuse."""
+    form_class = ImportPresenceForm
+    template_name = 'rh/presence_import.html'
+    success_url = reverse_lazy('presence_list')
+
+    def form_valid(self, form):
+        # Le fichier est copié sur disque puis importé par un worker (voir gestion_rh.taches).
+        fichier = form.cleaned_data['fichier']
+        chemin = enregistrer_fichier(fichier)
+        tache = planifier('importer_presences', {
+            'fichier': str(chemin), 'format_fichier': format_depuis_nom(fichier.name),
+        }, demandeur=self.request.user)
+        messages.success(self.request, f"Import planifié (tâche n°{tache.pk}).")
+        return redirect('tache_detail', pk=tache.pk)
+
 # =====================================================
 # Vues pour le modèle FicheDePaie (Gérées par le RH)
 # =====================================================
 
-class FicheDePaieListView(AdminOrRhRequiredMixin, ListView):
+class FicheDePaieEmployeListView(LectureAsyncView):
+    """
+    Bulletins émis de l'employé connecté, du plus récent au plus ancien, y
+    compris ceux des années archivées (FicheDePaieArchivee, voir archives_paie).
+    """
+    template_name = 'employe/fiche_paie_list.html'
+
+    async def donnees(self, request):
+        employe = await Employe.objects.filter(pk=request.user.pk).afirst()
+        historique = await sync_to_async(FicheDePaie.objects.de_l_employe)(request.user.pk)
+        fiches = [fiche for fiche in reversed(historique) if fiche.statut == 'EMISE']
+        for fiche in fiches:
+            fiche.employe = employe  # Le gabarit ne fait aucune requête.
+        return {'object_list': fiches, 'fiches_paie': fiches}
+
+class FicheDePaieListView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
     model = FicheDePaie
     template_name = 'rh/fiche_paie_list.html'
     context_object_name = 'fiches_paie'
+    queryset = FicheDePaie.objects.select_related('employe')
+    cles_tri = ('-annee', '-mois', '-id')
+    filtres = {'mois': 'mois', 'annee': 'annee', 'statut': 'statut', 'departement': 'employe__departement'}
+
+    def get(self, request, *args, **kwargs):
+        annee, mois = request.GET.get('annee', ''), request.GET.get('mois', '')
+        if not (annee.isdigit() and annee_archivee(int(annee))):
+            return super().get(request, *args, **kwargs)
+        # Année archivée : ses fiches ne sont plus en table. Un mois se relit de
+        # l'archive ; l'année entière n'est pas listée, le contexte le signale.
+        fiches = []
+        if mois.isdigit():
+            fiches = self.filtrer_archive(FicheDePaie.objects.de_la_periode(int(annee), int(mois)))
+        self.object_list = fiches
+        self.filtres_actifs = {cle: request.GET[cle] for cle in self.filtres if request.GET.get(cle)}
+        return self.render_to_response(self.get_context_data(annee_archivee=int(annee)))
+
+    def filtrer_archive(self, fiches):
+        """Filtres statut et département, puis curseur `apres`, appliqués aux fiches relues de l'archive."""
+        statut, departement = self.request.GET.get('statut'), self.request.GET.get('departement')
+        fiches = [
+            fiche for fiche in fiches
+            if (not statut or fiche.statut == statut)
+            and (not departement or str(fiche.departement_id) == departement)
+        ]
+        fiches.sort(key=lambda fiche: fiche.pk, reverse=True)
+        curseur = self.request.GET.get('apres')
+        if curseur:
+            try:
+                valeurs = decoder_curseur(curseur)
+                fiches = [fiche for fiche in fiches if fiche.pk < valeurs[-1]]
+            except (TypeError, ValueError, IndexError):
+                pass
+        return fiches
+
+class FicheDePaieExportView(AdminOrRhRequiredMixin, FiltresMixin, View):
+    """Export en flux des fiches de paie et de leurs lignes (?format=csv|xlsx)."""
+    filtres = FicheDePaieListView.filtres
+
+    def get(self, request, *args, **kwargs):
+        format_export = request.GET.get('format', 'csv')
+        if format_export not in ('csv', 'xlsx'):
+            raise Http404("Format d'export inconnu.")
+        annee = self.request.GET.get('annee', '')
+        if annee.isdigit() and annee_archivee(int(annee)):
+            # Année archivée : export relu de l'archive (filtres mois uniquement).
+            mois = self.request.GET.get('mois', '')
+            lignes = lignes_archive_export(int(annee), int(mois) if mois.isdigit() else None)
+            return reponse_export(lignes, format_export, 'fiches_de_paie')
+        fiches = self.filtrer(FicheDePaie.objects.all())
+        return reponse_export(lignes_fiches(fiches), format_export, 'fiches_de_paie')
 
 class FicheDePaieCreateView(AdminOrRhRequiredMixin, CreateView):
     model = FicheDePaie
@@ -160,6 +498,63 @@ class FicheDePaieDetailView(AdminOrRhRequiredMixin, DetailView):
     template_name = 'rh/fiche_paie_detail.html'
     context_object_name = 'fiche_paie'
 
+    def get_object(self, queryset=None):
+        # Une fiche d'une année archivée reste consultable (FicheDePaieArchivee, en lecture seule).
+        fiche = FicheDePaie.objects.trouver(self.kwargs['pk'])
+        if fiche is None:
+            raise Http404("Fiche de paie introuvable.")
+        return fiche
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Heures, retards et départs non pointés du mois, lus dans l'agrégat
+        context['presences_du_mois'] = presences_du_mois(
+            [self.object.employe_id], self.object.annee, self.object.mois,
+        )[self.object.employe_id]
+        return context
+
+class FicheDePaiePdfView(AdminOrRhRequiredMixin, View):
+    """Bulletin PDF d'une fiche, servi depuis le cache s'il n'a pas changé."""
+
+    def get(self, request, pk):
+        fiche = FicheDePaie.objects.trouver(pk)
+        if fiche is None:
+            raise Http404("Fiche de paie introuvable.")
+        if isinstance(fiche, FicheDePaieArchivee):
+            bulletins = [donnees_bulletin_archive(fiche)]
+        else:
+            bulletins = donnees_bulletins(FicheDePaie.objects.filter(pk=pk))
+        bulletin = next(iter(ProductionBulletins(bulletins)), None)
+        if bulletin is None:
+            raise Http404("Fiche de paie introuvable.")
+        return FileResponse(open(chemin_bulletin(bulletin), 'rb'), as_attachment=True,
+                            filename=nom_fichier(bulletin), content_type='application/pdf')
+
+class FicheDePaieArchiveView(AdminOrRhRequiredMixin, View):
+    """
+    Archive ZIP des bulletins d'un mois (?mois=&annee=) : en GET, envoyée au
+    fil du rendu ; en POST, produite par une tâche de fond puis téléchargée
+    depuis la page de la tâche.
+    """
+
+    def post(self, request):
+        form = LancementPaieForm(request.POST)
+        if not form.is_valid():
+            raise Http404("Période invalide.")
+        tache = planifier('generer_bulletins', form.cleaned_data, demandeur=request.user)
+        messages.success(request, f"Production des bulletins planifiée (tâche n°{tache.pk}).")
+        return redirect('tache_detail', pk=tache.pk)
+
+    def get(self, request):
+        form = LancementPaieForm(request.GET)
+        if not form.is_valid():
+            raise Http404("Période invalide.")
+        mois, annee = form.cleaned_data['mois'], form.cleaned_data['annee']
+        bulletins = ProductionBulletins(donnees_bulletins(FicheDePaie.objects.filter(mois=mois, annee=annee)))
+        reponse = StreamingHttpResponse(flux_archive(bulletins), content_type='application/zip')
+        reponse['Content-Disposition'] = f'attachment; filename="bulletins_{annee}-{mois:02d}.zip"'
+        return reponse
+
 class FicheDePaieUpdateView(AdminOrRhRequiredMixin, UpdateView):
     model = FicheDePaie
     form_class = FicheDePaieForm
@@ -171,6 +566,161 @@ class FicheDePaieDeleteView(AdminOrRhRequiredMixin, DeleteView):
     template_name = 'rh/fiche_paie_confirm_delete.html'
     success_url = reverse_lazy('fiche_paie_list')
 
+class FicheDePaieLancementView(AdminOrRhRequiredMixin, FormView):
+    """Planifie le calcul de la paie de tous les employés pour un mois (tâche de fond)."""
+    form_class = LancementPaieForm
+    template_name = 'rh/fiche_paie_lancement.html'
+
+    def form_valid(self, form):
+        tache = planifier('lancer_paie', form.cleaned_data, demandeur=self.request.user)
+        messages.success(
+            self.request,
+            f"Calcul de la paie {form.cleaned_data['mois']:02d}/{form.cleaned_data['annee']} planifié "
+            f"(tâche n°{tache.pk})."
+        )
+        return redirect('tache_detail', pk=tache.pk)
+
+# ==============================================
+# Vues pour les tâches de fond (suivi par le RH)
+# ==============================================
+
+class TacheListView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
+    model = Tache
+    template_name = 'rh/tache_list.html'
+    context_object_name = 'taches'
+    queryset = Tache.objects.select_related('demandeur').defer('erreur', 'parametres')
+    filtres = {'statut': 'statut', 'type': 'type_tache'}
+
+class TacheDetailView(AdminOrRhRequiredMixin, DetailView):
+    model = Tache
+    template_name = 'rh/tache_detail.html'
+    context_object_name = 'tache'
+
+class TacheStatutView(AdminOrRhRequiredMixin, View):
+    """État d'une tâche en JSON, interrogé périodiquement par la page de suivi."""
+
+    def get(self, request, pk):
+        etat = Tache.objects.filter(pk=pk).values(
+            'statut', 'progression', 'message', 'tentatives', 'max_tentatives', 'resultat',
+            'date_debut', 'date_fin',
+        ).first()
+        if etat is None:
+            raise Http404("Tâche introuvable.")
+        return JsonResponse(etat)
+
+class TacheRelancerView(AdminOrRhRequiredMixin, View):
+    def post(self, request, pk):
+        if relancer(pk):
+            messages.success(request, "Tâche remise en file.")
+        else:
+            messages.error(request, "Seule une tâche échouée peut être relancée.")
+        return redirect('tache_detail', pk=pk)
+
+class TacheFichierView(AdminOrRhRequiredMixin, View):
+    """Télécharge le fichier produit par une tâche terminée."""
+
+    def get(self, request, pk):
+        tache = get_object_or_404(Tache, pk=pk, statut='TERMINEE')
+        chemin = (tache.resultat or {}).get('fichier')
+        if not chemin:
+            raise Http404("Cette tâche n'a produit aucun fichier.")
+        try:
+            return FileResponse(open(chemin, 'rb'), as_attachment=True)
+        except FileNotFoundError:
+            raise Http404("Fichier expiré ou supprimé.")
+
+# ======================================
+# Tableau de bord RH (synthèses en cache)
+# ======================================
+
+class TableauDeBordView(AdminOrRhRequiredMixin, TemplateView):
+    """
+    Indicateurs RH lus dans les synthèses mensuelles (voir gestion_rh.tableau_de_bord).
+    L'affichage n'écrit rien : les mois marqués sont recalculés par la tâche que
+    les workers planifient d'eux-mêmes, affichée ici si elle est en file.
+    """
+    template_name = 'rh/tableau_de_bord.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            nb_mois = min(max(int(self.request.GET.get('mois', NB_MOIS_PAR_DEFAUT)), 1), NB_MOIS_MAX)
+        except ValueError:
+            nb_mois = NB_MOIS_PAR_DEFAUT
+        context.update(donnees_tableau_de_bord(nb_mois))
+        if context['etat']['a_recalculer']:
+            context['tache_actualisation'] = tache_en_file('rafraichir_tableau_de_bord')
+        return context
+
+class TableauDeBordActualiserView(AdminOrRhRequiredMixin, View):
+    """Planifie le recalcul complet des synthèses (après une correction de données en masse)."""
+
+    def post(self, request):
+        tache = planifier_unique('rafraichir_tableau_de_bord', {'tout': True}, demandeur=request.user)
+        messages.success(request, f"Recalcul du tableau de bord planifié (tâche n°{tache.pk}).")
+        return redirect('tache_detail', pk=tache.pk)
+
+# =========================================================
+# Vues pour les départements et les postes (Gérés par le RH)
+# =========================================================
+
+class ReferentielDeleteMixin:
+    """Refuse proprement la suppression d'un référentiel encore affecté à des employés."""
+
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ProtectedError:
+            messages.error(self.request, "Suppression impossible : des employés y sont encore rattachés.")
+            return redirect(self.success_url)
+
+class DepartementListView(AdminOrRhRequiredMixin, ListView):
+    """Départements avec effectif et masse salariale de base."""
+    template_name = 'rh/departement_list.html'
+    context_object_name = 'departements'
+
+    def get_queryset(self):
+        return effectifs_par_departement()
+
+class DepartementCreateView(AdminOrRhRequiredMixin, CreateView):
+    model = Departement
+    form_class = DepartementForm
+    template_name = 'rh/departement_form.html'
+    success_url = reverse_lazy('departement_list')
+
+class DepartementUpdateView(AdminOrRhRequiredMixin, UpdateView):
+    model = Departement
+    form_class = DepartementForm
+    template_name = 'rh/departement_form.html'
+    success_url = reverse_lazy('departement_list')
+
+class DepartementDeleteView(AdminOrRhRequiredMixin, ReferentielDeleteMixin, DeleteView):
+    model = Departement
+    template_name = 'rh/departement_confirm_delete.html'
+    success_url = reverse_lazy('departement_list')
+
+class PosteListView(AdminOrRhRequiredMixin, ListView):
+    template_name = 'rh/poste_list.html'
+    context_object_name = 'postes'
+    queryset = Poste.objects.annotate(effectif=Count('employes')).order_by('intitule')
+
+class PosteCreateView(AdminOrRhRequiredMixin, CreateView):
+    model = Poste
+    form_class = PosteForm
+    template_name = 'rh/poste_form.html'
+    success_url = reverse_lazy('poste_list')
+
+class PosteUpdateView(AdminOrRhRequiredMixin, UpdateView):
+    model = Poste
+    form_class = PosteForm
+    template_name = 'rh/poste_form.html'
+    success_url = reverse_lazy('poste_list')
+
+class PosteDeleteView(AdminOrRhRequiredMixin, ReferentielDeleteMixin, DeleteView):
+    model = Poste
+    template_name = 'rh/poste_confirm_delete.html'
+    success_url = reverse_lazy('poste_list')
+
 # ==============================================================
 # Vues pour le modèle Formation (Gérées par le RH)
 # ==============================================================
@@ -179,36 +729,178 @@ class FicheDePaieDeleteView(AdminOrRhRequiredMixin, DeleteView):
 # Participer/Suivre implique le CRUD sur le modèle ParticipationFormation.
 
 class FormationListView(AdminOrRhRequiredMixin, ListView):
-    model = Annonce
+    """Formations avec places prises et longueur de la liste d'attente."""
     template_name = 'rh/formation_list.html'
     context_object_name = 'formations'
+    queryset = Formation.objects.annotate(
+        en_attente=Count('participationformation', filter=Q(participationformation__statut='ATTENTE')),
+    ).order_by('titre')
 
 class FormationCreateView(AdminOrRhRequiredMixin, CreateView):
-    model = Annonce
-    # Vous n'avez pas de formulaire pour Formation, il faudrait le créer
-    # form_class = FormationForm
+    model = Formation
+    form_class = FormationForm
     template_name = 'rh/formation_form.html'
     success_url = reverse_lazy('formation_list')
 
 class FormationUpdateView(AdminOrRhRequiredMixin, UpdateView):
-    model = Annonce
-    # form_class = FormationForm
+    model = Formation
+    form_class = FormationForm
     template_name = 'rh/formation_form.html'
     success_url = reverse_lazy('formation_list')
 
+    def form_valid(self, form):
+        with transaction.atomic():
+            if 'capacite' in form.changed_data and not changer_capacite(self.object.pk, form.cleaned_data['capacite']):
+                form.add_error('capacite', "La capacité ne peut pas être inférieure au nombre d'inscrits.")
+                return self.form_invalid(form)
+            # Capacité et places prises sont tenues par gestion_rh.formations :
+            # l'instance lue plus tôt ne doit pas les réécrire.
+            self.object.save(update_fields=['titre', 'description', 'duree_heures'])
+        return redirect(self.success_url)
+
 class FormationDeleteView(AdminOrRhRequiredMixin, DeleteView):
-    model = Annonce
+    model = Formation
     template_name = 'rh/formation_confirm_delete.html'
     success_url = reverse_lazy('formation_list')
 
+class FormationParticipantsView(AdminOrRhRequiredMixin, KeysetPaginationMixin, ListView):
+    """Participations d'une formation (?statut=), liste d'attente dans l'ordre d'arrivée."""
+    template_name = 'rh/formation_participants.html'
+    context_object_name = 'participations'
+    queryset = ParticipationFormation.objects.select_related('employe')
+    cles_tri = ('id',)
+    filtres = {'statut': 'statut'}
+
+    def get_queryset(self):
+        self.formation = get_object_or_404(Formation, pk=self.kwargs['pk'])
+        return super().get_queryset().filter(formation=self.formation)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['formation'] = self.formation
+        context['form'] = InscriptionServiceForm()
+        return context
+
+class FormationInscriptionServiceView(AdminOrRhRequiredMixin, View):
+    """Inscrit tout un service à une formation (voir formations.inscrire_service)."""
+    http_method_names = ['post']
+
+    def post(self, request, pk):
+        form = InscriptionServiceForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, "Service invalide.")
+            return redirect('formation_participants', pk=pk)
+        try:
+            resultat = inscrire_service(pk, form.cleaned_data['departement'].pk)
+        except ErreurInscription as exc:
+            messages.error(request, str(exc))
+            return redirect('formation_list')
+        messages.success(
+            request,
+            f"{len(resultat.inscrits)} employé(s) inscrit(s), {len(resultat.en_attente)} en liste d'attente, "
+            f"{resultat.deja_inscrits} déjà inscrit(s).",
+        )
+        return redirect('formation_participants', pk=pk)
+
+# Inscriptions en libre-service : clé de l'employé = clé de l'utilisateur.
+
+class FormationCatalogueView(LoginRequiredMixin, ListView):
+    """Formations proposées, avec le statut de participation de l'employé connecté."""
+    template_name = 'employe/formation_list.html'
+    context_object_name = 'formations'
+
+    def get_queryset(self):
+        statut = ParticipationFormation.objects.filter(
+            formation_id=OuterRef('pk'), employe_id=self.request.user.pk,
+        ).values('statut')
+        return Formation.objects.annotate(mon_statut=Subquery(statut)).order_by('titre')
+
+class FormationInscriptionView(LoginRequiredMixin, View):
+    """Inscription (ou désinscription) de l'employé connecté ; répond en JSON si Accept le demande."""
+    http_method_names = ['post']
+    action = 'inscrire'
+
+    def post(self, request, pk):
+        try:
+            if self.action == 'inscrire':
+                statut = inscrire(pk, request.user.pk)
+                message = ("Inscription enregistrée." if statut == 'INSCRIT'
+                           else "Formation complète : vous êtes en liste d'attente.")
+            else:
+                desinscrire(pk, request.user.pk)
+                statut, message = 'ANNULE', "Inscription annulée."
+        except IntegrityError:
+            erreur, code = "Aucun profil employé pour cet utilisateur.", 403
+        except ErreurInscription as exc:
+            erreur, code = str(exc), 409
+        else:
+            erreur = None
+        if 'application/json' in request.headers.get('Accept', ''):
+            if erreur:
+                return JsonResponse({'erreur': erreur}, status=code)
+            return JsonResponse({'formation': pk, 'statut': statut})
+        if erreur:
+            messages.error(request, erreur)
+        else:
+            messages.success(request, message)
+        return redirect('formation_catalogue')
+
 # =====================================================
 # Vues pour les Annonces (Gérées par l'Admin/RH)
 # =====================================================
 
-class AnnonceListView(LoginRequiredMixin, ListView):
-    model = Annonce
+class AnnonceListView(LectureAsyncView):
+    """
+    Fil des annonces (?page=), servi depuis le cache (voir gestion_rh.annonces).
+    Une page inchangée depuis la dernière visite répond 304 sans rendu ; une
+    page affichée marque les annonces comme lues.
+    """
     template_name = 'annoncelist.html'
-    context_object_name = 'annonces'
+
+    async def get(self, request, *args, **kwargs):
+        etat = await annonces.aetat_du_fil()
+        try:
+            numero = min(etat['nombre_pages'], max(1, int(request.GET.get('page', 1))))
+        except ValueError:
+            numero = 1
+        repere = await annonces.arepere_de_lecture(request)
+        etag, derniere_modification = annonces.validateurs(etat, numero, repere, request.user.pk)
+        reponse = get_conditional_response(request, etag=etag, last_modified=derniere_modification)
+        if reponse is None:
+            page = await annonces.apage_du_fil(etat, numero)
+            reponse = self.render_to_response(self.get_context_data(
+                object_list=page['annonces'], annonces=page['annonces'], fil=page['html'],
+                page=numero, nombre_pages=etat['nombre_pages'], non_lues=annonces.non_lues(etat, repere),
+            ))
+            await annonces.amarquer_lu(request, etat)
+        reponse.headers['ETag'] = etag
+        reponse.headers['Last-Modified'] = http_date(derniere_modification)
+        # Page propre à l'utilisateur : revalidée à chaque visite, jamais partagée.
+        patch_cache_control(reponse, private=True, no_cache=True)
+        return reponse
+
+class AnnonceRechercheView(LoginRequiredMixin, TemplateView):
+    """Recherche plein texte dans les annonces (?q=&page=), par pertinence."""
+    template_name = 'annonce_recherche.html'
+    par_page = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        requete = self.request.GET.get('q', '').strip()
+        try:
+            page = max(1, int(self.request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+        # Une annonce de plus que la page : elle indique seulement s'il existe une page suivante.
+        resultats = rechercher_annonces(requete, self.par_page + 1, (page - 1) * self.par_page) if requete else []
+        context.update({
+            'q': requete,
+            'resultats': resultats[:self.par_page],
+            'object_list': resultats[:self.par_page],
+            'page': page,
+            'page_suivante': page + 1 if len(resultats) > self.par_page else None,
+        })
+        return context
 
 class AnnonceCreateView(AdminOrRhRequiredMixin, CreateView):
     model = Annonce
@@ -310,6 +1002,7 @@ class UtilisateurListView(AdminRequiredMixin, ListView):
     model = Utilisateur
     template_name = 'admin/utilisateur_list.html'
     context_object_name = 'utilisateurs'
+    queryset = Utilisateur.objects.select_related('role')
 
 class UtilisateurDetailView(AdminRequiredMixin, DetailView):
     model = Utilisateur
@@ -322,16 +1015,39 @@ class UtilisateurCreateView(AdminRequiredMixin, CreateView):
     template_name = 'admin/utilisateur_form.html'
     success_url = reverse_lazy('utilisateur_list')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.setdefault('employe_form', EmployeForm(prefix='employe'))
+        return context
+
     @transaction.atomic
     def form_valid(self, form):
-        # Créer l'utilisateur
-        user = form.save()
-        # Créer l'employé associé si le rôle le nécessite
-        if user.role and user.role.nom_role == 'Employe':
-            Employe.objects.create(utilisateur=user)
+        # La fiche employé (matricule, salaire...) est obligatoire pour le rôle Employe.
+        employe_form = EmployeForm(self.request.POST, prefix='employe')
+        est_employe = form.cleaned_data['role'].nom_role == Role.EMPLOYE
+        if est_employe and not employe_form.is_valid():
+            return self.render_to_response(self.get_context_data(form=form, employe_form=employe_form))
+        self.object = user = form.save()
+        if est_employe:
+            employe = employe_form.save(commit=False)
+            employe.utilisateur = user
+            employe.save()
         messages.success(self.request, "Utilisateur créé avec succès.")
         return redirect(self.get_success_url())
 
+class UtilisateurImportView(AdminRequiredMixin, FormView):
+    """Intégration en masse d'employés (comptes et fiches), exécutée en tâche de fond."""
+    form_class = ImportEmployesForm
+    template_name = 'admin/utilisateur_import.html'
+
+    def form_valid(self, form):
+        fichier = form.cleaned_data['fichier']
+        tache = planifier('integrer_employes', {
+            'fichier': str(enregistrer_fichier(fichier)), 'format_fichier': format_depuis_nom(fichier.name),
+        }, demandeur=self.request.user)
+        messages.success(self.request, f"Intégration planifiée (tâche n°{tache.pk}).")
+        return redirect('tache_detail', pk=tache.pk)
+
 class UtilisateurUpdateView(AdminRequiredMixin, UpdateView):
     model = Utilisateur
     form_class = UtilisateurUpdateForm
@@ -341,4 +1057,23 @@ class UtilisateurUpdateView(AdminRequiredMixin, UpdateView):
 class UtilisateurDeleteView(AdminRequiredMixin, DeleteView):
     model = Utilisateur
     template_name = 'admin/utilisateur_confirm_delete.html'
-    success_url = reverse_lazy('utilisateur_list')
\ No newline at end of file
+    success_url = reverse_lazy('utilisateur_list')
+
+# ==========================================
+# Instrumentation des vues (Admin uniquement)
+# ==========================================
+
+class InstrumentationRapportView(AdminRequiredMixin, TemplateView):
+    """Latences, requêtes SQL et motifs N+1 par vue sur les dernières heures (?heures=24)."""
+    template_name = 'admin/instrumentation.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            heures = max(float(self.request.GET.get('heures', 24)), 0.1)
+        except ValueError:
+            heures = 24
+        tampon.vider()
+        context['heures'] = heures
+        context['statistiques'] = rapport(timezone.now() - datetime.timedelta(hours=heures), self.request.GET.get('vue'))
+        return context
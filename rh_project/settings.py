@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête : la mesure couvre toute la chaîne, middlewares compris.
+    'gestion_rh.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,10 +78,24 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Les transactions qui lisent puis écrivent (pointage, agrégats)
+            # prennent le verrou d'écriture dès le début au lieu d'échouer en
+            # « database is locked » quand plusieurs requêtes se croisent.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 
+# Authentication
+# Le backend charge le rôle avec l'utilisateur à chaque requête (une seule requête SQL).
+
+AUTHENTICATION_BACKENDS = [
+    'gestion_rh.backends.RoleModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -116,6 +132,30 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Cache des bulletins de paie PDF, indexé par empreinte du contenu
+BULLETINS_CACHE_DIR = BASE_DIR / 'cache' / 'bulletins'
+
+# Fichiers reçus (imports) et produits (archives) par les tâches de fond
+TACHES_DOSSIER = BASE_DIR / 'cache' / 'taches'
+
+# Archives annuelles de la paie (gestion_rh.archives_paie) : les années closes sont sorties
+# des tables au-delà des ARCHIVES_PAIE_ANNEES_CHAUDES dernières années.
+ARCHIVES_PAIE_DIR = BASE_DIR / 'archives' / 'paie'
+ARCHIVES_PAIE_ANNEES_CHAUDES = 2
+
+# Cache partagé par les processus web et les workers de tâches (fragments du tableau de bord)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'django',
+    }
+}
+
+# Instrumentation des vues (gestion_rh.instrumentation) : part des requêtes mesurées
+# (1 = toutes, 0 = désactivée) et répétitions d'une même requête SQL signalées comme N+1.
+INSTRUMENTATION_TAUX = 1.0 if DEBUG else 0.02
+INSTRUMENTATION_SEUIL_N_PLUS_UN = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 